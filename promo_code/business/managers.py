@@ -1,9 +1,17 @@
+import random
+
+import django.conf
 import django.contrib.auth.models
+import django.core.cache
 import django.db.models
+import django.db.models.functions
+import django.db.models.lookups
+import django.db.transaction
 import django.utils.timezone
 
 import business.constants
 import business.models
+import business.signals
 
 
 class CompanyManager(django.contrib.auth.models.BaseUserManager):
@@ -22,6 +30,172 @@ class CompanyManager(django.contrib.auth.models.BaseUserManager):
         return company
 
 
+class PromoCodeManager(django.db.models.Manager):
+    def claim_unused(self, promo_id):
+        """
+        Marks one unused unique code of the given promo as used and returns
+        it, or None if no free code is left.
+
+        Rows already locked by concurrent activations are skipped rather
+        than waited on, so activations of the same promo proceed in
+        parallel. Must be called inside a transaction. The promo is marked
+        unavailable once its last code is taken. On None the caller rolls
+        back, so it has to correct the flag itself afterwards with
+        PromoManager.refresh_availability().
+        """
+        others_unused = self.filter(
+            promo_id=promo_id,
+            is_used=False,
+        ).exclude(pk=django.db.models.OuterRef('pk'))
+        code = (
+            self.select_for_update(skip_locked=True)
+            .filter(promo_id=promo_id, is_used=False)
+            .annotate(has_more=django.db.models.Exists(others_unused))
+            .order_by('id')
+            .first()
+        )
+        if code is None:
+            return None
+
+        code.is_used = True
+        code.used_at = django.utils.timezone.now()
+        code.save(update_fields=['is_used', 'used_at'])
+
+        if code.has_more:
+            # The other free codes may be taken by concurrent claims that
+            # have not committed yet.
+            business.models.Promo.objects.recheck_availability_on_commit(
+                promo_id,
+            )
+        else:
+            business.models.Promo.objects.mark_unavailable(promo_id)
+        return code
+
+
+class PromoUsageShardManager(django.db.models.Manager):
+    @staticmethod
+    def _split(total, parts):
+        """Splits total into parts integers that differ by at most one."""
+        base, extra = divmod(total, parts)
+        return [base + 1 if i < extra else base for i in range(parts)]
+
+    def allocate(self, promo):
+        """
+        Creates the usage shards of a COMMON promo, spreading its remaining
+        capacity evenly. Safe to call concurrently: existing shards are kept.
+        """
+        shard_count = getattr(
+            django.conf.settings,
+            'PROMO_USAGE_SHARD_COUNT',
+            8,
+        )
+        remaining = max(promo.max_count - promo.used_count, 0)
+        self.bulk_create(
+            [
+                self.model(promo_id=promo.id, index=index, capacity=capacity)
+                for index, capacity in enumerate(
+                    self._split(remaining, shard_count),
+                )
+            ],
+            ignore_conflicts=True,
+        )
+
+    def reserve(self, promo):
+        """
+        Takes one unit of capacity from a random shard with room left and
+        returns True, or False if the promo has reached its max_count.
+
+        Each attempt is a single conditional UPDATE, so only the chosen
+        shard row is locked until the surrounding transaction ends.
+        The promo is marked unavailable once its last unit is taken; on
+        False the caller corrects the flag after rolling back, as with
+        PromoCodeManager.claim_unused().
+        """
+        candidates = list(
+            self.filter(
+                promo_id=promo.id,
+                used__lt=django.db.models.F('capacity'),
+            ).values_list('index', flat=True),
+        )
+        if not candidates and not self.filter(promo_id=promo.id).exists():
+            self.allocate(promo)
+            return self.reserve(promo)
+
+        random.shuffle(candidates)
+        for index in candidates:
+            updated = self.filter(
+                promo_id=promo.id,
+                index=index,
+                used__lt=django.db.models.F('capacity'),
+            ).update(used=django.db.models.F('used') + 1)
+            if updated:
+                promos = business.models.Promo.objects
+                if len(candidates) == 1 and not self.has_capacity(promo):
+                    promos.mark_unavailable(promo.id)
+                else:
+                    # Concurrent reservations that have not committed yet
+                    # may take the capacity still seen here.
+                    promos.recheck_availability_on_commit(promo.id)
+                return True
+
+        return False
+
+    def has_capacity(self, promo):
+        return self.filter(
+            promo_id=promo.id,
+            used__lt=django.db.models.F('capacity'),
+        ).exists()
+
+    def rebalance(self, promo):
+        """
+        Redistributes the remaining capacity after max_count has changed.
+        Must be called inside a transaction.
+        """
+        shards = list(
+            self.select_for_update()
+            .filter(promo_id=promo.id)
+            .order_by('index'),
+        )
+        if not shards:
+            return
+
+        used = promo.used_count + sum(shard.used for shard in shards)
+        remaining = max(promo.max_count - used, 0)
+        for shard, extra in zip(
+            shards,
+            self._split(remaining, len(shards)),
+            strict=True,
+        ):
+            shard.capacity = shard.used + extra
+
+        self.bulk_update(shards, ['capacity'])
+
+    def used_total(self, promo):
+        """Returns the number of activations recorded in the shards."""
+        return self.filter(promo_id=promo.id).aggregate(
+            total=django.db.models.functions.Coalesce(
+                django.db.models.Sum('used'),
+                0,
+            ),
+        )['total']
+
+    def used_total_subquery(self):
+        """
+        Builds an expression with the activations recorded in the shards
+        of the outer promo, for use in annotations.
+        """
+        subq = (
+            self.filter(promo=django.db.models.OuterRef('pk'))
+            .values('promo')
+            .annotate(total=django.db.models.Sum('used'))
+            .values('total')
+        )
+        return django.db.models.functions.Coalesce(
+            django.db.models.Subquery(subq),
+            0,
+        )
+
+
 class PromoManager(django.db.models.Manager):
     with_related_fields = (
         'id',
@@ -35,6 +209,7 @@ class PromoManager(django.db.models.Manager):
         'active_until',
         'mode',
         'promo_common',
+        'is_available',
         'created_at',
     )
 
@@ -51,7 +226,7 @@ class PromoManager(django.db.models.Manager):
         )
 
     def for_company(self, user):
-        return self.with_related().filter(company=user)
+        return self.with_related().filter(company_id=user.id)
 
     def get_feed_for_user(
         self,
@@ -69,7 +244,7 @@ class PromoManager(django.db.models.Manager):
         qs = (
             self.get_queryset()
             .select_related('company')
-            .annotate(_has_unique_codes=self._q_has_unique_codes())
+            .annotate(**self._user_flags(user))
             .filter(self._q_is_targeted(user_country, user_age))
         )
 
@@ -78,12 +253,80 @@ class PromoManager(django.db.models.Manager):
             active_q = self._q_is_active(today)
             qs = qs.filter(active_q) if is_active else qs.exclude(active_q)
 
-        return qs.order_by('-created_at')
+        return qs.order_by('-created_at', '-id')
+
+    def get_history_for_user(self, user):
+        """
+        Retrieve the promos activated by the given user, most recent
+        activation first, with the same per-user flags as the feed.
+        """
+        return (
+            self.get_queryset()
+            .select_related('company')
+            .filter(activations_history__user_id=user.id)
+            .annotate(**self._user_flags(user))
+            .order_by('-activations_history__activated_at')
+        )
+
+    def _user_flags(self, user):
+        """
+        Annotate whether the given user has liked and activated each
+        promo, so serializers do not query it row by row.
+        """
+        meta = self.model._meta
+        like_model = meta.get_field('likes').related_model
+        history_model = meta.get_field('activations_history').related_model
+
+        return {
+            '_is_liked_by_user': django.db.models.Exists(
+                like_model.objects.filter(
+                    promo=django.db.models.OuterRef('pk'),
+                    user_id=user.id,
+                ),
+            ),
+            '_is_activated_by_user': django.db.models.Exists(
+                history_model.objects.filter(
+                    promo=django.db.models.OuterRef('pk'),
+                    user_id=user.id,
+                ),
+            ),
+        }
+
+    def get_user_flags(self, user, promo_ids):
+        """
+        Returns the ids of the given promos the user has liked and
+        the ids of those they have activated, in a single query.
+        """
+        meta = self.model._meta
+        like_model = meta.get_field('likes').related_model
+        history_model = meta.get_field('activations_history').related_model
+
+        def flagged(model, flag):
+            return (
+                model.objects.filter(user_id=user.id, promo_id__in=promo_ids)
+                .order_by()
+                .values_list(
+                    'promo_id',
+                    django.db.models.Value(
+                        flag,
+                        output_field=django.db.models.CharField(),
+                    ),
+                )
+            )
+
+        liked, activated = set(), set()
+        for promo_id, flag in flagged(like_model, 'like').union(
+            flagged(history_model, 'activation'),
+        ):
+            (liked if flag == 'like' else activated).add(str(promo_id))
+
+        return liked, activated
 
     def _q_is_active(self, today):
         """
         Build a Q expression that checks whether a promo
         is active on the given date.
+        Code availability is read from the stored is_available flag.
         """
 
         qt = django.db.models.Q(active_from__lte=today) | django.db.models.Q(
@@ -93,20 +336,144 @@ class PromoManager(django.db.models.Manager):
             active_until__isnull=True,
         )
 
-        common = django.db.models.Q(
-            mode=business.constants.PROMO_MODE_COMMON,
-            used_count__lt=django.db.models.F('max_count'),
+        return qt & tu & django.db.models.Q(is_available=True)
+
+    @staticmethod
+    def _exists_cache_key(promo_id):
+        return f'promo:exists:{promo_id}'
+
+    def exists_cached(self, promo_id):
+        """
+        Checks that the promo exists without locking its row. Positive
+        answers are cached for PROMO_EXISTS_CACHE_TIMEOUT seconds and
+        dropped by forget_exists() when the promo is deleted.
+        """
+        key = self._exists_cache_key(promo_id)
+        if django.core.cache.cache.get(key):
+            return True
+
+        exists = self.filter(pk=promo_id).exists()
+        if exists:
+            django.core.cache.cache.set(
+                key,
+                True,
+                timeout=django.conf.settings.PROMO_EXISTS_CACHE_TIMEOUT,
+            )
+        return exists
+
+    def forget_exists(self, promo_id):
+        django.core.cache.cache.delete(self._exists_cache_key(promo_id))
+
+    def change_comment_count(self, promo_id, delta):
+        """
+        Changes comment_count with a single conditional UPDATE instead
+        of locking the promo row; the count never drops below zero.
+        """
+        promos = self.filter(pk=promo_id)
+        if delta < 0:
+            promos = promos.filter(comment_count__gte=-delta)
+
+        updated = promos.update(
+            comment_count=django.db.models.F('comment_count') + delta,
         )
-        unique = django.db.models.Q(
-            mode=business.constants.PROMO_MODE_UNIQUE,
-            _has_unique_codes=True,
+        if updated:
+            business.signals.promo_counters_changed.send(
+                sender=self.model,
+                promo_ids=[promo_id],
+            )
+
+    def mark_unavailable(self, promo_id):
+        """
+        Clears is_available once a promo has run out of codes.
+        Only writes when the flag actually changes.
+        """
+        updated = self.filter(pk=promo_id, is_available=True).update(
+            is_available=False,
         )
+        if updated:
+            business.signals.promo_availability_changed.send(
+                sender=self.model,
+                promo_ids=[promo_id],
+            )
 
-        return qt & tu & (common | unique)
+    def recheck_availability_on_commit(self, promo_id):
+        """
+        Clears is_available once the current transaction has committed
+        if the promo has no unused code or usage capacity left by then.
+        Used by activations that cannot tell whether concurrent ones
+        took the last units. A single UPDATE that changes nothing while
+        the promo is still available.
+        """
+
+        def recheck():
+            free_codes = business.models.PromoCode.objects.filter(
+                promo=django.db.models.OuterRef('pk'),
+                is_used=False,
+            )
+            free_shards = business.models.PromoUsageShard.objects.filter(
+                promo=django.db.models.OuterRef('pk'),
+                used__lt=django.db.models.F('capacity'),
+            )
+            exhausted = (
+                django.db.models.Q(
+                    mode=business.constants.PROMO_MODE_UNIQUE,
+                )
+                & ~django.db.models.Exists(free_codes)
+            ) | (
+                django.db.models.Q(
+                    mode=business.constants.PROMO_MODE_COMMON,
+                )
+                & ~django.db.models.Exists(free_shards)
+            )
+            updated = (
+                self.filter(pk=promo_id, is_available=True)
+                .filter(exhausted)
+                .update(is_available=False)
+            )
+            if updated:
+                business.signals.promo_availability_changed.send(
+                    sender=self.model,
+                    promo_ids=[promo_id],
+                )
+
+        django.db.transaction.on_commit(recheck)
+
+    def refresh_availability(self, promo_ids):
+        """
+        Recomputes is_available of the given promos from their usage
+        counters and unused codes. Used when capacity changes outside
+        of activations, e.g. on creation or when max_count is edited.
+        """
+        promos = self.filter(pk__in=promo_ids)
+        promos.filter(mode=business.constants.PROMO_MODE_COMMON).update(
+            is_available=django.db.models.lookups.LessThan(
+                self._used_total(),
+                django.db.models.F('max_count'),
+            ),
+        )
+        promos.filter(mode=business.constants.PROMO_MODE_UNIQUE).update(
+            is_available=self._q_has_unique_codes(),
+        )
+        business.signals.promo_availability_changed.send(
+            sender=self.model,
+            promo_ids=list(promo_ids),
+        )
+
+    def _used_total(self):
+        """
+        Expression with the total number of activations of COMMON promos,
+        aggregated over the usage shards.
+        """
+        return (
+            django.db.models.F(
+                'used_count',
+            )
+            + business.models.PromoUsageShard.objects.used_total_subquery()
+        )
 
     def _q_has_unique_codes(self):
         """
-        Annotate whether there are unused unique codes remaining
+        Expression telling whether there are unused unique codes remaining
         for each promo.
         """
         subq = business.models.PromoCode.objects.filter(
@@ -119,34 +486,21 @@ class PromoManager(django.db.models.Manager):
         """
         Build a Q expression that checks whether a promo targets the given
         country and age, or is not targeted.
+        Uses the denormalized, indexed target_* columns.
         """
-        empty = django.db.models.Q(target={})
-
-        match_country = (
-            django.db.models.Q(target__country__iexact=country)
-            if country
-            else django.db.models.Q()
-        )
-
-        no_country = ~django.db.models.Q(
-            target__has_key='country',
-        ) | django.db.models.Q(target__country__isnull=True)
-
-        country_ok = match_country | no_country
+        country_ok = django.db.models.Q()
+        if country:
+            country_ok = django.db.models.Q(
+                target_country__isnull=True,
+            ) | django.db.models.Q(target_country=country.lower())
 
-        from_ok = (
-            ~django.db.models.Q(target__has_key='age_from')
-            | django.db.models.Q(target__age_from__isnull=True)
-            | django.db.models.Q(target__age_from__lte=age)
-        )
-        until_ok = (
-            ~django.db.models.Q(target__has_key='age_until')
-            | django.db.models.Q(target__age_until__isnull=True)
-            | django.db.models.Q(target__age_until__gte=age)
-        )
-        age_ok = from_ok & until_ok
+        from_ok = django.db.models.Q(target_age_from__isnull=True)
+        until_ok = django.db.models.Q(target_age_until__isnull=True)
+        if age is not None:
+            from_ok |= django.db.models.Q(target_age_from__lte=age)
+            until_ok |= django.db.models.Q(target_age_until__gte=age)
 
-        return empty | (country_ok & age_ok)
+        return country_ok & from_ok & until_ok
 
     @django.db.transaction.atomic
     def create_promo(
@@ -157,15 +511,22 @@ class PromoManager(django.db.models.Manager):
         promo_unique,
         **kwargs,
     ):
+        if kwargs.get('mode') == business.constants.PROMO_MODE_UNIQUE:
+            is_available = bool(promo_unique)
+        else:
+            is_available = kwargs.get('max_count', 0) > 0
+
         promo = self.create(
-            company=user,
+            company_id=user.id,
             target=target_data,
+            is_available=is_available,
             **kwargs,
         )
 
         if promo.mode == business.constants.PROMO_MODE_COMMON:
             promo.promo_common = promo_common
             promo.save(update_fields=['promo_common'])
+            business.models.PromoUsageShard.objects.allocate(promo)
         elif (
             promo.mode == business.constants.PROMO_MODE_UNIQUE and promo_unique
         ):
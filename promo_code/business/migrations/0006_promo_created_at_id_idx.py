@@ -0,0 +1,19 @@
+# Generated by Django 5.2 on 2026-10-17 23:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("business", "0005_promousageshard"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="promo",
+            index=models.Index(
+                fields=["-created_at", "-id"], name="promo_created_at_id_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,85 @@
+# Generated by Django 5.2 on 2026-10-17 23:55
+
+import django.contrib.postgres.fields
+from django.db import migrations, models
+
+TARGET_COLUMNS = [
+    "target_country",
+    "target_age_from",
+    "target_age_until",
+    "target_categories",
+]
+
+
+def backfill_target_columns(apps, schema_editor):
+    Promo = apps.get_model("business", "Promo")
+
+    batch = []
+    for promo in Promo.objects.only("id", "target").iterator(chunk_size=1000):
+        target = promo.target or {}
+        country = target.get("country")
+        promo.target_country = country.lower() if country else None
+        promo.target_age_from = target.get("age_from")
+        promo.target_age_until = target.get("age_until")
+        promo.target_categories = [
+            category.lower() for category in target.get("categories") or []
+        ]
+        batch.append(promo)
+
+        if len(batch) >= 1000:
+            Promo.objects.bulk_update(batch, TARGET_COLUMNS)
+            batch = []
+
+    Promo.objects.bulk_update(batch, TARGET_COLUMNS)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("business", "0006_promo_created_at_id_idx"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="promo",
+            name="target_age_from",
+            field=models.PositiveSmallIntegerField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="promo",
+            name="target_age_until",
+            field=models.PositiveSmallIntegerField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="promo",
+            name="target_categories",
+            field=django.contrib.postgres.fields.ArrayField(
+                base_field=models.CharField(max_length=20),
+                default=list,
+                editable=False,
+                size=None,
+            ),
+        ),
+        migrations.AddField(
+            model_name="promo",
+            name="target_country",
+            field=models.CharField(editable=False, max_length=2, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="promo",
+            index=models.Index(
+                fields=["target_country"], name="promo_target_country_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="promo",
+            index=models.Index(
+                fields=["target_age_from", "target_age_until"],
+                name="promo_target_age_idx",
+            ),
+        ),
+        migrations.RunPython(
+            backfill_target_columns,
+            migrations.RunPython.noop,
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2 on 2026-10-17 23:57
+
+import django.contrib.postgres.indexes
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("business", "0007_promo_target_columns"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="promo",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["target_categories"], name="promo_target_categories_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2 on 2026-10-18 00:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("business", "0008_promo_target_categories_idx"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="promo",
+            index=models.Index(
+                fields=["mode", "active_from", "active_until"],
+                name="promo_mode_active_window_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="promocode",
+            index=models.Index(
+                condition=models.Q(("is_used", False)),
+                fields=["promo", "id"],
+                name="promocode_unused_idx",
+            ),
+        ),
+    ]
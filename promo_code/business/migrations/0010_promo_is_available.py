@@ -0,0 +1,62 @@
+# Generated by Django 5.2 on 2026-10-18 00:04
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+from django.db.models.lookups import LessThan
+
+
+def backfill_is_available(apps, schema_editor):
+    Promo = apps.get_model("business", "Promo")
+    PromoCode = apps.get_model("business", "PromoCode")
+    PromoUsageShard = apps.get_model("business", "PromoUsageShard")
+
+    shard_used = (
+        PromoUsageShard.objects.filter(promo=models.OuterRef("pk"))
+        .values("promo")
+        .annotate(total=models.Sum("used"))
+        .values("total")
+    )
+    Promo.objects.filter(mode="COMMON").update(
+        is_available=LessThan(
+            models.F("used_count") + Coalesce(models.Subquery(shard_used), 0),
+            models.F("max_count"),
+        ),
+    )
+    Promo.objects.filter(mode="UNIQUE").update(
+        is_available=models.Exists(
+            PromoCode.objects.filter(
+                promo=models.OuterRef("pk"),
+                is_used=False,
+            ),
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("business", "0009_feed_indexes"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="promo",
+            name="promo_mode_active_window_idx",
+        ),
+        migrations.AddField(
+            model_name="promo",
+            name="is_available",
+            field=models.BooleanField(default=True),
+        ),
+        migrations.AddIndex(
+            model_name="promo",
+            index=models.Index(
+                fields=["is_available", "active_from", "active_until"],
+                name="promo_available_window_idx",
+            ),
+        ),
+        migrations.RunPython(
+            backfill_is_available,
+            migrations.RunPython.noop,
+        ),
+    ]
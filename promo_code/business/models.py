@@ -1,6 +1,8 @@
 import uuid
 
 import django.contrib.auth.models
+import django.contrib.postgres.fields
+import django.contrib.postgres.indexes
 import django.db.models
 import django.utils.timezone
 
@@ -84,14 +86,97 @@ class Promo(django.db.models.Model):
         null=True,
     )
     active = django.db.models.BooleanField(default=True)
+    # Whether codes are left to issue. Maintained on creation, on
+    # activation (cleared when the last code is taken) and when
+    # max_count changes, so reads do not have to count usage.
+    is_available = django.db.models.BooleanField(default=True)
+
+    # Denormalized copies of `target`, which stays the source of truth.
+    # They are kept in sync by save() and let the feed filter on
+    # indexed columns instead of JSON lookups.
+    target_country = django.db.models.CharField(
+        max_length=business.constants.TARGET_COUNTRY_CODE_LENGTH,
+        null=True,
+        editable=False,
+    )
+    target_age_from = django.db.models.PositiveSmallIntegerField(
+        null=True,
+        editable=False,
+    )
+    target_age_until = django.db.models.PositiveSmallIntegerField(
+        null=True,
+        editable=False,
+    )
+    target_categories = django.contrib.postgres.fields.ArrayField(
+        django.db.models.CharField(
+            max_length=business.constants.TARGET_CATEGORY_MAX_LENGTH,
+        ),
+        default=list,
+        editable=False,
+    )
 
     created_at = django.db.models.DateTimeField(auto_now_add=True)
 
     objects = business.managers.PromoManager()
 
+    TARGET_COLUMNS = (
+        'target_country',
+        'target_age_from',
+        'target_age_until',
+        'target_categories',
+    )
+
+    class Meta:
+        indexes = [
+            django.db.models.Index(
+                fields=['-created_at', '-id'],
+                name='promo_created_at_id_idx',
+            ),
+            django.db.models.Index(
+                fields=['target_country'],
+                name='promo_target_country_idx',
+            ),
+            django.db.models.Index(
+                fields=['target_age_from', 'target_age_until'],
+                name='promo_target_age_idx',
+            ),
+            django.contrib.postgres.indexes.GinIndex(
+                fields=['target_categories'],
+                name='promo_target_categories_idx',
+            ),
+            django.db.models.Index(
+                fields=['is_available', 'active_from', 'active_until'],
+                name='promo_available_window_idx',
+            ),
+        ]
+
     def __str__(self):
         return f'Promo {self.id} ({self.mode})'
 
+    def save(self, *args, **kwargs):
+        self.sync_target_columns()
+
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'target' in update_fields:
+            kwargs['update_fields'] = {*update_fields, *self.TARGET_COLUMNS}
+
+        super().save(*args, **kwargs)
+
+    def sync_target_columns(self):
+        """
+        Copies the targeting settings from `target` into the
+        denormalized columns. Country and categories are lowercased.
+        """
+        target = self.target or {}
+        country = target.get('country')
+
+        self.target_country = country.lower() if country else None
+        self.target_age_from = target.get('age_from')
+        self.target_age_until = target.get('age_until')
+        self.target_categories = [
+            category.lower() for category in target.get('categories') or []
+        ]
+
     @property
     def is_active(self) -> bool:
         today = django.utils.timezone.now().date()
@@ -100,9 +185,7 @@ class Promo(django.db.models.Model):
         if self.active_until and self.active_until < today:
             return False
 
-        if self.mode == business.constants.PROMO_MODE_UNIQUE:
-            return self.unique_codes.filter(is_used=False).exists()
-        return self.used_count < self.max_count
+        return self.is_available
 
     @property
     def get_like_count(self) -> int:
@@ -114,9 +197,13 @@ class Promo(django.db.models.Model):
 
     @property
     def get_used_codes_count(self) -> int:
+        """
+        For COMMON promos, used_count holds activations recorded before the
+        promo got its usage shards; the rest is spread across the shards.
+        """
         if self.mode == business.constants.PROMO_MODE_UNIQUE:
             return self.unique_codes.filter(is_used=True).count()
-        return self.used_count
+        return self.used_count + PromoUsageShard.objects.used_total(self)
 
     @property
     def get_available_unique_codes(self) -> list[str]:
@@ -136,8 +223,51 @@ class PromoCode(django.db.models.Model):
     is_used = django.db.models.BooleanField(default=False)
     used_at = django.db.models.DateTimeField(null=True, blank=True)
 
+    objects = business.managers.PromoCodeManager()
+
     class Meta:
         unique_together = ('promo', 'code')
+        indexes = [
+            # Serves both the "has unused codes" Exists() of the feed and
+            # PromoCodeManager.claim_unused(), which takes the lowest id.
+            django.db.models.Index(
+                fields=['promo', 'id'],
+                condition=django.db.models.Q(is_used=False),
+                name='promocode_unused_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.code
+
+
+class PromoUsageShard(django.db.models.Model):
+    """
+    One stripe of the usage counter of a COMMON promo.
+
+    The remaining capacity of a promo (max_count - used_count) is split
+    across several shards, so concurrent activations increment different
+    rows instead of serializing on the promo row.
+    """
+
+    promo = django.db.models.ForeignKey(
+        Promo,
+        on_delete=django.db.models.CASCADE,
+        related_name='usage_shards',
+    )
+    index = django.db.models.PositiveSmallIntegerField()
+    capacity = django.db.models.PositiveIntegerField()
+    used = django.db.models.PositiveIntegerField(default=0)
+
+    objects = business.managers.PromoUsageShardManager()
+
+    class Meta:
+        constraints = [
+            django.db.models.UniqueConstraint(
+                fields=['promo', 'index'],
+                name='unique_promo_usage_shard',
+            ),
+        ]
+
+    def __str__(self):
+        return f'Shard {self.index} of promo {self.promo_id}'
@@ -1,14 +1,12 @@
 import rest_framework.permissions
 
-import business.models
-
 
 class IsCompanyUser(rest_framework.permissions.BasePermission):
     def has_permission(self, request, view):
         if not request.user or not request.user.is_authenticated:
             return False
 
-        return isinstance(request.user, business.models.Company)
+        return request.user.is_company
 
 
 class IsPromoOwner(rest_framework.permissions.BasePermission):
@@ -253,6 +253,7 @@ class PromoDetailSerializer(core.serializers.BaseCompanyPromoSerializer):
             return obj.get_available_unique_codes
         return None
 
+    @django.db.transaction.atomic
     def update(self, instance, validated_data):
         target_data = validated_data.pop('target', None)
 
@@ -262,6 +263,14 @@ class PromoDetailSerializer(core.serializers.BaseCompanyPromoSerializer):
             instance.target = target_data
             instance.save(update_fields=['target'])
 
+        if (
+            'max_count' in validated_data
+            and instance.mode == business.constants.PROMO_MODE_COMMON
+        ):
+            business.models.PromoUsageShard.objects.rebalance(instance)
+            business.models.Promo.objects.refresh_availability([instance.id])
+            instance.refresh_from_db(fields=['is_available'])
+
         return instance
 
 
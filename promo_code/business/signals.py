@@ -0,0 +1,9 @@
+import django.dispatch
+
+# Sent with `promo_ids` whenever is_available of promos may have been
+# changed by a bulk UPDATE, which does not send post_save.
+promo_availability_changed = django.dispatch.Signal()
+
+# Sent with `promo_ids` when like_count or comment_count of promos has
+# been changed by a bulk UPDATE.
+promo_counters_changed = django.dispatch.Signal()
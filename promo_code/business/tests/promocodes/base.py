@@ -1,4 +1,5 @@
 import django.urls
+import django_redis
 import rest_framework.test
 
 import business.models
@@ -72,3 +73,4 @@ class BasePromoTestCase(rest_framework.test.APITestCase):
         business.models.Promo.objects.all().delete()
         business.models.PromoCode.objects.all().delete()
         user.models.PromoActivationHistory.objects.all().delete()
+        django_redis.get_redis_connection('default').flushall()
@@ -301,3 +301,45 @@ class TestPromoDetail(business.tests.promocodes.base.BasePromoTestCase):
         }
         for key, value in expected.items():
             self.assertEqual(response.data.get(key), value)
+
+    def test_cached_promo_still_checks_owner(self):
+        promo_detail_url = self.promo_detail_url(self.__class__.promo1_id)
+        self.client.credentials(
+            HTTP_AUTHORIZATION='Bearer ' + self.company1_token,
+        )
+        self.client.get(promo_detail_url)
+
+        self.client.credentials(
+            HTTP_AUTHORIZATION='Bearer ' + self.company2_token,
+        )
+        response = self.client.get(promo_detail_url)
+
+        self.assertEqual(
+            response.status_code,
+            rest_framework.status.HTTP_403_FORBIDDEN,
+        )
+
+    def test_get_after_patch_is_not_stale(self):
+        promo_detail_url = self.promo_detail_url(self.__class__.promo1_id)
+        self.client.credentials(
+            HTTP_AUTHORIZATION='Bearer ' + self.company1_token,
+        )
+        self.client.get(promo_detail_url)
+        self.client.get(self.promo_list_create_url)
+
+        self.client.patch(
+            promo_detail_url,
+            {'description': 'Cached description updated'},
+            format='json',
+        )
+
+        detail = self.client.get(promo_detail_url)
+        listed = self.client.get(self.promo_list_create_url)
+        self.assertEqual(
+            detail.data['description'],
+            'Cached description updated',
+        )
+        self.assertIn(
+            'Cached description updated',
+            [promo['description'] for promo in listed.data],
+        )
@@ -1,3 +1,7 @@
+import threading
+
+import django.db
+import django.db.transaction
 import django.test
 
 import business.constants
@@ -33,6 +37,134 @@ class PromoModelTests(django.test.TestCase):
         )
         self.assertEqual(str(self.common_promo), expected_str)
 
+    def test_target_columns_are_synced_on_save(self):
+        self.common_promo.target = {
+            'country': 'GB',
+            'age_from': 18,
+            'categories': ['Cats', 'dogs'],
+        }
+        self.common_promo.save(update_fields=['target'])
+
+        promo = business.models.Promo.objects.get(pk=self.common_promo.pk)
+        self.assertEqual(promo.target_country, 'gb')
+        self.assertEqual(promo.target_age_from, 18)
+        self.assertIsNone(promo.target_age_until)
+        self.assertEqual(promo.target_categories, ['cats', 'dogs'])
+
+    def test_target_columns_are_cleared_with_target(self):
+        self.common_promo.target = {'country': 'us', 'age_until': 30}
+        self.common_promo.save()
+        self.common_promo.target = {}
+        self.common_promo.save()
+
+        promo = business.models.Promo.objects.get(pk=self.common_promo.pk)
+        self.assertIsNone(promo.target_country)
+        self.assertIsNone(promo.target_age_until)
+        self.assertEqual(promo.target_categories, [])
+
+    def test_comment_count_never_drops_below_zero(self):
+        promos = business.models.Promo.objects
+        promos.change_comment_count(self.common_promo.id, 1)
+        promos.change_comment_count(self.common_promo.id, -1)
+        promos.change_comment_count(self.common_promo.id, -1)
+
+        self.common_promo.refresh_from_db()
+        self.assertEqual(self.common_promo.comment_count, 0)
+
+    def test_exists_cached_forgets_deleted_promo(self):
+        promos = business.models.Promo.objects
+        self.assertTrue(promos.exists_cached(self.common_promo.id))
+
+        promo_id = self.common_promo.id
+        self.common_promo.delete()
+
+        self.assertFalse(promos.exists_cached(promo_id))
+
+
+class PromoUsageShardManagerTests(django.test.TestCase):
+    def setUp(self):
+        self.company = business.models.Company.objects.create(
+            email='company@test.com',
+            name='TestCorp',
+        )
+        self.promo = business.models.Promo.objects.create_promo(
+            user=self.company,
+            target_data={},
+            promo_common='common-code',
+            promo_unique=None,
+            description='A common promo',
+            max_count=20,
+            mode=business.constants.PROMO_MODE_COMMON,
+        )
+
+    def test_create_promo_allocates_capacity_across_shards(self):
+        shards = self.promo.usage_shards.all()
+        self.assertGreater(len(shards), 1)
+        self.assertEqual(sum(shard.capacity for shard in shards), 20)
+
+    def test_reserve_stops_at_max_count(self):
+        reserved = [
+            business.models.PromoUsageShard.objects.reserve(self.promo)
+            for _ in range(25)
+        ]
+
+        self.assertEqual(reserved.count(True), 20)
+        self.promo.refresh_from_db()
+        self.assertEqual(self.promo.get_used_codes_count, 20)
+        self.assertFalse(self.promo.is_active)
+
+    def test_last_reservation_clears_availability(self):
+        for _ in range(19):
+            business.models.PromoUsageShard.objects.reserve(self.promo)
+        self.promo.refresh_from_db()
+        self.assertTrue(self.promo.is_available)
+
+        business.models.PromoUsageShard.objects.reserve(self.promo)
+
+        self.promo.refresh_from_db()
+        self.assertFalse(self.promo.is_available)
+
+    def test_refresh_availability_after_max_count_change(self):
+        for _ in range(20):
+            business.models.PromoUsageShard.objects.reserve(self.promo)
+
+        self.promo.max_count = 30
+        self.promo.save(update_fields=['max_count'])
+        business.models.PromoUsageShard.objects.rebalance(self.promo)
+        business.models.Promo.objects.refresh_availability([self.promo.id])
+
+        self.promo.refresh_from_db()
+        self.assertTrue(self.promo.is_available)
+
+    def test_reserve_allocates_shards_lazily(self):
+        promo = business.models.Promo.objects.create(
+            company=self.company,
+            description='A promo without shards',
+            max_count=3,
+            used_count=2,
+            mode=business.constants.PROMO_MODE_COMMON,
+        )
+
+        self.assertTrue(business.models.PromoUsageShard.objects.reserve(promo))
+        self.assertFalse(
+            business.models.PromoUsageShard.objects.reserve(promo),
+        )
+        self.assertEqual(promo.get_used_codes_count, 3)
+
+    def test_rebalance_keeps_used_and_applies_new_max_count(self):
+        for _ in range(5):
+            business.models.PromoUsageShard.objects.reserve(self.promo)
+
+        self.promo.max_count = 8
+        business.models.PromoUsageShard.objects.rebalance(self.promo)
+
+        shards = self.promo.usage_shards.all()
+        self.assertEqual(sum(shard.used for shard in shards), 5)
+        self.assertEqual(sum(shard.capacity for shard in shards), 8)
+        self.assertTrue(
+            all(shard.capacity >= shard.used for shard in shards),
+        )
+
 
 class PromoCodeModelTests(django.test.TestCase):
     def test_promo_code_str_representation(self):
@@ -51,3 +183,129 @@ class PromoCodeModelTests(django.test.TestCase):
             code='UNIQUE123',
         )
         self.assertEqual(str(promo_code), 'UNIQUE123')
+
+
+class PromoCodeManagerTests(django.test.TransactionTestCase):
+    def setUp(self):
+        company = business.models.Company.objects.create(
+            email='company@test.com',
+            name='TestCorp',
+        )
+        self.promo = business.models.Promo.objects.create_promo(
+            user=company,
+            target_data={},
+            promo_common=None,
+            promo_unique=['code-1', 'code-2'],
+            description='Unique codes promo',
+            max_count=1,
+            mode=business.constants.PROMO_MODE_UNIQUE,
+        )
+
+    def test_claim_unused_returns_none_when_exhausted(self):
+        with django.db.transaction.atomic():
+            first = business.models.PromoCode.objects.claim_unused(
+                self.promo.id,
+            )
+            second = business.models.PromoCode.objects.claim_unused(
+                self.promo.id,
+            )
+            third = business.models.PromoCode.objects.claim_unused(
+                self.promo.id,
+            )
+
+        self.assertEqual({first.code, second.code}, {'code-1', 'code-2'})
+        self.assertIsNone(third)
+        self.promo.refresh_from_db()
+        self.assertFalse(self.promo.is_available)
+        self.assertFalse(
+            business.models.PromoCode.objects.filter(is_used=False).exists(),
+        )
+
+    def test_claim_unused_keeps_availability_while_codes_remain(self):
+        with django.db.transaction.atomic():
+            business.models.PromoCode.objects.claim_unused(self.promo.id)
+
+        self.promo.refresh_from_db()
+        self.assertTrue(self.promo.is_available)
+
+    def test_promo_without_codes_is_unavailable(self):
+        promo = business.models.Promo.objects.create_promo(
+            user=self.promo.company,
+            target_data={},
+            promo_common=None,
+            promo_unique=[],
+            description='Empty unique promo',
+            max_count=1,
+            mode=business.constants.PROMO_MODE_UNIQUE,
+        )
+
+        self.assertFalse(promo.is_available)
+
+    def test_claim_unused_skips_codes_locked_by_other_transactions(self):
+        claimed = threading.Event()
+        release = threading.Event()
+        results = {}
+
+        def hold_claim():
+            try:
+                with django.db.transaction.atomic():
+                    code = business.models.PromoCode.objects.claim_unused(
+                        self.promo.id,
+                    )
+                    results['other'] = code.code
+                    claimed.set()
+                    release.wait(timeout=10)
+            finally:
+                django.db.connection.close()
+
+        thread = threading.Thread(target=hold_claim)
+        thread.start()
+        self.assertTrue(claimed.wait(timeout=10))
+
+        try:
+            with django.db.transaction.atomic():
+                code = business.models.PromoCode.objects.claim_unused(
+                    self.promo.id,
+                )
+        finally:
+            release.set()
+            thread.join()
+
+        self.assertIsNotNone(code)
+        self.assertNotEqual(code.code, results['other'])
+
+    def test_concurrent_claims_of_last_codes_clear_availability(self):
+        claimed = threading.Event()
+        release = threading.Event()
+
+        def hold_claim():
+            try:
+                with django.db.transaction.atomic():
+                    business.models.PromoCode.objects.claim_unused(
+                        self.promo.id,
+                    )
+                    claimed.set()
+                    release.wait(timeout=10)
+            finally:
+                django.db.connection.close()
+
+        thread = threading.Thread(target=hold_claim)
+        thread.start()
+        self.assertTrue(claimed.wait(timeout=10))
+
+        try:
+            # Sees the other claim's code as still free.
+            with django.db.transaction.atomic():
+                code = business.models.PromoCode.objects.claim_unused(
+                    self.promo.id,
+                )
+        finally:
+            release.set()
+            thread.join()
+
+        self.assertIsNotNone(code)
+        self.assertFalse(
+            business.models.PromoCode.objects.filter(is_used=False).exists(),
+        )
+        self.promo.refresh_from_db()
+        self.assertFalse(self.promo.is_available)
@@ -5,6 +5,7 @@ import rest_framework.test
 import business.models
 import business.permissions
 import business.tests.promocodes.base
+import core.principal
 import user.models
 
 
@@ -54,12 +55,14 @@ class TestIsCompanyUserPermission(
 
     def test_has_permission_for_company_user(self):
         request = self.factory.get(self.promo_list_create_url)
-        request.user = self.company1
+        request.user = core.principal.Principal.from_instance(self.company1)
         self.assertTrue(self.permission.has_permission(request, None))
 
     def test_has_permission_for_regular_user(self):
         request = self.factory.get(self.promo_list_create_url)
-        request.user = self.regular_user
+        request.user = core.principal.Principal.from_instance(
+            self.regular_user,
+        )
         self.assertFalse(self.permission.has_permission(request, None))
 
     def test_has_permission_for_anonymous_user(self):
@@ -0,0 +1,118 @@
+import django.db
+import django.db.models
+import django.test
+import django.utils.timezone
+
+import business.models
+import user.models
+
+
+class QueryPlanTestCase(django.test.TestCase):
+    """
+    Checks that hot queries can be served from indexes.
+
+    Test tables are tiny, so the planner would pick sequential scans
+    anyway. Sequential scans are therefore disabled for the transaction:
+    if one still shows up in the plan, no index can serve that part of
+    the query.
+    """
+
+    def assert_no_seq_scan(self, queryset):
+        with django.db.connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+
+        plan = queryset.explain()
+        seq_scans = [line for line in plan.splitlines() if 'Seq Scan' in line]
+        self.assertFalse(seq_scans, f'Sequential scan in plan:\n{plan}')
+
+
+class FeedQueryPlanTests(QueryPlanTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = user.models.User.objects.create_user(
+            email='plan@example.com',
+            name='Query',
+            surname='Plan',
+            other={'age': 30, 'country': 'us'},
+        )
+
+    def test_unindexed_filter_is_reported(self):
+        with self.assertRaises(AssertionError):
+            self.assert_no_seq_scan(
+                business.models.Promo.objects.filter(description='x'),
+            )
+
+    def _feed(self, **kwargs):
+        return business.models.Promo.objects.get_feed_for_user(
+            self.user,
+            user_country='us',
+            user_age=30,
+            **kwargs,
+        )
+
+    def test_feed(self):
+        self.assert_no_seq_scan(self._feed()[:10])
+
+    def test_feed_active_filter(self):
+        self.assert_no_seq_scan(self._feed(active_filter='true')[:10])
+        self.assert_no_seq_scan(self._feed(active_filter='false')[:10])
+
+    def test_feed_category_filter(self):
+        self.assert_no_seq_scan(
+            self._feed().filter(target_categories__contains=['cats'])[:10],
+        )
+
+    def test_history(self):
+        self.assert_no_seq_scan(
+            business.models.Promo.objects.get_history_for_user(self.user)[:10],
+        )
+
+    def test_unused_code_lookup(self):
+        self.assert_no_seq_scan(
+            business.models.PromoCode.objects.filter(
+                promo_id='1bfd61b1-52ff-4c0f-ba8b-434ad3d0f812',
+                is_used=False,
+            ).order_by('id')[:1],
+        )
+
+
+class CommentQueryPlanTests(QueryPlanTestCase):
+    def test_comment_page_is_read_in_index_order(self):
+        position = django.utils.timezone.now()
+        page = (
+            user.models.PromoComment.objects.filter(
+                promo_id='1bfd61b1-52ff-4c0f-ba8b-434ad3d0f812',
+            )
+            .filter(
+                django.db.models.Q(created_at__lt=position)
+                | django.db.models.Q(
+                    created_at=position,
+                    pk__lt='8f0dbf80-6a4a-4a36-9f1c-6c3f2f0c9b2e',
+                ),
+            )
+            .order_by('-created_at', '-id')[:10]
+        )
+
+        self.assert_no_seq_scan(page)
+        # The index order matches the page order, so no sort is needed.
+        with django.db.connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_sort = off')
+        plan = page.explain()
+        self.assertIn('comment_promo_created_at_idx', plan)
+        self.assertNotIn('Sort', plan)
+
+
+class HistoryQueryPlanTests(QueryPlanTestCase):
+    def test_user_history(self):
+        self.assert_no_seq_scan(
+            user.models.PromoActivationHistory.objects.filter(
+                user_id='1bfd61b1-52ff-4c0f-ba8b-434ad3d0f812',
+            ).order_by('-activated_at')[:10],
+        )
+
+    def test_promo_activations(self):
+        self.assert_no_seq_scan(
+            user.models.PromoActivationHistory.objects.filter(
+                promo_id='1bfd61b1-52ff-4c0f-ba8b-434ad3d0f812',
+            ),
+        )
@@ -1,5 +1,6 @@
 import re
 
+import django.conf
 import django.db.models
 import django.shortcuts
 import rest_framework.generics
@@ -14,7 +15,9 @@ import business.permissions
 import business.serializers
 import business.utils.tokens
 import core.pagination
+import core.representation_cache
 import core.utils.auth
+import user.like_buffer
 import user.models
 
 
@@ -65,7 +68,40 @@ class CompanyTokenRefreshView(rest_framework_simplejwt.views.TokenRefreshView):
     serializer_class = business.serializers.CompanyTokenRefreshSerializer
 
 
-class CompanyPromoListCreateView(rest_framework.generics.ListCreateAPIView):
+class CompanyPromoRepresentationMixin:
+    """
+    Renders promos for their company from the cached company
+    representation (PromoReadOnlySerializer).
+    """
+
+    def render_promos(self, promo_ids, load=None):
+        promos = core.representation_cache.representation_cache.render(
+            core.representation_cache.VARIANT_COMPANY,
+            promo_ids,
+            load or self._render_company_fragments,
+        )
+        user.like_buffer.apply_pending(promos)
+        return promos
+
+    def _render_company_fragments(self, promo_ids):
+        promos = business.models.Promo.objects.with_related().filter(
+            pk__in=promo_ids,
+        )
+        return self._serialize(promos)
+
+    def _serialize(self, promos):
+        serializer = business.serializers.PromoReadOnlySerializer(
+            promos,
+            many=True,
+            context=self.get_serializer_context(),
+        )
+        return {data['promo_id']: dict(data) for data in serializer.data}
+
+
+class CompanyPromoListCreateView(
+    CompanyPromoRepresentationMixin,
+    rest_framework.generics.ListCreateAPIView,
+):
     """
     View for listing (GET) and creating (POST) company promos.
     """
@@ -75,6 +111,7 @@ class CompanyPromoListCreateView(rest_framework.generics.ListCreateAPIView):
         business.permissions.IsCompanyUser,
     ]
     pagination_class = core.pagination.CustomLimitOffsetPagination
+    count_strategy = django.conf.settings.PROMO_LIST_COUNT_STRATEGY
 
     def get_serializer_class(self):
         if self.request.method == 'POST':
@@ -111,6 +148,14 @@ class CompanyPromoListCreateView(rest_framework.generics.ListCreateAPIView):
 
         return queryset.order_by(ordering)
 
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        promo_ids = self.paginate_queryset(
+            queryset.prefetch_related(None).values_list('id', flat=True),
+        )
+        promos = self.render_promos([str(pk) for pk in promo_ids])
+        return self.get_paginated_response(promos)
+
     def perform_create(self, serializer):
         return serializer.save()
 
@@ -128,7 +173,10 @@ class CompanyPromoListCreateView(rest_framework.generics.ListCreateAPIView):
         )
 
 
-class CompanyPromoDetailView(rest_framework.generics.RetrieveUpdateAPIView):
+class CompanyPromoDetailView(
+    CompanyPromoRepresentationMixin,
+    rest_framework.generics.RetrieveUpdateAPIView,
+):
     """
     Retrieve (GET) and partially update (PATCH) detailed information
     about a company’s promo.
@@ -150,6 +198,22 @@ class CompanyPromoDetailView(rest_framework.generics.RetrieveUpdateAPIView):
     # so that ownership mismatches raise 403 Forbidden (not 404 Not Found).
     queryset = business.models.Promo.objects.with_related()
 
+    def retrieve(self, request, *args, **kwargs):
+        promo_id = str(kwargs[self.lookup_field])
+        # On a miss get_object() checks existence and ownership itself.
+        (fragment,) = self.render_promos(
+            [promo_id],
+            load=lambda promo_ids: self._serialize([self.get_object()]),
+        )
+        if fragment['company_id'] != str(request.user.id):
+            self.permission_denied(
+                request,
+                message=business.permissions.IsPromoOwner.message,
+            )
+
+        fragment.pop('company_id')
+        return rest_framework.response.Response(fragment)
+
 
 class CompanyPromoStatAPIView(rest_framework.views.APIView):
     """
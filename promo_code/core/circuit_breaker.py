@@ -0,0 +1,163 @@
+import time
+import typing
+import uuid
+
+import asgiref.sync
+import django_redis
+import redis.exceptions
+
+import core.metrics
+
+STATE_CLOSED = 'closed'
+STATE_OPEN = 'open'
+STATE_HALF_OPEN = 'half_open'
+
+
+class CircuitBreaker:
+    """
+    A circuit breaker whose state lives in Redis, so every worker process
+    stops calling a failing upstream at the same time.
+
+    * closed: calls pass through; failures of the last `window` seconds
+      are counted (a sliding window: their timestamps are kept in a
+      sorted set). Reaching `failure_threshold` opens the circuit.
+    * open: calls are rejected for `reset_timeout` seconds.
+    * half-open: once the timeout has elapsed a single call across all
+      workers is let through as a probe. Its success closes the circuit,
+      its failure opens it again.
+
+    If Redis is unreachable the breaker stays out of the way and lets
+    every call through.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int,
+        reset_timeout: int,
+        window: int,
+        probe_timeout: int,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.window = window
+        self.probe_timeout = probe_timeout
+
+        prefix = f'circuit:{name}'
+        self.failures_key = f'{prefix}:failures'
+        self.open_key = f'{prefix}:open'
+        self.tripped_key = f'{prefix}:tripped'
+        self.probe_key = f'{prefix}:probe'
+
+    @staticmethod
+    def _connection():
+        return django_redis.get_redis_connection('default')
+
+    def _metric(self, event: str) -> None:
+        core.metrics.incr(f'circuit.{self.name}.{event}')
+
+    def state(self) -> str:
+        """Returns the current state without changing it."""
+        try:
+            is_open, tripped = self._connection().mget(
+                self.open_key,
+                self.tripped_key,
+            )
+        except redis.exceptions.RedisError:
+            return STATE_CLOSED
+
+        if tripped is None:
+            return STATE_CLOSED
+        return STATE_OPEN if is_open is not None else STATE_HALF_OPEN
+
+    def allow_request(self) -> typing.Optional[str]:
+        """
+        Returns the state the call is allowed under (closed or half-open),
+        or None if the call must not be made. The returned value has to
+        be passed back to record_success() or record_failure().
+        """
+        state = self.state()
+        if state == STATE_CLOSED:
+            return STATE_CLOSED
+
+        if state == STATE_HALF_OPEN:
+            try:
+                acquired = self._connection().set(
+                    self.probe_key,
+                    1,
+                    nx=True,
+                    ex=self.probe_timeout,
+                )
+            except redis.exceptions.RedisError:
+                return STATE_CLOSED
+
+            if acquired:
+                self._metric('half_opened')
+                return STATE_HALF_OPEN
+
+        self._metric('rejected')
+        return None
+
+    def record_success(self, state: str) -> None:
+        if state != STATE_HALF_OPEN:
+            return
+
+        try:
+            self._connection().delete(
+                self.tripped_key,
+                self.open_key,
+                self.probe_key,
+                self.failures_key,
+            )
+        except redis.exceptions.RedisError:
+            return
+        self._metric('closed')
+
+    def record_failure(self, state: str) -> None:
+        if state == STATE_HALF_OPEN:
+            self._trip()
+            return
+
+        now = time.time()
+        try:
+            pipe = self._connection().pipeline(transaction=True)
+            pipe.zadd(self.failures_key, {uuid.uuid4().hex: now})
+            pipe.zremrangebyscore(self.failures_key, '-inf', now - self.window)
+            pipe.zcard(self.failures_key)
+            pipe.expire(self.failures_key, self.window)
+            _, _, failures, _ = pipe.execute()
+        except redis.exceptions.RedisError:
+            return
+
+        if failures >= self.failure_threshold:
+            self._trip()
+
+    def _trip(self) -> None:
+        try:
+            conn = self._connection()
+            opened = conn.set(
+                self.open_key,
+                1,
+                nx=True,
+                ex=self.reset_timeout,
+            )
+            pipe = conn.pipeline(transaction=False)
+            pipe.set(self.tripped_key, 1)
+            pipe.delete(self.failures_key, self.probe_key)
+            pipe.execute()
+        except redis.exceptions.RedisError:
+            return
+
+        if opened:
+            self._metric('opened')
+
+    async def aallow_request(self) -> typing.Optional[str]:
+        return await asgiref.sync.sync_to_async(self.allow_request)()
+
+    async def arecord_success(self, state: str) -> None:
+        if state == STATE_HALF_OPEN:
+            await asgiref.sync.sync_to_async(self.record_success)(state)
+
+    async def arecord_failure(self, state: str) -> None:
+        await asgiref.sync.sync_to_async(self.record_failure)(state)
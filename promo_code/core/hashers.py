@@ -0,0 +1,160 @@
+import concurrent.futures
+import multiprocessing
+import threading
+import typing
+
+import django
+import django.conf
+import django.contrib.auth.hashers
+import rest_framework.exceptions
+
+import core.metrics
+
+# Argon2 cost parameters (time_cost, memory_cost in KiB, parallelism),
+# selected with PASSWORD_HASH_PROFILE. Hashes made with another profile
+# still verify and are rehashed with the current one on the next sign-in.
+PROFILES = {
+    # Minimum recommended by OWASP: 19 MiB, two passes, one lane.
+    'interactive': (2, 19456, 1),
+    # Django's own Argon2 parameters.
+    'default': (2, 102400, 8),
+    'sensitive': (3, 262144, 4),
+}
+
+
+class PasswordHashingBusy(rest_framework.exceptions.APIException):
+    status_code = 503
+    default_detail = 'Too many sign-in attempts are in progress, retry later.'
+    default_code = 'password_hashing_busy'
+
+
+def _hasher(params):
+    hasher = django.contrib.auth.hashers.Argon2PasswordHasher()
+    hasher.time_cost, hasher.memory_cost, hasher.parallelism = params
+    return hasher
+
+
+def encode(params, password: str, salt: str) -> str:
+    return _hasher(params).encode(password, salt)
+
+
+def verify(params, password: str, encoded: str) -> bool:
+    return _hasher(params).verify(password, encoded)
+
+
+class HashingPool:
+    """
+    Runs password hashing in a pool of worker processes.
+
+    Argon2 is CPU-bound and holds a request thread for tens of
+    milliseconds, so a burst of sign-ins would otherwise occupy every
+    web worker. The pool caps the CPU spent on hashing at `workers`
+    cores and admits at most `max_pending` more calls waiting for a
+    process; further calls fail right away with PasswordHashingBusy
+    (503) instead of queueing behind the burst.
+
+    With workers=0 hashing runs on the calling thread.
+    """
+
+    def __init__(
+        self,
+        workers: int = django.conf.settings.PASSWORD_HASHING_WORKERS,
+        max_pending: int = django.conf.settings.PASSWORD_HASHING_MAX_PENDING,
+        timeout: float = django.conf.settings.PASSWORD_HASHING_TIMEOUT,
+    ):
+        self.workers = workers
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(workers + max_pending)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> concurrent.futures.ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = concurrent.futures.ProcessPoolExecutor(
+                    self.workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=django.setup,
+                )
+            return self._executor
+
+    def run(self, func: typing.Callable, *args):
+        if not self.workers:
+            return func(*args)
+
+        if not self._slots.acquire(blocking=False):
+            core.metrics.incr('password_hashing.rejected')
+            raise PasswordHashingBusy()
+
+        try:
+            future = self._get_executor().submit(func, *args)
+        except concurrent.futures.process.BrokenProcessPool:
+            self._slots.release()
+            self.shutdown()
+            return func(*args)
+
+        slot = [None]
+
+        def release(_future=None):
+            # Runs once, from whichever path below gets here first.
+            try:
+                slot.pop()
+            except IndexError:
+                return
+            self._slots.release()
+
+        # The slot is held until the work is done, even if the caller
+        # gave up waiting.
+        future.add_done_callback(release)
+        try:
+            return future.result(timeout=self.timeout)
+        except concurrent.futures.TimeoutError:
+            core.metrics.incr('password_hashing.timeouts')
+            raise PasswordHashingBusy()
+        except concurrent.futures.process.BrokenProcessPool:
+            # A worker died mid-hash; the next call starts a new pool.
+            release()
+            self.shutdown()
+            core.metrics.incr('password_hashing.broken_pool')
+            raise PasswordHashingBusy()
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+hashing_pool = HashingPool()
+
+
+class ProfiledArgon2PasswordHasher(
+    django.contrib.auth.hashers.Argon2PasswordHasher,
+):
+    """
+    Argon2 with the cost parameters of PASSWORD_HASH_PROFILE, computed
+    in the hashing pool. Its hashes are plain Argon2 hashes, so this
+    hasher and Django's own one verify each other's passwords.
+    """
+
+    @property
+    def profile(self) -> typing.Tuple[int, int, int]:
+        return PROFILES[django.conf.settings.PASSWORD_HASH_PROFILE]
+
+    @property
+    def time_cost(self):
+        return self.profile[0]
+
+    @property
+    def memory_cost(self):
+        return self.profile[1]
+
+    @property
+    def parallelism(self):
+        return self.profile[2]
+
+    def encode(self, password, salt):
+        return hashing_pool.run(encode, self.profile, password, salt)
+
+    def verify(self, password, encoded):
+        return hashing_pool.run(verify, self.profile, password, encoded)
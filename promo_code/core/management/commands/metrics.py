@@ -0,0 +1,25 @@
+import json
+
+import django.core.management.base
+
+import core.metrics
+
+
+class Command(django.core.management.base.BaseCommand):
+    help = (
+        'Prints the counters and latency percentiles collected '
+        'by all worker processes.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset',
+            action='store_true',
+            help='Clear all recorded metrics after printing them.',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(json.dumps(core.metrics.snapshot(), indent=2))
+
+        if options['reset']:
+            core.metrics.reset()
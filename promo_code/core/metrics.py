@@ -0,0 +1,218 @@
+import asyncio
+import atexit
+import bisect
+import collections
+import concurrent.futures
+import contextlib
+import os
+import threading
+import time
+
+import django.conf
+import django_redis
+import redis.exceptions
+
+KEY_PREFIX = 'metrics'
+COUNTERS_KEY = f'{KEY_PREFIX}:counters'
+
+# Upper bounds (in milliseconds) of the latency histogram buckets.
+LATENCY_BUCKETS_MS = (
+    1,
+    2,
+    5,
+    10,
+    25,
+    50,
+    100,
+    250,
+    500,
+    1000,
+    2500,
+    5000,
+    10000,
+)
+OVERFLOW_BUCKET = '+Inf'
+
+
+def _histogram_key(name):
+    return f'{KEY_PREFIX}:histogram:{name}'
+
+
+def _connection():
+    return django_redis.get_redis_connection('default')
+
+
+# Values are buffered per process and written to Redis at most once per
+# METRICS_FLUSH_INTERVAL seconds, so recording a metric is normally free
+# of network round trips.
+_lock = threading.Lock()
+_pending_counters = collections.Counter()
+_pending_histograms = collections.defaultdict(collections.Counter)
+_last_flush = time.monotonic()
+_flush_executor = None
+_flush_executor_pid = None
+
+
+def incr(name, amount=1):
+    """Increments a counter shared by all worker processes."""
+    with _lock:
+        _pending_counters[name] += amount
+    _maybe_flush()
+
+
+def observe(name, seconds):
+    """Records a duration in the latency histogram with the given name."""
+    ms = seconds * 1000
+    index = bisect.bisect_left(LATENCY_BUCKETS_MS, ms)
+    bucket = (
+        str(LATENCY_BUCKETS_MS[index])
+        if index < len(LATENCY_BUCKETS_MS)
+        else OVERFLOW_BUCKET
+    )
+
+    with _lock:
+        histogram = _pending_histograms[name]
+        histogram[bucket] += 1
+        histogram['count'] += 1
+        histogram['sum_ms'] += ms
+    _maybe_flush()
+
+
+def _get_flush_executor():
+    """Returns the thread that flushes on behalf of event loops."""
+    global _flush_executor, _flush_executor_pid
+
+    pid = os.getpid()
+    if _flush_executor is None or _flush_executor_pid != pid:
+        _flush_executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=1,
+            thread_name_prefix='metrics-flush',
+        )
+        _flush_executor_pid = pid
+
+    return _flush_executor
+
+
+def _maybe_flush():
+    interval = getattr(django.conf.settings, 'METRICS_FLUSH_INTERVAL', 1.0)
+    if time.monotonic() - _last_flush < interval:
+        return
+
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        flush()
+    else:
+        # Called from async code: the Redis round trip would stall the
+        # event loop, so it is made on a background thread.
+        _get_flush_executor().submit(flush)
+
+
+def flush():
+    """
+    Writes buffered values to Redis in one pipeline.
+    Metrics are best effort: Redis errors are swallowed.
+    """
+    global _last_flush
+
+    with _lock:
+        counters = dict(_pending_counters)
+        histograms = {
+            name: dict(values) for name, values in _pending_histograms.items()
+        }
+        _pending_counters.clear()
+        _pending_histograms.clear()
+        _last_flush = time.monotonic()
+
+    if not counters and not histograms:
+        return
+
+    with contextlib.suppress(redis.exceptions.RedisError):
+        pipe = _connection().pipeline(transaction=False)
+        for name, amount in counters.items():
+            pipe.hincrby(COUNTERS_KEY, name, amount)
+        for name, values in histograms.items():
+            key = _histogram_key(name)
+            for field, value in values.items():
+                if field == 'sum_ms':
+                    pipe.hincrbyfloat(key, field, value)
+                else:
+                    pipe.hincrby(key, field, value)
+        pipe.execute()
+
+
+atexit.register(flush)
+
+
+def _read_histogram(name):
+    try:
+        raw = _connection().hgetall(_histogram_key(name))
+    except redis.exceptions.RedisError:
+        return {}
+    return {key.decode(): float(value) for key, value in raw.items()}
+
+
+def _quantile(histogram, q):
+    count = histogram.get('count', 0)
+    if not count:
+        return None
+
+    rank = q * count
+    seen = 0
+    for bound in LATENCY_BUCKETS_MS:
+        seen += histogram.get(str(bound), 0)
+        if seen >= rank:
+            return float(bound)
+    return float('inf')
+
+
+def quantile(name, q):
+    """
+    Returns the upper bound (in milliseconds) of the histogram bucket
+    holding the q-th quantile, or None if nothing has been recorded.
+    Values still buffered in this process are not included.
+    """
+    return _quantile(_read_histogram(name), q)
+
+
+def snapshot():
+    """Returns all counters and histogram summaries."""
+    flush()
+    try:
+        conn = _connection()
+        counters = conn.hgetall(COUNTERS_KEY)
+        histogram_keys = list(conn.scan_iter(_histogram_key('*')))
+    except redis.exceptions.RedisError:
+        return {'counters': {}, 'histograms': {}}
+
+    histograms = {}
+    prefix_length = len(_histogram_key(''))
+    for key in histogram_keys:
+        name = key.decode()[prefix_length:]
+        histogram = _read_histogram(name)
+        count = int(histogram.get('count', 0))
+        histograms[name] = {
+            'count': count,
+            'avg_ms': histogram.get('sum_ms', 0) / count if count else None,
+            'p50_ms': _quantile(histogram, 0.5),
+            'p95_ms': _quantile(histogram, 0.95),
+            'p99_ms': _quantile(histogram, 0.99),
+        }
+
+    return {
+        'counters': {
+            key.decode(): int(value) for key, value in counters.items()
+        },
+        'histograms': histograms,
+    }
+
+
+def reset():
+    """Removes all recorded metrics."""
+    with _lock:
+        _pending_counters.clear()
+        _pending_histograms.clear()
+
+    with contextlib.suppress(redis.exceptions.RedisError):
+        conn = _connection()
+        conn.delete(COUNTERS_KEY, *conn.scan_iter(_histogram_key('*')))
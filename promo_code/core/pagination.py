@@ -1,14 +1,46 @@
+import base64
+import binascii
+import datetime
+import hashlib
+import json
+import uuid
+
+import django.conf
+import django.core.cache
+import django.db
+import django.db.models
+import rest_framework.exceptions
 import rest_framework.pagination
 import rest_framework.response
 
 import core.serializers
 
+COUNT_EXACT = 'exact'
+COUNT_CACHED = 'cached'
+COUNT_ESTIMATE = 'estimate'
+COUNT_NONE = 'none'
+
 
 class CustomLimitOffsetPagination(
     rest_framework.pagination.LimitOffsetPagination,
 ):
+    """
+    Limit/offset pagination reporting the total in X-Total-Count.
+
+    How the total is obtained is chosen by the view's `count_strategy`:
+    * exact: COUNT(*) on every page (default);
+    * cached: COUNT(*) cached for PAGINATION_COUNT_CACHE_TIMEOUT seconds,
+      keyed by a fingerprint of the filtered query;
+    * estimate: the planner's row estimate from EXPLAIN, falling back to
+      COUNT(*) for small results. X-Total-Count-Estimated is set;
+    * none: no count and no X-Total-Count header.
+    """
+
     default_limit = 10
     max_limit = 100
+    count_strategy = COUNT_EXACT
+    # Below this many estimated rows an exact count is cheap enough.
+    estimate_exact_threshold = 1000
 
     def get_limit(self, request):
         serializer = core.serializers.BaseLimitOffsetPaginationSerializer(
@@ -22,7 +54,144 @@ class CustomLimitOffsetPagination(
         # Allow 0, otherwise cut by max_limit
         return 0 if limit == 0 else min(limit, self.max_limit)
 
+    def paginate_queryset(self, queryset, request, view=None):
+        self.strategy = getattr(view, 'count_strategy', self.count_strategy)
+        self.count_is_estimate = False
+        if self.strategy == COUNT_EXACT:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        self.limit = self.get_limit(request)
+        self.offset = self.get_offset(request)
+        self.count = self.get_count(queryset)
+        if self.count == 0 and not self.count_is_estimate:
+            return []
+        return list(queryset[self.offset : self.offset + self.limit])
+
+    def get_count(self, queryset):
+        strategy = getattr(self, 'strategy', COUNT_EXACT)
+        if strategy == COUNT_CACHED:
+            return self._cached_count(queryset)
+        if strategy == COUNT_ESTIMATE:
+            return self._estimated_count(queryset)
+        if strategy == COUNT_NONE:
+            return None
+        return super().get_count(queryset)
+
+    @staticmethod
+    def _fingerprint(queryset):
+        sql, params = queryset.query.sql_with_params()
+        raw = f'{queryset.db}:{sql}:{params!r}'.encode()
+        return hashlib.sha1(raw, usedforsecurity=False).hexdigest()
+
+    def _cached_count(self, queryset):
+        key = f'pagination:count:{self._fingerprint(queryset)}'
+        count = django.core.cache.cache.get(key)
+        if count is None:
+            count = queryset.count()
+            django.core.cache.cache.set(
+                key,
+                count,
+                timeout=django.conf.settings.PAGINATION_COUNT_CACHE_TIMEOUT,
+            )
+        return count
+
+    def _estimated_count(self, queryset):
+        connection = django.db.connections[queryset.db]
+        if connection.vendor != 'postgresql':
+            return queryset.count()
+
+        sql, params = queryset.order_by().query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        estimate = int(plan[0]['Plan']['Plan Rows'])
+        if estimate < self.estimate_exact_threshold:
+            return queryset.count()
+
+        self.count_is_estimate = True
+        return estimate
+
+    def get_paginated_response(self, data):
+        response = rest_framework.response.Response(data)
+        if self.count is not None:
+            response.headers['X-Total-Count'] = str(self.count)
+        if self.count_is_estimate:
+            response.headers['X-Total-Count-Estimated'] = 'true'
+        return response
+
+
+class KeysetLimitOffsetPagination(CustomLimitOffsetPagination):
+    """
+    Limit/offset pagination with an opt-in keyset (cursor) mode.
+
+    Without a `cursor` query parameter it behaves exactly like
+    CustomLimitOffsetPagination. With one (empty for the first page),
+    rows are sought past the (created_at, id) position encoded in the
+    cursor instead of skipping `offset` rows, no COUNT(*) is run, and
+    the cursor of the next page is returned in the X-Next-Cursor header.
+    """
+
+    cursor_query_param = 'cursor'
+    ordering = ('-created_at', '-id')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.use_cursor = self.cursor_query_param in request.query_params
+        if not self.use_cursor:
+            return super().paginate_queryset(queryset, request, view)
+
+        if self.offset_query_param in request.query_params:
+            raise rest_framework.exceptions.ValidationError(
+                {'cursor': ['Cannot be combined with offset.']},
+            )
+
+        self.limit = self.get_limit(request)
+        self.next_cursor = None
+        if self.limit == 0:
+            return []
+
+        queryset = queryset.order_by(*self.ordering)
+        cursor = request.query_params[self.cursor_query_param]
+        if cursor:
+            created_at, pk = self.decode_cursor(cursor)
+            queryset = queryset.filter(
+                django.db.models.Q(created_at__lt=created_at)
+                | django.db.models.Q(created_at=created_at, pk__lt=pk),
+            )
+
+        page = list(queryset[: self.limit + 1])
+        if len(page) > self.limit:
+            page = page[: self.limit]
+            self.next_cursor = self.encode_cursor(page[-1])
+
+        return page
+
     def get_paginated_response(self, data):
+        if not self.use_cursor:
+            return super().get_paginated_response(data)
+
         response = rest_framework.response.Response(data)
-        response.headers['X-Total-Count'] = str(self.count)
+        if self.next_cursor:
+            response.headers['X-Next-Cursor'] = self.next_cursor
         return response
+
+    @staticmethod
+    def encode_cursor(instance):
+        position = f'{instance.created_at.isoformat()}|{instance.pk}'
+        encoded = base64.urlsafe_b64encode(position.encode())
+        return encoded.decode().rstrip('=')
+
+    @staticmethod
+    def decode_cursor(cursor):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            position = base64.urlsafe_b64decode(padded).decode()
+            created_at, pk = position.split('|')
+            return datetime.datetime.fromisoformat(created_at), uuid.UUID(pk)
+        except (ValueError, binascii.Error):
+            raise rest_framework.exceptions.ValidationError(
+                {'cursor': ['Invalid cursor.']},
+            ) from None
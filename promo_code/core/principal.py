@@ -0,0 +1,319 @@
+import contextlib
+import json
+import time
+import typing
+import uuid
+
+import django.apps
+import django.conf
+import django_redis
+import redis.exceptions
+
+import core.utils.lru
+
+USER = 'user'
+COMPANY = 'company'
+
+MODELS = {
+    USER: 'user.User',
+    COMPANY: 'business.Company',
+}
+
+# Sets a hash field to ARGV[2] unless it already holds a greater number.
+SET_MAX_SCRIPT = """
+local current = tonumber(redis.call('HGET', KEYS[1], ARGV[1]))
+if not current or current < tonumber(ARGV[2]) then
+    redis.call('HSET', KEYS[1], ARGV[1], ARGV[2])
+end
+"""
+
+
+class Principal:
+    """
+    The authenticated user or company of a request.
+
+    Holds only what requests need, so it can be cached as a short JSON
+    array instead of a pickled model instance. The model instance itself
+    is loaded, with a single query, the first time `instance` is used.
+    """
+
+    __slots__ = (
+        'id',
+        'type',
+        'token_version',
+        'email',
+        'age',
+        'country',
+        '_instance',
+    )
+
+    is_authenticated = True
+    is_anonymous = False
+
+    def __init__(
+        self,
+        id: uuid.UUID,
+        type: str,
+        token_version: int,
+        email: str,
+        age: typing.Optional[int] = None,
+        country: typing.Optional[str] = None,
+    ):
+        self.id = id
+        self.type = type
+        self.token_version = token_version
+        self.email = email
+        self.age = age
+        self.country = country
+        self._instance = None
+
+    @classmethod
+    def from_instance(cls, instance) -> 'Principal':
+        other = getattr(instance, 'other', None) or {}
+        principal = cls(
+            id=instance.id,
+            type=instance._meta.model_name,
+            token_version=instance.token_version,
+            email=instance.email,
+            age=other.get('age'),
+            country=other.get('country'),
+        )
+        principal._instance = instance
+        return principal
+
+    @classmethod
+    def from_fields(cls, fields: typing.Sequence) -> 'Principal':
+        id_, *rest = fields
+        return cls(uuid.UUID(id_), *rest)
+
+    def to_fields(self) -> typing.List:
+        return [
+            str(self.id),
+            self.type,
+            self.token_version,
+            self.email,
+            self.age,
+            self.country,
+        ]
+
+    @property
+    def pk(self) -> uuid.UUID:
+        return self.id
+
+    @property
+    def is_company(self) -> bool:
+        return self.type == COMPANY
+
+    @property
+    def instance(self):
+        """The User or Company instance, loaded on first access."""
+        if self._instance is None:
+            model = django.apps.apps.get_model(MODELS[self.type])
+            self._instance = model.objects.get(id=self.id)
+        return self._instance
+
+    def __eq__(self, other):
+        if not isinstance(other, Principal):
+            return NotImplemented
+        return (self.type, self.id) == (other.type, other.id)
+
+    def __hash__(self):
+        return hash((self.type, self.id))
+
+    def __str__(self):
+        return self.email
+
+    def __repr__(self):
+        return f'<Principal {self.type} {self.id}>'
+
+
+class TokenVersionRegistry:
+    """
+    Current token_version of each user and company, kept in Redis.
+
+    Tokens carry the version they were issued with, so checking a token
+    takes a single HGET instead of a database query. bump_token_version
+    writes the new version through; principals that are not registered
+    yet (or after Redis lost its data) are looked up in the database
+    once. Versions only ever grow, so a write never replaces a newer
+    version with an older one that was read concurrently.
+
+    Versions are also kept in-process for `local_timeout` seconds,
+    which bounds how long a revoked token is still accepted by other
+    workers. 0 checks Redis on every request. A token newer than the
+    version kept in-process always goes on to Redis, so a fresh sign-in
+    is never rejected by a worker that cached the version before it.
+
+    Key schema:
+        auth:token_versions:{type}    hash {id: token_version}
+    """
+
+    KEY_PREFIX = 'auth:token_versions'
+
+    def __init__(
+        self,
+        local_size: int = django.conf.settings.AUTH_PRINCIPAL_LRU_SIZE,
+        local_timeout: float = (
+            django.conf.settings.AUTH_TOKEN_VERSION_CACHE_TIMEOUT
+        ),
+    ):
+        self.local_timeout = local_timeout
+        self.local = core.utils.lru.TTLCache(
+            local_size if local_timeout > 0 else 0,
+        )
+
+    @classmethod
+    def key(cls, principal_type: str) -> str:
+        return f'{cls.KEY_PREFIX}:{principal_type}'
+
+    @staticmethod
+    def _connection():
+        return django_redis.get_redis_connection('default')
+
+    def get(
+        self,
+        principal_type: str,
+        principal_id,
+        at_least: typing.Optional[int] = None,
+    ) -> typing.Optional[int]:
+        """
+        Returns the current token version, or None if the principal is
+        not registered or Redis is unreachable. A version kept in-process
+        that is older than `at_least` is stale and not returned.
+        """
+        local_key = (principal_type, str(principal_id))
+        version = self.local.get(local_key)
+        if version is not None and (at_least is None or version >= at_least):
+            return version
+
+        try:
+            raw = self._connection().hget(
+                self.key(principal_type),
+                str(principal_id),
+            )
+        except redis.exceptions.RedisError:
+            return None
+        if raw is None:
+            return None
+
+        version = int(raw)
+        self.local.set(local_key, version, time.time() + self.local_timeout)
+        return version
+
+    def _set_max(self, principal_type: str, principal_id, version: int):
+        self.local.delete((principal_type, str(principal_id)))
+        self._connection().eval(
+            SET_MAX_SCRIPT,
+            1,
+            self.key(principal_type),
+            str(principal_id),
+            version,
+        )
+
+    def register(
+        self,
+        principal_type: str,
+        principal_id,
+        version: int,
+    ) -> None:
+        """
+        Records a version loaded from the database unless a newer one is
+        registered. Best effort: reads fall back to the database anyway.
+        """
+        with contextlib.suppress(redis.exceptions.RedisError):
+            self._set_max(principal_type, principal_id, version)
+
+    def set(self, principal_type: str, principal_id, version: int) -> None:
+        """
+        Records a bumped version. If Redis rejects the write, the old
+        version is removed instead, so reads fall back to the database
+        rather than keep accepting revoked tokens. Raises RedisError if
+        even that fails.
+        """
+        try:
+            self._set_max(principal_type, principal_id, version)
+        except redis.exceptions.RedisError:
+            self._connection().hdel(
+                self.key(principal_type),
+                str(principal_id),
+            )
+
+
+class PrincipalCache:
+    """
+    Two-tier cache of authenticated principals.
+
+    A small in-process LRU with a short lifetime sits in front of Redis,
+    so most requests authenticate without a network round trip. Whether
+    a token is still valid is decided by TokenVersionRegistry; entries
+    here only spare loading the user or company from the database.
+
+    Key schema:
+        auth:principal:v2:{type}:{id}
+            JSON [id, type, token_version, email, age, country]
+    """
+
+    KEY_PREFIX = 'auth:principal:v2'
+
+    def __init__(
+        self,
+        timeout: int = django.conf.settings.AUTH_INSTANCE_CACHE_TIMEOUT,
+        local_size: int = django.conf.settings.AUTH_PRINCIPAL_LRU_SIZE,
+        local_timeout: float = (
+            django.conf.settings.AUTH_PRINCIPAL_LRU_TIMEOUT
+        ),
+    ):
+        self.timeout = timeout
+        self.local_timeout = local_timeout
+        self.local = core.utils.lru.TTLCache(local_size)
+
+    @classmethod
+    def key(cls, principal_type: str, principal_id) -> str:
+        return f'{cls.KEY_PREFIX}:{principal_type}:{principal_id}'
+
+    @staticmethod
+    def _connection():
+        return django_redis.get_redis_connection('default')
+
+    def get(
+        self,
+        principal_type: str,
+        principal_id,
+    ) -> typing.Optional[Principal]:
+        """
+        Returns a fresh Principal, or None on a miss. Principals are
+        never shared between requests, only their fields.
+        """
+        key = self.key(principal_type, principal_id)
+        if (fields := self.local.get(key)) is not None:
+            return Principal.from_fields(fields)
+
+        try:
+            raw = self._connection().get(key)
+        except redis.exceptions.RedisError:
+            return None
+        if raw is None:
+            return None
+
+        fields = json.loads(raw)
+        self.local.set(key, fields, time.time() + self.local_timeout)
+        return Principal.from_fields(fields)
+
+    def set(self, principal: Principal) -> None:
+        """Stores the principal in both tiers."""
+        key = self.key(principal.type, principal.id)
+        fields = principal.to_fields()
+
+        self.local.set(key, fields, time.time() + self.local_timeout)
+        with contextlib.suppress(redis.exceptions.RedisError):
+            self._connection().set(key, json.dumps(fields), ex=self.timeout)
+
+    def invalidate(self, principal_type: str, principal_id) -> None:
+        key = self.key(principal_type, principal_id)
+        self.local.delete(key)
+        with contextlib.suppress(redis.exceptions.RedisError):
+            self._connection().delete(key)
+
+
+token_versions = TokenVersionRegistry()
+principal_cache = PrincipalCache()
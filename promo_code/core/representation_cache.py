@@ -0,0 +1,136 @@
+import contextlib
+import json
+import typing
+
+import django.conf
+import django.utils.timezone
+import django_redis
+import redis.exceptions
+
+import core.metrics
+import core.utils.transaction
+
+# Representation shown to users, without the per-user flags.
+VARIANT_USER = 'user'
+# Representation shown to the owning company.
+VARIANT_COMPANY = 'company'
+
+
+class RepresentationCache:
+    """
+    Redis cache of pre-rendered promo representations.
+
+    Each promo has a hash holding one JSON fragment per serializer
+    variant, so a page is assembled from stored fragments instead of
+    running the serializer fields (and the queries behind them) for
+    every promo. Deleting the hash drops every variant at once; this
+    happens on Promo save and delete, which covers like and comment
+    counters, on activations and on availability changes. The date is
+    part of the key because `active` depends on it.
+
+    Key schema:
+        promo:repr:{date}:{promo_id}    {variant: fragment}
+    """
+
+    KEY_PREFIX = 'promo:repr'
+
+    def __init__(
+        self,
+        timeout: int = (
+            django.conf.settings.PROMO_REPRESENTATION_CACHE_TIMEOUT
+        ),
+        enabled: bool = (
+            django.conf.settings.PROMO_REPRESENTATION_CACHE_ENABLED
+        ),
+    ):
+        self.timeout = timeout
+        self.enabled = enabled
+
+    @classmethod
+    def key(cls, promo_id: str) -> str:
+        today = django.utils.timezone.now().date().isoformat()
+        return f'{cls.KEY_PREFIX}:{today}:{promo_id}'
+
+    @staticmethod
+    def _connection():
+        return django_redis.get_redis_connection('default')
+
+    def get_many(
+        self,
+        variant: str,
+        promo_ids: typing.List[str],
+    ) -> typing.Dict[str, typing.Dict]:
+        """Returns the cached fragments of the given promos by id."""
+        if not self.enabled or not promo_ids:
+            return {}
+
+        try:
+            pipe = self._connection().pipeline(transaction=False)
+            for promo_id in promo_ids:
+                pipe.hget(self.key(promo_id), variant)
+            values = pipe.execute()
+        except redis.exceptions.RedisError:
+            return {}
+
+        return {
+            promo_id: json.loads(raw)
+            for promo_id, raw in zip(promo_ids, values, strict=True)
+            if raw is not None
+        }
+
+    def set_many(
+        self,
+        variant: str,
+        fragments: typing.Dict[str, typing.Dict],
+    ) -> None:
+        if not self.enabled or not fragments:
+            return
+
+        with contextlib.suppress(redis.exceptions.RedisError):
+            pipe = self._connection().pipeline(transaction=False)
+            for promo_id, fragment in fragments.items():
+                key = self.key(promo_id)
+                pipe.hset(key, variant, json.dumps(fragment))
+                pipe.expire(key, self.timeout)
+            pipe.execute()
+
+    def render(
+        self,
+        variant: str,
+        promo_ids: typing.List[str],
+        load: typing.Callable[
+            [typing.List[str]],
+            typing.Dict[str, typing.Dict],
+        ],
+    ) -> typing.List[typing.Dict]:
+        """
+        Returns the fragments of the given promos in order. Missing ones
+        are rendered by load(missing_ids), which returns them by id, and
+        stored. Promos load() does not return are left out.
+        """
+        fragments = self.get_many(variant, promo_ids)
+        core.metrics.incr('promo_representation.hits', len(fragments))
+
+        missing = [pk for pk in promo_ids if pk not in fragments]
+        if missing:
+            core.metrics.incr('promo_representation.misses', len(missing))
+            loaded = load(missing)
+            self.set_many(variant, loaded)
+            fragments.update(loaded)
+
+        return [fragments[pk] for pk in promo_ids if pk in fragments]
+
+    def invalidate(self, promo_ids: typing.Iterable[str]) -> None:
+        """Drops every cached variant of the given promos."""
+        keys = [self.key(str(promo_id)) for promo_id in promo_ids]
+        if keys:
+            core.utils.transaction.now_and_on_commit(
+                lambda: self._delete(keys),
+            )
+
+    def _delete(self, keys: typing.List[str]) -> None:
+        with contextlib.suppress(redis.exceptions.RedisError):
+            self._connection().delete(*keys)
+
+
+representation_cache = RepresentationCache()
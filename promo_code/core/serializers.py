@@ -365,22 +365,30 @@ class BaseUserPromoSerializer(rest_framework.serializers.ModelSerializer):
     def get_is_liked_by_user(self, obj: business.models.Promo) -> bool:
         """
         Checks whether the current user has liked this promo.
+        Uses the '_is_liked_by_user' annotation when present.
         """
+        if hasattr(obj, '_is_liked_by_user'):
+            return obj._is_liked_by_user
+
         request = self.context['request']
         return user.models.PromoLike.objects.filter(
             promo=obj,
-            user=request.user,
+            user_id=request.user.id,
         ).exists()
 
     def get_is_activated_by_user(self, obj: business.models.Promo) -> bool:
         """
         Checks whether the current user has activated this promo code.
+        Uses the '_is_activated_by_user' annotation when present.
         """
+        if hasattr(obj, '_is_activated_by_user'):
+            return obj._is_activated_by_user
+
         request = self.context.get('request')
 
         return user.models.PromoActivationHistory.objects.filter(
             promo=obj,
-            user=request.user,
+            user_id=request.user.id,
         ).exists()
 
 
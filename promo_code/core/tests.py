@@ -1,10 +1,551 @@
+import asyncio
 import http
+import os
+import threading
+import time
+import unittest.mock
 
+import django.contrib.auth.hashers
 import django.test
 import django.urls
+import django_redis
+import redis
+import redis.exceptions
+import rest_framework.request
+import rest_framework.test
+
+import business.models
+import core.circuit_breaker
+import core.hashers
+import core.metrics
+import core.pagination
+import core.principal
+import core.representation_cache
+import core.utils.rate_limit
 
 
 class StaticURLTests(django.test.TestCase):
     def test_ping_endpoint(self):
         response = self.client.get(django.urls.reverse('api-core:ping'))
         self.assertEqual(response.status_code, http.HTTPStatus.OK)
+
+
+class MetricsTests(django.test.SimpleTestCase):
+    def setUp(self):
+        core.metrics.reset()
+
+    def tearDown(self):
+        core.metrics.reset()
+
+    def test_counters_are_accumulated(self):
+        core.metrics.incr('test.counter')
+        core.metrics.incr('test.counter', 2)
+
+        snapshot = core.metrics.snapshot()
+        self.assertEqual(snapshot['counters']['test.counter'], 3)
+
+    def test_latency_quantiles(self):
+        for _ in range(95):
+            core.metrics.observe('test.latency', 0.004)
+        for _ in range(5):
+            core.metrics.observe('test.latency', 0.2)
+
+        core.metrics.flush()
+        self.assertEqual(core.metrics.quantile('test.latency', 0.5), 5)
+        self.assertEqual(core.metrics.quantile('test.latency', 0.99), 250)
+
+        histogram = core.metrics.snapshot()['histograms']['test.latency']
+        self.assertEqual(histogram['count'], 100)
+        self.assertEqual(histogram['p95_ms'], 5)
+
+    def test_quantile_is_none_without_samples(self):
+        self.assertIsNone(core.metrics.quantile('test.missing', 0.5))
+
+    def test_values_are_buffered_until_flush(self):
+        with django.test.override_settings(METRICS_FLUSH_INTERVAL=3600):
+            core.metrics.flush()
+            core.metrics.observe('test.buffered', 0.01)
+
+            self.assertIsNone(core.metrics.quantile('test.buffered', 0.5))
+            core.metrics.flush()
+            self.assertEqual(core.metrics.quantile('test.buffered', 0.5), 10)
+
+    def test_flush_from_event_loop_runs_in_background(self):
+        async def record():
+            core.metrics.incr('test.async')
+            return threading.get_ident()
+
+        flushed_in = []
+        with unittest.mock.patch.object(
+            core.metrics,
+            'flush',
+            side_effect=lambda: flushed_in.append(threading.get_ident()),
+        ):
+            with django.test.override_settings(METRICS_FLUSH_INTERVAL=0):
+                loop_thread = asyncio.run(record())
+            core.metrics._get_flush_executor().submit(lambda: None).result()
+
+        self.assertEqual(len(flushed_in), 1)
+        self.assertNotEqual(flushed_in[0], loop_thread)
+
+
+class CircuitBreakerTests(django.test.SimpleTestCase):
+    def setUp(self):
+        self.breaker = core.circuit_breaker.CircuitBreaker(
+            'test',
+            failure_threshold=3,
+            reset_timeout=60,
+            window=60,
+            probe_timeout=5,
+        )
+        self.redis = django_redis.get_redis_connection('default')
+        core.metrics.reset()
+
+    def tearDown(self):
+        self.redis.flushall()
+        core.metrics.reset()
+
+    def _trip(self):
+        for _ in range(self.breaker.failure_threshold):
+            self.breaker.record_failure(self.breaker.allow_request())
+
+    def _elapse_reset_timeout(self):
+        self.redis.delete(self.breaker.open_key)
+
+    def test_opens_after_threshold(self):
+        for _ in range(self.breaker.failure_threshold - 1):
+            self.breaker.record_failure(self.breaker.allow_request())
+        self.assertEqual(
+            self.breaker.state(),
+            core.circuit_breaker.STATE_CLOSED,
+        )
+
+        self.breaker.record_failure(self.breaker.allow_request())
+
+        self.assertEqual(self.breaker.state(), core.circuit_breaker.STATE_OPEN)
+        self.assertIsNone(self.breaker.allow_request())
+
+    def test_failures_are_counted_in_a_sliding_window(self):
+        with unittest.mock.patch('time.time', return_value=1000.0):
+            self.breaker.record_failure(self.breaker.allow_request())
+        with unittest.mock.patch('time.time', return_value=1050.0):
+            self.breaker.record_failure(self.breaker.allow_request())
+        # The first failure has left the window, the second has not.
+        with unittest.mock.patch('time.time', return_value=1070.0):
+            self.breaker.record_failure(self.breaker.allow_request())
+        self.assertEqual(
+            self.breaker.state(),
+            core.circuit_breaker.STATE_CLOSED,
+        )
+
+        with unittest.mock.patch('time.time', return_value=1080.0):
+            self.breaker.record_failure(self.breaker.allow_request())
+        self.assertEqual(self.breaker.state(), core.circuit_breaker.STATE_OPEN)
+
+    def test_state_is_shared_between_instances(self):
+        self._trip()
+
+        other = core.circuit_breaker.CircuitBreaker(
+            'test',
+            failure_threshold=3,
+            reset_timeout=60,
+            window=60,
+            probe_timeout=5,
+        )
+        self.assertIsNone(other.allow_request())
+
+    def test_half_open_lets_a_single_probe_through(self):
+        self._trip()
+        self._elapse_reset_timeout()
+
+        self.assertEqual(
+            self.breaker.allow_request(),
+            core.circuit_breaker.STATE_HALF_OPEN,
+        )
+        self.assertIsNone(self.breaker.allow_request())
+
+    def test_successful_probe_closes_circuit(self):
+        self._trip()
+        self._elapse_reset_timeout()
+
+        self.breaker.record_success(self.breaker.allow_request())
+
+        self.assertEqual(
+            self.breaker.allow_request(),
+            core.circuit_breaker.STATE_CLOSED,
+        )
+
+    def test_failed_probe_reopens_circuit(self):
+        self._trip()
+        self._elapse_reset_timeout()
+
+        self.breaker.record_failure(self.breaker.allow_request())
+
+        self.assertEqual(self.breaker.state(), core.circuit_breaker.STATE_OPEN)
+
+    def test_transitions_are_recorded_as_metrics(self):
+        self._trip()
+        self.breaker.allow_request()
+        self._elapse_reset_timeout()
+        self.breaker.record_success(self.breaker.allow_request())
+
+        counters = core.metrics.snapshot()['counters']
+        self.assertEqual(counters['circuit.test.opened'], 1)
+        self.assertEqual(counters['circuit.test.rejected'], 1)
+        self.assertEqual(counters['circuit.test.half_opened'], 1)
+        self.assertEqual(counters['circuit.test.closed'], 1)
+
+
+class RepresentationCacheTests(django.test.SimpleTestCase):
+    def setUp(self):
+        self.cache = core.representation_cache.RepresentationCache(
+            timeout=60,
+            enabled=True,
+        )
+        self.loader = unittest.mock.Mock(
+            side_effect=lambda ids: {pk: {'promo_id': pk} for pk in ids},
+        )
+
+    def tearDown(self):
+        django_redis.get_redis_connection('default').flushall()
+
+    def test_render_stores_missing_fragments(self):
+        first = self.cache.render('test', ['a', 'b'], self.loader)
+        second = self.cache.render('test', ['b', 'a'], self.loader)
+
+        self.assertEqual(first, [{'promo_id': 'a'}, {'promo_id': 'b'}])
+        self.assertEqual(second, [{'promo_id': 'b'}, {'promo_id': 'a'}])
+        self.loader.assert_called_once_with(['a', 'b'])
+
+    def test_only_missing_fragments_are_loaded(self):
+        self.cache.render('test', ['a'], self.loader)
+        self.cache.render('test', ['a', 'b'], self.loader)
+
+        self.loader.assert_called_with(['b'])
+
+    def test_variants_are_cached_separately(self):
+        self.cache.render('test', ['a'], self.loader)
+        self.cache.render('other', ['a'], self.loader)
+
+        self.assertEqual(self.loader.call_count, 2)
+
+    def test_invalidate_drops_every_variant(self):
+        self.cache.render('test', ['a'], self.loader)
+        self.cache.render('other', ['a'], self.loader)
+
+        self.cache.invalidate(['a'])
+
+        self.assertEqual(self.cache.get_many('test', ['a']), {})
+        self.assertEqual(self.cache.get_many('other', ['a']), {})
+
+    def test_promos_not_loaded_are_left_out(self):
+        loader = unittest.mock.Mock(return_value={'a': {'promo_id': 'a'}})
+
+        fragments = self.cache.render('test', ['a', 'gone'], loader)
+
+        self.assertEqual(fragments, [{'promo_id': 'a'}])
+
+    def test_disabled_cache_always_loads(self):
+        self.cache.enabled = False
+
+        self.cache.render('test', ['a'], self.loader)
+        self.cache.render('test', ['a'], self.loader)
+
+        self.assertEqual(self.loader.call_count, 2)
+
+
+class PrincipalCacheTests(django.test.TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.company = business.models.Company.objects.create(
+            email='principal@example.com',
+            name='Principal',
+            token_version=2,
+        )
+
+    def setUp(self):
+        self.cache = core.principal.PrincipalCache(
+            timeout=60,
+            local_size=10,
+            local_timeout=60,
+        )
+        self.principal = core.principal.Principal.from_instance(self.company)
+
+    def tearDown(self):
+        django_redis.get_redis_connection('default').flushall()
+
+    def _get(self):
+        return self.cache.get('company', self.company.id)
+
+    def test_round_trip_through_redis(self):
+        self.cache.set(self.principal)
+        self.cache.local.clear()
+
+        principal = self._get()
+
+        self.assertEqual(principal, self.principal)
+        self.assertEqual(principal.id, self.company.id)
+        self.assertEqual(principal.email, 'principal@example.com')
+        self.assertTrue(principal.is_company)
+        self.assertIsNone(principal.country)
+
+    def test_local_tier_is_used_before_redis(self):
+        self.cache.set(self.principal)
+        django_redis.get_redis_connection('default').flushall()
+
+        self.assertEqual(self._get(), self.principal)
+
+    def test_cached_principals_are_not_shared(self):
+        self.cache.set(self.principal)
+
+        self.assertIsNot(self._get(), self._get())
+
+    def test_invalidate_drops_both_tiers(self):
+        self.cache.set(self.principal)
+        self.cache.invalidate('company', self.company.id)
+
+        self.assertIsNone(self._get())
+
+    def test_instance_is_loaded_on_first_access(self):
+        self.cache.set(self.principal)
+        principal = self._get()
+
+        with self.assertNumQueries(1):
+            self.assertEqual(principal.instance, self.company)
+            self.assertEqual(principal.instance, self.company)
+
+
+class TokenVersionRegistryTests(django.test.SimpleTestCase):
+    def setUp(self):
+        self.registry = core.principal.TokenVersionRegistry(
+            local_size=10,
+            local_timeout=0,
+        )
+
+    def tearDown(self):
+        django_redis.get_redis_connection('default').flushall()
+
+    def test_unregistered_principal(self):
+        self.assertIsNone(self.registry.get('user', 'a'))
+
+    def test_versions_never_go_back(self):
+        self.registry.set('user', 'a', 3)
+        self.registry.set('user', 'a', 2)
+
+        self.assertEqual(self.registry.get('user', 'a'), 3)
+        self.assertIsNone(self.registry.get('company', 'a'))
+
+    def test_local_tier_bounds_revocation_delay(self):
+        registry = core.principal.TokenVersionRegistry(
+            local_size=10,
+            local_timeout=60,
+        )
+        registry.set('user', 'a', 1)
+        self.assertEqual(registry.get('user', 'a'), 1)
+
+        self.registry.set('user', 'a', 2)
+
+        self.assertEqual(registry.get('user', 'a'), 1)
+        self.assertEqual(self.registry.get('user', 'a'), 2)
+
+    def test_failed_write_removes_old_version(self):
+        self.registry.set('user', 'a', 1)
+
+        with unittest.mock.patch.object(
+            redis.Redis,
+            'eval',
+            side_effect=redis.exceptions.ConnectionError(),
+        ):
+            self.registry.set('user', 'a', 2)
+
+        self.assertIsNone(self.registry.get('user', 'a'))
+
+    def test_failed_registration_is_ignored(self):
+        with unittest.mock.patch.object(
+            redis.Redis,
+            'eval',
+            side_effect=redis.exceptions.ConnectionError(),
+        ):
+            self.registry.register('user', 'a', 1)
+
+        self.assertIsNone(self.registry.get('user', 'a'))
+
+    def test_newer_token_skips_local_tier(self):
+        registry = core.principal.TokenVersionRegistry(
+            local_size=10,
+            local_timeout=60,
+        )
+        registry.set('user', 'a', 1)
+        self.assertEqual(registry.get('user', 'a'), 1)
+
+        self.registry.set('user', 'a', 2)
+
+        self.assertEqual(registry.get('user', 'a', at_least=2), 2)
+        self.assertEqual(registry.get('user', 'a', at_least=1), 2)
+
+
+class PasswordHasherTests(django.test.SimpleTestCase):
+    def test_profile_sets_argon2_parameters(self):
+        with django.test.override_settings(
+            PASSWORD_HASH_PROFILE='interactive',
+        ):
+            encoded = django.contrib.auth.hashers.make_password('secret')
+
+        self.assertIn('$m=19456,t=2,p=1$', encoded)
+        self.assertTrue(
+            django.contrib.auth.hashers.check_password('secret', encoded),
+        )
+
+    def test_hash_of_another_profile_is_updated(self):
+        encoded = core.hashers.encode(
+            core.hashers.PROFILES['interactive'],
+            'secret',
+            'saltsaltsaltsalt',
+        )
+        hasher = core.hashers.ProfiledArgon2PasswordHasher()
+
+        self.assertTrue(hasher.verify('secret', encoded))
+        self.assertFalse(hasher.verify('wrong', encoded))
+        self.assertTrue(hasher.must_update(encoded))
+
+
+class HashingPoolTests(django.test.SimpleTestCase):
+    def test_runs_in_place_without_workers(self):
+        pool = core.hashers.HashingPool(workers=0, max_pending=0, timeout=1)
+
+        self.assertEqual(pool.run(os.getpid), os.getpid())
+
+    def test_runs_in_worker_process(self):
+        pool = core.hashers.HashingPool(workers=1, max_pending=0, timeout=60)
+        self.addCleanup(pool.shutdown)
+
+        self.assertNotEqual(pool.run(os.getpid), os.getpid())
+
+    def test_rejects_calls_beyond_queue_depth(self):
+        pool = core.hashers.HashingPool(workers=1, max_pending=0, timeout=60)
+        self.addCleanup(pool.shutdown)
+        busy = threading.Thread(target=pool.run, args=(time.sleep, 1))
+        busy.start()
+        self.addCleanup(busy.join)
+        time.sleep(0.1)
+
+        with self.assertRaises(core.hashers.PasswordHashingBusy):
+            pool.run(os.getpid)
+
+    def test_recovers_when_worker_dies(self):
+        pool = core.hashers.HashingPool(workers=1, max_pending=0, timeout=60)
+        self.addCleanup(pool.shutdown)
+
+        with self.assertRaises(core.hashers.PasswordHashingBusy):
+            pool.run(os._exit, 1)
+
+        self.assertNotEqual(pool.run(os.getpid), os.getpid())
+
+
+class TokenBucketTests(django.test.SimpleTestCase):
+    def test_burst_up_to_capacity_is_not_delayed(self):
+        bucket = core.utils.rate_limit.TokenBucket(rate=10, capacity=5)
+
+        started = time.monotonic()
+        for _ in range(5):
+            bucket.acquire()
+
+        self.assertLess(time.monotonic() - started, 0.05)
+
+    def test_acquire_waits_for_refill(self):
+        bucket = core.utils.rate_limit.TokenBucket(rate=20, capacity=1)
+        bucket.acquire()
+
+        started = time.monotonic()
+        bucket.acquire()
+
+        self.assertGreaterEqual(time.monotonic() - started, 0.04)
+
+
+class PaginationCountStrategyTests(django.test.TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for i in range(3):
+            business.models.Company.objects.create_company(
+                email=f'company{i}@example.com',
+                name=f'Company {i}',
+            )
+
+    def tearDown(self):
+        django_redis.get_redis_connection('default').flushall()
+
+    def _paginate(self, strategy, queryset=None, **params):
+        factory = rest_framework.test.APIRequestFactory()
+        request = rest_framework.request.Request(factory.get('/', params))
+        view = type('View', (), {'count_strategy': strategy})()
+        paginator = core.pagination.CustomLimitOffsetPagination()
+
+        if queryset is None:
+            queryset = business.models.Company.objects.all()
+        page = paginator.paginate_queryset(
+            queryset.order_by('email'),
+            request,
+            view,
+        )
+        return page, paginator.get_paginated_response([])
+
+    def test_exact_count(self):
+        page, response = self._paginate(core.pagination.COUNT_EXACT)
+
+        self.assertEqual(len(page), 3)
+        self.assertEqual(response['X-Total-Count'], '3')
+        self.assertNotIn('X-Total-Count-Estimated', response)
+
+    def test_count_can_be_skipped(self):
+        with self.assertNumQueries(1):
+            page, response = self._paginate(
+                core.pagination.COUNT_NONE,
+                limit=2,
+            )
+
+        self.assertEqual(len(page), 2)
+        self.assertNotIn('X-Total-Count', response)
+
+    def test_cached_count_is_reused(self):
+        self._paginate(core.pagination.COUNT_CACHED)
+        business.models.Company.objects.create_company(
+            email='late@example.com',
+            name='Late',
+        )
+
+        with self.assertNumQueries(1):
+            _, response = self._paginate(core.pagination.COUNT_CACHED)
+
+        self.assertEqual(response['X-Total-Count'], '3')
+
+    def test_cached_count_is_keyed_by_filters(self):
+        self._paginate(core.pagination.COUNT_CACHED)
+
+        with self.assertNumQueries(1):
+            self._paginate(core.pagination.COUNT_CACHED, offset=1)
+
+        _, response = self._paginate(
+            core.pagination.COUNT_CACHED,
+            queryset=business.models.Company.objects.filter(
+                name='Company 0',
+            ),
+        )
+        self.assertEqual(response['X-Total-Count'], '1')
+
+    def test_small_estimate_falls_back_to_exact_count(self):
+        _, response = self._paginate(core.pagination.COUNT_ESTIMATE)
+
+        self.assertEqual(response['X-Total-Count'], '3')
+        self.assertNotIn('X-Total-Count-Estimated', response)
+
+    def test_estimated_count_is_signalled(self):
+        with unittest.mock.patch.object(
+            core.pagination.CustomLimitOffsetPagination,
+            'estimate_exact_threshold',
+            0,
+        ):
+            page, response = self._paginate(core.pagination.COUNT_ESTIMATE)
+
+        self.assertEqual(len(page), 3)
+        self.assertIn('X-Total-Count', response)
+        self.assertEqual(response['X-Total-Count-Estimated'], 'true')
@@ -0,0 +1,15 @@
+import typing
+
+import django.db
+import django.db.transaction
+
+
+def now_and_on_commit(func: typing.Callable[[], None]) -> None:
+    """
+    Runs a cache invalidation right away and, inside a transaction,
+    once more after the commit: a concurrent reader may refill the
+    cache from the old rows between the first run and the commit.
+    """
+    func()
+    if django.db.connection.in_atomic_block:
+        django.db.transaction.on_commit(func)
@@ -49,6 +49,15 @@ INSTALLED_APPS = [
 AUTH_USER_MODEL = 'user.User'
 
 AUTH_INSTANCE_CACHE_TIMEOUT = 3600
+# In-process tier of the authenticated principal cache.
+AUTH_PRINCIPAL_LRU_SIZE = int(os.getenv('AUTH_PRINCIPAL_LRU_SIZE', '10000'))
+AUTH_PRINCIPAL_LRU_TIMEOUT = float(
+    os.getenv('AUTH_PRINCIPAL_LRU_TIMEOUT', '5'),
+)
+# Longest time a revoked token is still accepted by other processes.
+AUTH_TOKEN_VERSION_CACHE_TIMEOUT = float(
+    os.getenv('AUTH_TOKEN_VERSION_CACHE_TIMEOUT', '5'),
+)
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
@@ -56,6 +65,9 @@ REST_FRAMEWORK = {
     ],
 }
 
+# Expired refresh tokens deleted per query by `manage.py prune_tokens`.
+TOKEN_PRUNE_BATCH_SIZE = int(os.getenv('TOKEN_PRUNE_BATCH_SIZE', '1000'))
+
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': datetime.timedelta(minutes=60),
     'REFRESH_TOKEN_LIFETIME': datetime.timedelta(days=1),
@@ -155,12 +167,76 @@ CACHES = {
     },
 }
 
+METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', '1'))
+
+# Counting strategy of X-Total-Count: exact, cached, estimate or none.
+PROMO_FEED_COUNT_STRATEGY = os.getenv('PROMO_FEED_COUNT_STRATEGY', 'exact')
+PROMO_LIST_COUNT_STRATEGY = os.getenv('PROMO_LIST_COUNT_STRATEGY', 'exact')
+PAGINATION_COUNT_CACHE_TIMEOUT = int(
+    os.getenv('PAGINATION_COUNT_CACHE_TIMEOUT', '30'),
+)
+
+# Segment-level cache of the user feed.
+FEED_CACHE_ENABLED = load_bool('FEED_CACHE_ENABLED', True)
+FEED_CACHE_TIMEOUT = int(os.getenv('FEED_CACHE_TIMEOUT', '60'))
+FEED_CACHE_MAX_IDS = int(os.getenv('FEED_CACHE_MAX_IDS', '1000'))
+
+# Pre-rendered promo representations, per promo and serializer variant.
+PROMO_REPRESENTATION_CACHE_ENABLED = load_bool(
+    'PROMO_REPRESENTATION_CACHE_ENABLED',
+    True,
+)
+PROMO_REPRESENTATION_CACHE_TIMEOUT = int(
+    os.getenv('PROMO_REPRESENTATION_CACHE_TIMEOUT', '300'),
+)
+
+# Buffer likes in Redis and write them with `manage.py flush_likes`.
+LIKE_WRITE_BEHIND = load_bool('LIKE_WRITE_BEHIND', False)
+LIKE_FLUSH_BATCH_SIZE = int(os.getenv('LIKE_FLUSH_BATCH_SIZE', '1000'))
+
+PROMO_EXISTS_CACHE_TIMEOUT = int(
+    os.getenv('PROMO_EXISTS_CACHE_TIMEOUT', '300'),
+)
+
+# Months of activation history partitions created ahead of time by
+# `manage.py create_history_partitions`.
+HISTORY_PARTITIONS_AHEAD = int(os.getenv('HISTORY_PARTITIONS_AHEAD', '3'))
+
+PROMO_USAGE_SHARD_COUNT = int(os.getenv('PROMO_USAGE_SHARD_COUNT', '8'))
+
 ANTIFRAUD_ADDRESS = f'{os.getenv("ANTIFRAUD_ADDRESS")}'
 ANTIFRAUD_VALIDATE_URL = f'{ANTIFRAUD_ADDRESS}/api/validate'
 ANTIFRAUD_SET_DELAY_URL = f'{ANTIFRAUD_ADDRESS}/internal/set_delay'
 ANTIFRAUD_UPDATE_USER_VERDICT_URL = (
     f'{ANTIFRAUD_ADDRESS}/internal/update_user_verdict'
 )
+ANTIFRAUD_CONN_TIMEOUT = float(os.getenv('ANTIFRAUD_CONN_TIMEOUT', '1'))
+ANTIFRAUD_READ_TIMEOUT = float(os.getenv('ANTIFRAUD_READ_TIMEOUT', '5'))
+ANTIFRAUD_MAX_RETRIES = int(os.getenv('ANTIFRAUD_MAX_RETRIES', '2'))
+ANTIFRAUD_POOL_SIZE = int(os.getenv('ANTIFRAUD_POOL_SIZE', '10'))
+ANTIFRAUD_KEEP_ALIVE = load_bool('ANTIFRAUD_KEEP_ALIVE', True)
+ANTIFRAUD_BACKOFF_BASE = float(os.getenv('ANTIFRAUD_BACKOFF_BASE', '0.05'))
+ANTIFRAUD_BACKOFF_MAX = float(os.getenv('ANTIFRAUD_BACKOFF_MAX', '1'))
+ANTIFRAUD_VERDICT_LRU_SIZE = int(
+    os.getenv('ANTIFRAUD_VERDICT_LRU_SIZE', '1024'),
+)
+ANTIFRAUD_BREAKER_THRESHOLD = int(
+    os.getenv('ANTIFRAUD_BREAKER_THRESHOLD', '5'),
+)
+ANTIFRAUD_BREAKER_WINDOW = int(os.getenv('ANTIFRAUD_BREAKER_WINDOW', '30'))
+ANTIFRAUD_BREAKER_RESET_TIMEOUT = int(
+    os.getenv('ANTIFRAUD_BREAKER_RESET_TIMEOUT', '15'),
+)
+ANTIFRAUD_HEDGE = load_bool('ANTIFRAUD_HEDGE', False)
+ANTIFRAUD_HEDGE_DELAY = float(os.getenv('ANTIFRAUD_HEDGE_DELAY', '0.05'))
+
+ANTIFRAUD_WARMER_ENABLED = load_bool('ANTIFRAUD_WARMER_ENABLED', False)
+ANTIFRAUD_WARMER_WINDOW = int(os.getenv('ANTIFRAUD_WARMER_WINDOW', '600'))
+ANTIFRAUD_WARMER_WORKERS = int(os.getenv('ANTIFRAUD_WARMER_WORKERS', '4'))
+ANTIFRAUD_WARMER_RATE = float(os.getenv('ANTIFRAUD_WARMER_RATE', '20'))
+ANTIFRAUD_WARMER_BATCH_SIZE = int(
+    os.getenv('ANTIFRAUD_WARMER_BATCH_SIZE', '1000'),
+)
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -171,40 +247,34 @@ AUTH_PASSWORD_VALIDATORS = [
         'NAME': 'django.contrib.auth.password_validation'
         '.MinimumLengthValidator',
     },
-    {
-        'NAME': 'django.contrib.auth.password_validation'
-        '.CommonPasswordValidator',
-    },
     {
         'NAME': 'django.contrib.auth.password_validation'
         '.NumericPasswordValidator',
     },
     {
-        'NAME': 'user.validators.AsciiValidator',
-    },
-    {
-        'NAME': 'user.validators.SpecialCharacterValidator',
+        'NAME': 'user.validators.PasswordPolicyValidator',
         'OPTIONS': {'special_chars': '[@$!%*?&]'},
     },
-    {
-        'NAME': 'user.validators.NumericValidator',
-    },
-    {
-        'NAME': 'user.validators.LowercaseValidator',
-    },
-    {
-        'NAME': 'user.validators.UppercaseValidator',
-    },
 ]
 
 PASSWORD_HASHERS = [
-    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'core.hashers.ProfiledArgon2PasswordHasher',
     'django.contrib.auth.hashers.PBKDF2PasswordHasher',
     'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
     'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
     'django.contrib.auth.hashers.ScryptPasswordHasher',
 ]
 
+# Argon2 cost profile: interactive, default or sensitive (core.hashers).
+PASSWORD_HASH_PROFILE = os.getenv('PASSWORD_HASH_PROFILE', 'default')
+# Processes hashing passwords off the request thread; 0 hashes in place.
+PASSWORD_HASHING_WORKERS = int(os.getenv('PASSWORD_HASHING_WORKERS', '0'))
+PASSWORD_HASHING_MAX_PENDING = int(
+    os.getenv('PASSWORD_HASHING_MAX_PENDING', '32'),
+)
+PASSWORD_HASHING_TIMEOUT = float(
+    os.getenv('PASSWORD_HASHING_TIMEOUT', '10'),
+)
 
 LANGUAGE_CODE = 'en-us'
 
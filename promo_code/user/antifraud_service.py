@@ -1,12 +1,37 @@
+import asyncio
+import concurrent.futures
 import datetime
 import json
+import os
+import random
+import time
 import typing
 
 import django.conf
-import django.core.cache
+import httpx
 import requests
+import requests.adapters
 import requests.exceptions
 
+import core.circuit_breaker
+import core.metrics
+import user.verdict_cache
+
+REQUEST_ERRORS = (requests.exceptions.RequestException, json.JSONDecodeError)
+ASYNC_REQUEST_ERRORS = (httpx.HTTPError, json.JSONDecodeError)
+
+antifraud_circuit_breaker = core.circuit_breaker.CircuitBreaker(
+    'antifraud',
+    failure_threshold=django.conf.settings.ANTIFRAUD_BREAKER_THRESHOLD,
+    reset_timeout=django.conf.settings.ANTIFRAUD_BREAKER_RESET_TIMEOUT,
+    window=django.conf.settings.ANTIFRAUD_BREAKER_WINDOW,
+    probe_timeout=int(
+        django.conf.settings.ANTIFRAUD_CONN_TIMEOUT
+        + django.conf.settings.ANTIFRAUD_READ_TIMEOUT,
+    )
+    + 1,
+)
+
 
 class AntiFraudService:
     """
@@ -15,41 +40,221 @@ class AntiFraudService:
     Encapsulates caching, HTTP requests, and error handling.
     """
 
+    # How long (in seconds) the p95-based hedge delay is reused
+    # before it is read from the metrics again.
+    HEDGE_DELAY_REFRESH = 10
+
     def __init__(
         self,
         base_url: str = django.conf.settings.ANTIFRAUD_VALIDATE_URL,
-        timeout: int = 5,
-        max_retries: int = 2,
+        connect_timeout: float = django.conf.settings.ANTIFRAUD_CONN_TIMEOUT,
+        timeout: float = django.conf.settings.ANTIFRAUD_READ_TIMEOUT,
+        max_retries: int = django.conf.settings.ANTIFRAUD_MAX_RETRIES,
+        pool_size: int = django.conf.settings.ANTIFRAUD_POOL_SIZE,
+        keep_alive: bool = django.conf.settings.ANTIFRAUD_KEEP_ALIVE,
+        backoff_base: float = django.conf.settings.ANTIFRAUD_BACKOFF_BASE,
+        backoff_max: float = django.conf.settings.ANTIFRAUD_BACKOFF_MAX,
+        verdict_cache: typing.Optional[user.verdict_cache.VerdictCache] = None,
+        circuit_breaker: typing.Optional[
+            core.circuit_breaker.CircuitBreaker
+        ] = None,
+        hedge: bool = django.conf.settings.ANTIFRAUD_HEDGE,
+        hedge_min_delay: float = django.conf.settings.ANTIFRAUD_HEDGE_DELAY,
     ):
         self.base_url = base_url
+        self.connect_timeout = connect_timeout
         self.timeout = timeout
         self.max_retries = max_retries
+        self.pool_size = pool_size
+        self.keep_alive = keep_alive
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.verdict_cache = verdict_cache or user.verdict_cache.verdict_cache
+        self.circuit_breaker = circuit_breaker or antifraud_circuit_breaker
+        self.hedge = hedge
+        self.hedge_min_delay = hedge_min_delay
+
+        self._session = None
+        self._session_pid = None
+        self._hedge_executor = None
+        self._hedge_executor_pid = None
+        self._hedge_delay = None
+        self._hedge_delay_expires_at = 0.0
+        self._async_client = None
+        self._async_client_loop = None
+
+    def _get_session(self) -> requests.Session:
+        """
+        Returns the pooled HTTP session of the current process.
+
+        A new session is created after a fork, so worker processes never
+        share sockets inherited from their parent.
+        """
+        pid = os.getpid()
+        if self._session is None or self._session_pid != pid:
+            adapter = requests.adapters.HTTPAdapter(
+                pool_connections=1,
+                pool_maxsize=self.pool_size,
+                max_retries=0,
+            )
+            session = requests.Session()
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            if not self.keep_alive:
+                session.headers['Connection'] = 'close'
+
+            self._session = session
+            self._session_pid = pid
+
+        return self._session
+
+    def _get_async_client(self) -> httpx.AsyncClient:
+        """
+        Returns the pooled async HTTP client of the running event loop.
+        httpx clients are bound to the loop they were first used in.
+        """
+        loop = asyncio.get_running_loop()
+        if self._async_client is None or self._async_client_loop is not loop:
+            self._discard_async_client()
+            max_keepalive = self.pool_size if self.keep_alive else 0
+            self._async_client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=self.pool_size,
+                    max_keepalive_connections=max_keepalive,
+                ),
+                timeout=httpx.Timeout(
+                    self.timeout,
+                    connect=self.connect_timeout,
+                ),
+            )
+            self._async_client_loop = loop
+
+        return self._async_client
+
+    def _discard_async_client(self) -> None:
+        """
+        Closes the async client of another event loop on that loop, if it
+        is still running. A client whose loop is gone can only be dropped,
+        which is why short-lived loops close theirs with aclose().
+        """
+        client, loop = self._async_client, self._async_client_loop
+        self._async_client = self._async_client_loop = None
+        if client is not None and loop.is_running():
+            asyncio.run_coroutine_threadsafe(client.aclose(), loop)
+
+    async def aclose(self) -> None:
+        """
+        Closes the async client of the running event loop. Must be awaited
+        before a loop that served only one request (an async view under
+        WSGI) is closed, or its connections would leak.
+        """
+        if (
+            self._async_client is not None
+            and self._async_client_loop is asyncio.get_running_loop()
+        ):
+            client = self._async_client
+            self._async_client = self._async_client_loop = None
+            await client.aclose()
+
+    def _backoff_delay(self, attempt: int) -> float:
+        """
+        Returns a "full jitter" exponential backoff delay in seconds
+        for the given retry attempt (starting at 1).
+        """
+        ceiling = min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1))
+        return random.uniform(0, ceiling)
+
+    def _get_hedge_executor(self) -> concurrent.futures.ThreadPoolExecutor:
+        """Returns the thread pool used for hedged requests."""
+        pid = os.getpid()
+        if self._hedge_executor is None or self._hedge_executor_pid != pid:
+            self._hedge_executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=self.pool_size,
+                thread_name_prefix='antifraud-hedge',
+            )
+            self._hedge_executor_pid = pid
+
+        return self._hedge_executor
+
+    def _get_hedge_delay(self) -> float:
+        """
+        Returns how long to wait for a response before sending a hedged
+        request: the observed p95 attempt latency, but no less than
+        hedge_min_delay. Until latencies have been recorded, requests
+        are not hedged.
+        """
+        now = time.monotonic()
+        if self._hedge_delay is None or self._hedge_delay_expires_at <= now:
+            p95_ms = core.metrics.quantile('antifraud.attempt', 0.95)
+            if p95_ms is None:
+                delay = self.timeout
+            else:
+                delay = max(self.hedge_min_delay, p95_ms / 1000)
+
+            self._hedge_delay = min(delay, self.timeout)
+            self._hedge_delay_expires_at = now + self.HEDGE_DELAY_REFRESH
+
+        return self._hedge_delay
 
     def get_verdict(self, user_email: str, promo_id: str) -> typing.Dict:
         """
         Retrieves the anti-fraud verdict for a given user and promo.
 
-        1. Checks the cache.
+        1. Checks the verdict cache (in-process LRU, then Redis).
         2. If not in cache, fetches from the anti-fraud service.
         3. Caches the result if the service provides a 'cache_until' value.
         """
-        cache_key = f'antifraud_verdict_{user_email}'
-
-        if cached_verdict := django.core.cache.cache.get(cache_key):
+        if cached_verdict := self.verdict_cache.get(user_email, promo_id):
+            core.metrics.incr('antifraud.cache_hits')
             return cached_verdict
 
+        started = time.perf_counter()
         verdict = self._fetch_from_service(user_email, promo_id)
+        core.metrics.observe(
+            'antifraud.call',
+            time.perf_counter() - started,
+        )
 
-        if verdict.get('ok'):
-            timeout_seconds = self._calculate_cache_timeout(
-                verdict.get('cache_until'),
+        if timeout_seconds := self._verdict_cache_timeout(verdict):
+            self.verdict_cache.set(
+                user_email,
+                promo_id,
+                verdict,
+                timeout_seconds,
+            )
+
+        return verdict
+
+    async def aget_verdict(
+        self,
+        user_email: str,
+        promo_id: str,
+    ) -> typing.Dict:
+        """
+        Async variant of get_verdict() that does not block a worker
+        while waiting for the anti-fraud service.
+        """
+        if cached_verdict := await self.verdict_cache.aget(
+            user_email,
+            promo_id,
+        ):
+            core.metrics.incr('antifraud.cache_hits')
+            return cached_verdict
+
+        started = time.perf_counter()
+        verdict = await self._afetch_from_service(user_email, promo_id)
+        core.metrics.observe(
+            'antifraud.call',
+            time.perf_counter() - started,
+        )
+
+        if timeout_seconds := self._verdict_cache_timeout(verdict):
+            await self.verdict_cache.aset(
+                user_email,
+                promo_id,
+                verdict,
+                timeout_seconds,
             )
-            if timeout_seconds:
-                django.core.cache.cache.set(
-                    cache_key,
-                    verdict,
-                    timeout=timeout_seconds,
-                )
 
         return verdict
 
@@ -59,27 +264,173 @@ class AntiFraudService:
         promo_id: str,
     ) -> typing.Dict:
         """
-        Performs the actual HTTP request with a retry mechanism.
+        Performs the actual HTTP request with a retry mechanism
+        and jittered exponential backoff between attempts.
         """
         payload = {'user_email': user_email, 'promo_id': promo_id}
 
-        for _ in range(self.max_retries):
+        for attempt in range(self.max_retries):
+            if attempt:
+                core.metrics.incr('antifraud.retries')
+                time.sleep(self._backoff_delay(attempt))
+
+            state = self.circuit_breaker.allow_request()
+            if state is None:
+                core.metrics.incr('antifraud.short_circuited')
+                break
+
+            started = time.perf_counter()
             try:
-                response = requests.post(
-                    self.base_url,
-                    json=payload,
-                    timeout=self.timeout,
+                verdict = self._send(payload)
+            except REQUEST_ERRORS:
+                core.metrics.incr('antifraud.errors')
+                self.circuit_breaker.record_failure(state)
+                continue
+            finally:
+                core.metrics.observe(
+                    'antifraud.attempt',
+                    time.perf_counter() - started,
                 )
-                response.raise_for_status()
-                return response.json()
-            except (
-                requests.exceptions.RequestException,
-                json.JSONDecodeError,
-            ):
+
+            self.circuit_breaker.record_success(state)
+            return verdict
+
+        core.metrics.incr('antifraud.unavailable')
+        return {'ok': False, 'error': 'Anti-fraud service unavailable'}
+
+    def _post(self, payload: typing.Dict) -> typing.Dict:
+        response = self._get_session().post(
+            self.base_url,
+            json=payload,
+            timeout=(self.connect_timeout, self.timeout),
+        )
+        response.raise_for_status()
+        return response.json()
+
+    def _send(self, payload: typing.Dict) -> typing.Dict:
+        """
+        Sends a single attempt. With hedging enabled, a second identical
+        request is fired if the first one has not completed within the
+        hedge delay, and whichever succeeds first wins.
+        """
+        if not self.hedge:
+            return self._post(payload)
+
+        executor = self._get_hedge_executor()
+        primary = executor.submit(self._post, payload)
+        done, _ = concurrent.futures.wait(
+            [primary],
+            timeout=self._get_hedge_delay(),
+        )
+        if done:
+            return primary.result()
+
+        core.metrics.incr('antifraud.hedged')
+        hedged = executor.submit(self._post, payload)
+
+        error = None
+        for future in concurrent.futures.as_completed([primary, hedged]):
+            try:
+                return future.result()
+            except REQUEST_ERRORS as exc:
+                error = exc
+
+        raise error
+
+    async def _afetch_from_service(
+        self,
+        user_email: str,
+        promo_id: str,
+    ) -> typing.Dict:
+        """
+        Async counterpart of _fetch_from_service() built on httpx.
+        """
+        payload = {'user_email': user_email, 'promo_id': promo_id}
+
+        for attempt in range(self.max_retries):
+            if attempt:
+                core.metrics.incr('antifraud.retries')
+                await asyncio.sleep(self._backoff_delay(attempt))
+
+            state = await self.circuit_breaker.aallow_request()
+            if state is None:
+                core.metrics.incr('antifraud.short_circuited')
+                break
+
+            started = time.perf_counter()
+            try:
+                verdict = await self._asend(payload)
+            except ASYNC_REQUEST_ERRORS:
+                core.metrics.incr('antifraud.errors')
+                await self.circuit_breaker.arecord_failure(state)
                 continue
+            finally:
+                core.metrics.observe(
+                    'antifraud.attempt',
+                    time.perf_counter() - started,
+                )
 
+            await self.circuit_breaker.arecord_success(state)
+            return verdict
+
+        core.metrics.incr('antifraud.unavailable')
         return {'ok': False, 'error': 'Anti-fraud service unavailable'}
 
+    async def _apost(self, payload: typing.Dict) -> typing.Dict:
+        response = await self._get_async_client().post(
+            self.base_url,
+            json=payload,
+        )
+        response.raise_for_status()
+        return response.json()
+
+    async def _asend(self, payload: typing.Dict) -> typing.Dict:
+        """
+        Async counterpart of _send(). The losing request is cancelled.
+        """
+        if not self.hedge:
+            return await self._apost(payload)
+
+        primary = asyncio.ensure_future(self._apost(payload))
+        done, _ = await asyncio.wait(
+            {primary},
+            timeout=self._get_hedge_delay(),
+        )
+        if done:
+            return primary.result()
+
+        core.metrics.incr('antifraud.hedged')
+        pending = {primary, asyncio.ensure_future(self._apost(payload))}
+
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+        finally:
+            for task in pending:
+                task.cancel()
+
+        raise error
+
+    def _verdict_cache_timeout(
+        self,
+        verdict: typing.Dict,
+    ) -> typing.Optional[int]:
+        """
+        Returns how long a verdict may be cached, or None if it must not be.
+        Only positive verdicts with a valid 'cache_until' are cached.
+        """
+        if not verdict.get('ok'):
+            return None
+        return self._calculate_cache_timeout(verdict.get('cache_until'))
+
     @staticmethod
     def _calculate_cache_timeout(
         cache_until_str: typing.Optional[str],
@@ -0,0 +1,111 @@
+import concurrent.futures
+import contextlib
+import time
+import typing
+
+import django.conf
+import django_redis
+import redis.exceptions
+
+import core.metrics
+import core.utils.rate_limit
+import user.antifraud_service
+
+ACTIVE_USERS_KEY = 'antifraud:warm:users'
+LAST_PROMO_KEY = 'antifraud:warm:promos'
+
+
+def _connection():
+    return django_redis.get_redis_connection('default')
+
+
+def record_feed_visit(user_email: str, promo_ids: typing.List[str]) -> None:
+    """
+    Remembers that the user has just browsed the feed, together with
+    a promo they saw, so the warmer can fetch their verdict in advance.
+    Does nothing unless ANTIFRAUD_WARMER_ENABLED is set.
+    """
+    if not django.conf.settings.ANTIFRAUD_WARMER_ENABLED or not promo_ids:
+        return
+
+    with contextlib.suppress(redis.exceptions.RedisError):
+        pipe = _connection().pipeline(transaction=False)
+        pipe.zadd(ACTIVE_USERS_KEY, {user_email: time.time()})
+        pipe.hset(LAST_PROMO_KEY, user_email, str(promo_ids[0]))
+        pipe.execute()
+
+
+def recently_active_users(
+    window: int,
+    limit: int,
+) -> typing.List[typing.Tuple[str, str]]:
+    """
+    Returns (email, promo_id) pairs of users who browsed the feed within
+    the last `window` seconds, most recent first. Older entries are
+    pruned on the way.
+    """
+    conn = _connection()
+    cutoff = time.time() - window
+
+    stale = conn.zrangebyscore(ACTIVE_USERS_KEY, '-inf', cutoff)
+    if stale:
+        pipe = conn.pipeline(transaction=False)
+        pipe.zrem(ACTIVE_USERS_KEY, *stale)
+        pipe.hdel(LAST_PROMO_KEY, *stale)
+        pipe.execute()
+
+    emails = conn.zrevrangebyscore(
+        ACTIVE_USERS_KEY,
+        '+inf',
+        cutoff,
+        start=0,
+        num=limit,
+    )
+    if not emails:
+        return []
+
+    promo_ids = conn.hmget(LAST_PROMO_KEY, emails)
+    return [
+        (email.decode(), promo_id.decode())
+        for email, promo_id in zip(emails, promo_ids, strict=True)
+        if promo_id is not None
+    ]
+
+
+def warm(
+    window: int = django.conf.settings.ANTIFRAUD_WARMER_WINDOW,
+    workers: int = django.conf.settings.ANTIFRAUD_WARMER_WORKERS,
+    rate: float = django.conf.settings.ANTIFRAUD_WARMER_RATE,
+    limit: int = django.conf.settings.ANTIFRAUD_WARMER_BATCH_SIZE,
+    service: typing.Optional[user.antifraud_service.AntiFraudService] = None,
+) -> typing.Dict[str, int]:
+    """
+    Fetches verdicts for recently active users whose verdict is not
+    cached yet. Requests go through `workers` threads and are limited
+    to `rate` per second. Verdicts are cached by AntiFraudService itself,
+    for as long as their cache_until allows.
+    """
+    service = service or user.antifraud_service.antifraud_service
+    bucket = core.utils.rate_limit.TokenBucket(rate)
+    stats = {'users': 0, 'cached': 0, 'fetched': 0}
+
+    def prefetch(user_email, promo_id):
+        if service.verdict_cache.get(user_email, promo_id) is not None:
+            return 'cached'
+
+        bucket.acquire()
+        service.get_verdict(user_email, promo_id)
+        return 'fetched'
+
+    users = recently_active_users(window, limit)
+    stats['users'] = len(users)
+    with concurrent.futures.ThreadPoolExecutor(workers) as executor:
+        futures = [
+            executor.submit(prefetch, user_email, promo_id)
+            for user_email, promo_id in users
+        ]
+        for future in concurrent.futures.as_completed(futures):
+            stats[future.result()] += 1
+
+    core.metrics.incr('antifraud.warmer.fetched', stats['fetched'])
+    return stats
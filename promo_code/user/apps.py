@@ -1,6 +1,14 @@
 import django.apps
+import django.contrib.auth.password_validation as password_validation
 
 
 class UserConfig(django.apps.AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'user'
+
+    def ready(self):
+        import user.signals  # noqa: F401
+
+        # Builds the password validators, and loads the common password
+        # list, when the worker starts rather than on the first sign-up.
+        password_validation.get_default_password_validators()
@@ -1,9 +1,8 @@
-import django.conf
-import django.core.cache
 import rest_framework_simplejwt.authentication
 import rest_framework_simplejwt.exceptions
 
 import business.models
+import core.principal
 import user.models
 
 
@@ -14,9 +13,10 @@ class CustomJWTAuthentication(
         """
         Authenticates the user or company based on a JWT token,
         supporting multiple user types.
-        Retrieves the appropriate model instance from the token,
-        checks token versioning and caches the authenticated instance
-        for performance.
+        The token version is checked against the Redis version registry
+        and a cached core.principal.Principal is returned rather than a
+        model instance, so the database is only queried on cache misses
+        and by views that need the model.
         """
         try:
             header = self.get_header(request)
@@ -43,38 +43,30 @@ class CustomJWTAuthentication(
             instance_id = validated_token.get(id_field)
             token_version = validated_token.get('token_version', 0)
 
-            cache_key = (
-                f'auth_instance_{user_type}_{instance_id}_v{token_version}'
-            )
-            cached_instance = django.core.cache.cache.get(cache_key)
-
-            if cached_instance:
-                return (cached_instance, validated_token)
-
             if instance_id is None:
                 raise rest_framework_simplejwt.exceptions.AuthenticationFailed(
                     f'Missing {id_field} in token',
                 )
 
-            instance = model_class.objects.get(id=instance_id)
-
-            if instance.token_version != token_version:
-                raise rest_framework_simplejwt.exceptions.AuthenticationFailed(
-                    'Token invalid',
-                )
-
-            cache_timeout = getattr(
-                django.conf.settings,
-                'AUTH_INSTANCE_CACHE_TIMEOUT',
-                3600,
+            instance = self.check_token_version(
+                model_class,
+                user_type,
+                instance_id,
+                token_version,
             )
-            django.core.cache.cache.set(
-                cache_key,
-                instance,
-                timeout=cache_timeout,
+
+            principal = core.principal.principal_cache.get(
+                user_type,
+                instance_id,
             )
+            if principal is None:
+                if instance is None:
+                    instance = model_class.objects.get(id=instance_id)
+                principal = core.principal.Principal.from_instance(instance)
+                core.principal.principal_cache.set(principal)
 
-            return (instance, validated_token)
+            principal.token_version = token_version
+            return (principal, validated_token)
 
         except (
             user.models.User.DoesNotExist,
@@ -87,3 +79,41 @@ class CustomJWTAuthentication(
             raise rest_framework_simplejwt.exceptions.AuthenticationFailed(
                 'Token is invalid or expired',
             )
+
+    def check_token_version(
+        self,
+        model_class,
+        user_type,
+        instance_id,
+        token_version,
+    ):
+        """
+        Rejects tokens issued before the last token_version bump.
+        The version is read from the Redis registry; on a miss, or when
+        the token is newer than the registered version, it is loaded
+        from the database, registered and the loaded instance is
+        returned so the caller does not query it again.
+        """
+        instance = None
+        current_version = core.principal.token_versions.get(
+            user_type,
+            instance_id,
+            at_least=token_version,
+        )
+        # Versions only grow, so a token newer than the registry means
+        # the registry missed the last bump.
+        if current_version is None or current_version < token_version:
+            instance = model_class.objects.get(id=instance_id)
+            current_version = instance.token_version
+            core.principal.token_versions.register(
+                user_type,
+                instance_id,
+                current_version,
+            )
+
+        if current_version != token_version:
+            raise rest_framework_simplejwt.exceptions.AuthenticationFailed(
+                'Token invalid',
+            )
+
+        return instance
@@ -0,0 +1,109 @@
+import contextlib
+import json
+import typing
+
+import django.conf
+import django.utils.timezone
+import django_redis
+import redis.exceptions
+
+import core.metrics
+import core.utils.transaction
+
+# (country, age, active filter, category) of a feed request.
+Segment = typing.Tuple[
+    typing.Optional[str],
+    typing.Optional[int],
+    typing.Optional[bool],
+    typing.Optional[str],
+]
+
+
+class FeedCache:
+    """
+    Redis cache of the ordered promo ids of each feed segment.
+
+    A feed only depends on the user's segment (country, age, the
+    `active` filter and the category) and on the current date, so the
+    ordered promo ids of each segment are cached and shared by all of
+    its users. Segment entries carry a global version: creating, editing
+    or deleting a promo, or a change of its availability, bumps the
+    version and so invalidates every segment with a single INCR.
+
+    Pages are then assembled from the promo representation cache.
+
+    Key schema:
+        feed:version                          segment version
+        feed:v{version}:{date}:{segment}      {"ids": [...], "count": n}
+    """
+
+    VERSION_KEY = 'feed:version'
+
+    def __init__(
+        self,
+        timeout: int = django.conf.settings.FEED_CACHE_TIMEOUT,
+        max_ids: int = django.conf.settings.FEED_CACHE_MAX_IDS,
+    ):
+        self.timeout = timeout
+        self.max_ids = max_ids
+
+    @staticmethod
+    def _connection():
+        return django_redis.get_redis_connection('default')
+
+    @staticmethod
+    def _today() -> str:
+        return django.utils.timezone.now().date().isoformat()
+
+    def segment_key(self, version: int, segment: Segment) -> str:
+        country, age, active, category = segment
+        return (
+            f'feed:v{version}:{self._today()}:'
+            f'{country or ""}:{age if age is not None else ""}:'
+            f'{"" if active is None else int(active)}:{category or ""}'
+        )
+
+    def get_segment(
+        self,
+        segment: Segment,
+        load: typing.Callable[[int], typing.Tuple[typing.List[str], int]],
+    ) -> typing.Optional[typing.Tuple[typing.List[str], int]]:
+        """
+        Returns the cached (ids, count) of the segment. On a miss
+        load(max_ids) is called to compute them: up to max_ids ordered
+        promo ids and the total number of promos in the segment.
+        Returns None if Redis is unreachable.
+        """
+        try:
+            conn = self._connection()
+            version = int(conn.get(self.VERSION_KEY) or 0)
+            key = self.segment_key(version, segment)
+            raw = conn.get(key)
+        except redis.exceptions.RedisError:
+            return None
+
+        if raw is not None:
+            core.metrics.incr('feed_cache.hits')
+            entry = json.loads(raw)
+            return entry['ids'], entry['count']
+
+        core.metrics.incr('feed_cache.misses')
+        ids, count = load(self.max_ids)
+        with contextlib.suppress(redis.exceptions.RedisError):
+            conn.set(
+                key,
+                json.dumps({'ids': ids, 'count': count}),
+                ex=self.timeout,
+            )
+        return ids, count
+
+    def invalidate_segments(self) -> None:
+        """Drops the cached ids of every segment."""
+        core.utils.transaction.now_and_on_commit(self._bump_version)
+
+    def _bump_version(self) -> None:
+        with contextlib.suppress(redis.exceptions.RedisError):
+            self._connection().incr(self.VERSION_KEY)
+
+
+feed_cache = FeedCache()
@@ -0,0 +1,212 @@
+import collections
+import typing
+
+import django.conf
+import django.db
+import django.db.models
+import django.db.transaction
+import django_redis
+import redis.exceptions
+
+import business.models
+import core.metrics
+import core.representation_cache
+import user.models
+
+# Like state of each (promo, user) pair changed since the last flush,
+# "1" for liked and "0" for unliked; the last write wins.
+PENDING_KEY = 'likes:pending'
+# Un-flushed like_count change of each promo.
+DELTAS_KEY = 'likes:deltas'
+# Snapshot of the pending hash taken by a flush in progress.
+FLUSHING_PENDING_KEY = 'likes:flushing:pending'
+
+# Applies a like or unlike unless it does not change the effective state
+# (pending, then being flushed, then persisted in ARGV[3]). Returns the
+# like_count change.
+SET_LIKE_SCRIPT = """
+local state = redis.call('HGET', KEYS[1], ARGV[1])
+if not state then
+    state = redis.call('HGET', KEYS[2], ARGV[1])
+end
+if not state then
+    state = ARGV[3]
+end
+if state == ARGV[2] then
+    return 0
+end
+local delta = ARGV[2] == '1' and 1 or -1
+redis.call('HSET', KEYS[1], ARGV[1], ARGV[2])
+redis.call('HINCRBY', KEYS[3], ARGV[4], delta)
+return delta
+"""
+
+# Moves the pending likes aside for flushing and drops their deltas,
+# unless a previous flush did not finish, in which case its snapshot is
+# flushed again. The flush computes like_count changes from the rows it
+# actually writes, so the deltas of a snapshot are never read: until it
+# commits, its likes are briefly missing from like_count rather than
+# counted twice once it has.
+SNAPSHOT_SCRIPT = """
+if redis.call('EXISTS', KEYS[3]) == 0 then
+    if redis.call('EXISTS', KEYS[1]) == 1 then
+        redis.call('RENAME', KEYS[1], KEYS[3])
+    end
+    redis.call('DEL', KEYS[2])
+end
+return redis.call('HGETALL', KEYS[3])
+"""
+
+INSERT_LIKES_SQL = """
+INSERT INTO {like} (id, user_id, promo_id, created_at)
+SELECT gen_random_uuid(), pair.user_id, pair.promo_id, now()
+FROM unnest(%s::uuid[], %s::uuid[]) AS pair (user_id, promo_id)
+JOIN {promo} ON {promo}.id = pair.promo_id
+JOIN {user} ON {user}.id = pair.user_id
+ON CONFLICT (user_id, promo_id) DO NOTHING
+RETURNING promo_id
+"""
+
+DELETE_LIKES_SQL = """
+DELETE FROM {like}
+USING unnest(%s::uuid[], %s::uuid[]) AS pair (user_id, promo_id)
+WHERE {like}.user_id = pair.user_id AND {like}.promo_id = pair.promo_id
+RETURNING {like}.promo_id
+"""
+
+
+def _connection():
+    return django_redis.get_redis_connection('default')
+
+
+def _field(promo_id, user_id) -> str:
+    return f'{promo_id}:{user_id}'
+
+
+def set_like(user_obj, promo_id: str, liked: bool) -> int:
+    """
+    Likes or unlikes the promo on behalf of the user in Redis only.
+    Idempotent; returns the change of like_count (-1, 0 or 1).
+    Raises RedisError if Redis is unreachable.
+    """
+    persisted = user.models.PromoLike.objects.filter(
+        user_id=user_obj.id,
+        promo_id=promo_id,
+    ).exists()
+
+    return _connection().eval(
+        SET_LIKE_SCRIPT,
+        3,
+        PENDING_KEY,
+        FLUSHING_PENDING_KEY,
+        DELTAS_KEY,
+        _field(promo_id, user_obj.id),
+        '1' if liked else '0',
+        '1' if persisted else '0',
+        str(promo_id),
+    )
+
+
+def apply_pending(promos: typing.List[typing.Dict], user_id=None) -> None:
+    """
+    Adds the un-flushed likes to the serialized promos in place:
+    like_count always, and is_liked_by_user of the given user when the
+    promos have it. Likes of a flush in progress only count once it has
+    committed. Does nothing unless LIKE_WRITE_BEHIND is set.
+    """
+    if not django.conf.settings.LIKE_WRITE_BEHIND or not promos:
+        return
+
+    promo_ids = [str(promo['promo_id']) for promo in promos]
+    fields = [_field(promo_id, user_id) for promo_id in promo_ids]
+
+    try:
+        pipe = _connection().pipeline(transaction=False)
+        pipe.hmget(DELTAS_KEY, promo_ids)
+        if user_id is not None:
+            pipe.hmget(PENDING_KEY, fields)
+            pipe.hmget(FLUSHING_PENDING_KEY, fields)
+        deltas, *states = pipe.execute()
+    except redis.exceptions.RedisError:
+        return
+
+    for i, promo in enumerate(promos):
+        promo['like_count'] += int(deltas[i] or 0)
+        if states and 'is_liked_by_user' in promo:
+            state = states[0][i] or states[1][i]
+            if state is not None:
+                promo['is_liked_by_user'] = state == b'1'
+
+
+def flush(batch_size: int = 1000) -> typing.Dict[str, int]:
+    """
+    Writes the buffered likes to Postgres: PromoLike rows are inserted
+    and deleted in batches and like_count is changed by the number of
+    rows actually written, so re-running an interrupted flush does not
+    count a like twice.
+    """
+    conn = _connection()
+    raw = conn.eval(
+        SNAPSHOT_SCRIPT,
+        3,
+        PENDING_KEY,
+        DELTAS_KEY,
+        FLUSHING_PENDING_KEY,
+    )
+    states = dict(zip(raw[::2], raw[1::2], strict=True))
+
+    likes, unlikes = [], []
+    for field, state in states.items():
+        promo_id, user_id = field.decode().split(':')
+        (likes if state == b'1' else unlikes).append((user_id, promo_id))
+
+    deltas = collections.Counter()
+    with django.db.transaction.atomic():
+        for pairs, sql, sign in (
+            (likes, INSERT_LIKES_SQL, 1),
+            (unlikes, DELETE_LIKES_SQL, -1),
+        ):
+            for start in range(0, len(pairs), batch_size):
+                batch = pairs[start : start + batch_size]
+                for promo_id in _execute(sql, batch):
+                    deltas[str(promo_id)] += sign
+
+        deltas = {pk: delta for pk, delta in deltas.items() if delta}
+        if deltas:
+            business.models.Promo.objects.filter(pk__in=deltas).update(
+                like_count=django.db.models.F('like_count')
+                + django.db.models.Case(
+                    *(
+                        django.db.models.When(pk=pk, then=delta)
+                        for pk, delta in deltas.items()
+                    ),
+                    default=0,
+                ),
+            )
+
+    conn.delete(FLUSHING_PENDING_KEY)
+    core.representation_cache.representation_cache.invalidate(deltas)
+    core.metrics.incr('likes.flushed', len(states))
+
+    return {
+        'likes': len(likes),
+        'unlikes': len(unlikes),
+        'promos': len(deltas),
+    }
+
+
+def _execute(sql, pairs):
+    if not pairs:
+        return []
+
+    user_ids, promo_ids = zip(*pairs, strict=True)
+    with django.db.connection.cursor() as cursor:
+        cursor.execute(
+            sql.format(
+                like=user.models.PromoLike._meta.db_table,
+                promo=business.models.Promo._meta.db_table,
+                user=user.models.User._meta.db_table,
+            ),
+            [list(user_ids), list(promo_ids)],
+        )
+        return [row[0] for row in cursor.fetchall()]
@@ -0,0 +1,123 @@
+import concurrent.futures
+import threading
+import time
+import uuid
+
+import django.core.management.base
+import django.db
+
+import business.constants
+import business.models
+import core.principal
+import user.models
+import user.services
+
+
+class Command(django.core.management.base.BaseCommand):
+    help = (
+        'Measures promo code issuance throughput (activations/sec) '
+        'as the number of concurrent workers grows. '
+        'Targeting and anti-fraud checks are skipped.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            default='1,2,4,8,16',
+            help='Comma-separated list of worker counts to benchmark.',
+        )
+        parser.add_argument(
+            '--activations',
+            type=int,
+            default=2000,
+            help='Number of activations performed for each worker count.',
+        )
+        parser.add_argument(
+            '--mode',
+            choices=[
+                business.constants.PROMO_MODE_COMMON,
+                business.constants.PROMO_MODE_UNIQUE,
+            ],
+            default=business.constants.PROMO_MODE_UNIQUE,
+            help='Mode of the benchmarked promo.',
+        )
+
+    def handle(self, *args, **options):
+        worker_counts = [int(n) for n in options['workers'].split(',')]
+        activations = options['activations']
+        mode = options['mode']
+
+        suffix = uuid.uuid4().hex[:12]
+        company = business.models.Company.objects.create_company(
+            email=f'bench-{suffix}@example.com',
+            name='Activation Benchmark',
+        )
+        user_ = user.models.User.objects.create_user(
+            email=f'bench-{suffix}@example.com',
+            name='Bench',
+            surname='Mark',
+            other={'age': 30, 'country': 'us'},
+        )
+
+        try:
+            for workers in worker_counts:
+                promo = self._create_promo(company, mode, activations)
+                elapsed = self._run(user_, promo, workers, activations)
+                self.stdout.write(
+                    f'mode={mode} '
+                    f'workers={workers:<4} '
+                    f'activations={activations:<7} '
+                    f'elapsed={elapsed:.2f}s '
+                    f'activations/sec={activations / elapsed:.1f}',
+                )
+        finally:
+            company.delete()
+            user_.delete()
+
+    def _create_promo(self, company, mode, activations):
+        if mode == business.constants.PROMO_MODE_COMMON:
+            return business.models.Promo.objects.create_promo(
+                user=company,
+                target_data={},
+                promo_common='bench-common',
+                promo_unique=None,
+                description='Activation benchmark promo',
+                mode=mode,
+                max_count=activations,
+            )
+
+        return business.models.Promo.objects.create_promo(
+            user=company,
+            target_data={},
+            promo_common=None,
+            promo_unique=[f'code-{i}' for i in range(activations)],
+            description='Activation benchmark promo',
+            mode=mode,
+            max_count=business.constants.PROMO_UNIQUE_MAX_COUNT,
+        )
+
+    def _run(self, user_, promo, workers, activations):
+        remaining = iter(range(activations))
+        lock = threading.Lock()
+
+        def worker():
+            service = user.services.PromoActivationService(
+                core.principal.Principal.from_instance(user_),
+                promo,
+            )
+            try:
+                while True:
+                    with lock:
+                        if next(remaining, None) is None:
+                            return
+                    service._issue_promo_code()
+            finally:
+                django.db.connection.close()
+
+        started = time.perf_counter()
+        with concurrent.futures.ThreadPoolExecutor(workers) as executor:
+            futures = [executor.submit(worker) for _ in range(workers)]
+            for future in futures:
+                future.result()
+
+        return time.perf_counter() - started
@@ -0,0 +1,135 @@
+import random
+import statistics
+import time
+import uuid
+
+import django.core.management.base
+import django.db
+
+import business.constants
+import business.models
+
+
+class Command(django.core.management.base.BaseCommand):
+    help = (
+        'Seeds a large number of promos and compares the latency of the '
+        'feed category filter on the JSON target (substring scan) and on '
+        'the GIN-indexed target_categories column (containment).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--promos',
+            type=int,
+            default=1_000_000,
+            help='Number of promos to seed.',
+        )
+        parser.add_argument(
+            '--categories',
+            type=int,
+            default=1000,
+            help='Number of distinct categories to draw from.',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=20,
+            help='Number of timed runs of each query.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=10_000,
+            help='Number of promos inserted per query while seeding.',
+        )
+        parser.add_argument(
+            '--keep',
+            action='store_true',
+            help='Keep the seeded promos instead of deleting them.',
+        )
+
+    def handle(self, *args, **options):
+        suffix = uuid.uuid4().hex[:12]
+        company = business.models.Company.objects.create_company(
+            email=f'bench-{suffix}@example.com',
+            name='Feed Benchmark',
+        )
+        categories = [f'cat{i}' for i in range(options['categories'])]
+
+        try:
+            self._seed(
+                company,
+                categories,
+                options['promos'],
+                options['batch_size'],
+            )
+            category = random.choice(categories)
+            queries = {
+                'json icontains': business.models.Promo.objects.filter(
+                    target__categories__icontains=f'"{category}"',
+                ),
+                'array contains': business.models.Promo.objects.filter(
+                    target_categories__contains=[category],
+                ),
+            }
+            for name, queryset in queries.items():
+                self._run(name, queryset, options['repeat'])
+        finally:
+            if not options['keep']:
+                self.stdout.write('Deleting seeded promos...')
+                with django.db.connection.cursor() as cursor:
+                    cursor.execute(
+                        'DELETE FROM business_promo WHERE company_id = %s',
+                        [company.id],
+                    )
+                company.delete()
+
+    def _seed(self, company, categories, count, batch_size):
+        started = time.perf_counter()
+        for offset in range(0, count, batch_size):
+            promos = []
+            for _ in range(min(batch_size, count - offset)):
+                promo = business.models.Promo(
+                    company=company,
+                    description='Feed benchmark promo',
+                    target={
+                        'categories': random.sample(
+                            categories,
+                            random.randint(1, 3),
+                        ),
+                    },
+                    max_count=10,
+                    mode=business.constants.PROMO_MODE_COMMON,
+                    promo_common='bench',
+                )
+                promo.sync_target_columns()
+                promos.append(promo)
+            business.models.Promo.objects.bulk_create(promos)
+
+        with django.db.connection.cursor() as cursor:
+            cursor.execute('ANALYZE business_promo')
+
+        self.stdout.write(
+            f'Seeded {count} promos in {time.perf_counter() - started:.1f}s',
+        )
+
+    def _run(self, name, queryset, repeat):
+        page = queryset.order_by('-created_at', '-id')[:10]
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            list(page.all())
+            queryset.count()
+            timings.append((time.perf_counter() - started) * 1000)
+
+        scans = [
+            line.strip(' ->')
+            for line in queryset.explain().splitlines()
+            if 'Scan' in line
+        ]
+        self.stdout.write(
+            f'{name:<16} '
+            f'median={statistics.median(timings):.2f}ms '
+            f'max={max(timings):.2f}ms '
+            f'plan: {scans[0] if scans else "?"}',
+        )
@@ -0,0 +1,75 @@
+import concurrent.futures
+import os
+import statistics
+import time
+
+import django.contrib.auth.hashers
+import django.core.management.base
+
+import core.hashers
+
+
+class Command(django.core.management.base.BaseCommand):
+    help = (
+        'Measures the latency of one password check and the sign-in '
+        'throughput, overall and per core, of each Argon2 cost profile '
+        '(PASSWORD_HASH_PROFILE). A sign-in verifies the password once.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--profiles',
+            nargs='+',
+            choices=sorted(core.hashers.PROFILES),
+            default=list(core.hashers.PROFILES),
+            help='Profiles to measure.',
+        )
+        parser.add_argument(
+            '--processes',
+            type=int,
+            default=os.cpu_count(),
+            help='Number of processes checking passwords in parallel.',
+        )
+        parser.add_argument(
+            '--signins',
+            type=int,
+            default=200,
+            help='Number of password checks per profile.',
+        )
+
+    def handle(self, *args, **options):
+        processes = options['processes']
+        password = 'BenchmarkPassword1!'
+        salt = django.contrib.auth.hashers.Argon2PasswordHasher().salt()
+
+        with concurrent.futures.ProcessPoolExecutor(processes) as executor:
+            for profile in options['profiles']:
+                params = core.hashers.PROFILES[profile]
+                encoded = core.hashers.encode(params, password, salt)
+
+                timings = []
+                for _ in range(5):
+                    started = time.perf_counter()
+                    core.hashers.verify(params, password, encoded)
+                    timings.append((time.perf_counter() - started) * 1000)
+
+                started = time.perf_counter()
+                futures = [
+                    executor.submit(
+                        core.hashers.verify,
+                        params,
+                        password,
+                        encoded,
+                    )
+                    for _ in range(options['signins'])
+                ]
+                for future in concurrent.futures.as_completed(futures):
+                    future.result()
+                rate = options['signins'] / (time.perf_counter() - started)
+
+                self.stdout.write(
+                    f'{profile:<12} '
+                    f'check={statistics.median(timings):.1f}ms '
+                    f'signins/s={rate:.1f} '
+                    f'per core={rate / processes:.1f}',
+                )
@@ -0,0 +1,26 @@
+import django.conf
+import django.core.management.base
+
+import user.partitions
+
+
+class Command(django.core.management.base.BaseCommand):
+    help = (
+        'Creates the monthly partitions of the promo activation history '
+        'ahead of time and moves activations out of the default '
+        'partition. Safe to run repeatedly, e.g. daily from cron.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--ahead',
+            type=int,
+            default=django.conf.settings.HISTORY_PARTITIONS_AHEAD,
+            help='Number of months after the current one to create.',
+        )
+
+    def handle(self, *args, **options):
+        created = user.partitions.ensure_partitions(options['ahead'])
+        for name in created:
+            self.stdout.write(f'created {name}')
+        self.stdout.write(f'partitions={len(created)}')
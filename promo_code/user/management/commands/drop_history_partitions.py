@@ -0,0 +1,49 @@
+import datetime
+
+import django.core.management.base
+
+import user.partitions
+
+
+def month(value):
+    return datetime.datetime.strptime(value, '%Y-%m').date()
+
+
+class Command(django.core.management.base.BaseCommand):
+    help = (
+        'Detaches the monthly partitions of the promo activation history '
+        'older than the given month. Their activations no longer count in '
+        'promo stats, activation flags or user histories. The tables are '
+        'kept as <partition>_archived unless --drop is given.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--before',
+            type=month,
+            required=True,
+            help='Detach the partitions of the months before this one '
+            '(YYYY-MM).',
+        )
+        parser.add_argument(
+            '--drop',
+            action='store_true',
+            help='Drop the detached partitions, deleting their activations '
+            'for good.',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only print the partitions that would be detached.',
+        )
+
+    def handle(self, *args, **options):
+        names = user.partitions.detach_partitions(
+            options['before'],
+            drop=options['drop'],
+            dry_run=options['dry_run'],
+        )
+        action = 'dropped' if options['drop'] else 'archived'
+        for name in names:
+            self.stdout.write(f'{action} {name}')
+        self.stdout.write(f'partitions={len(names)}')
@@ -0,0 +1,40 @@
+import time
+
+import django.conf
+import django.core.management.base
+
+import user.like_buffer
+
+
+class Command(django.core.management.base.BaseCommand):
+    help = (
+        'Writes likes buffered in Redis (LIKE_WRITE_BEHIND) to the '
+        'database and applies the like_count changes in one batch.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=django.conf.settings.LIKE_FLUSH_BATCH_SIZE,
+            help='Number of likes inserted or deleted per query.',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=0,
+            help='Repeat every N seconds instead of running once.',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            stats = user.like_buffer.flush(batch_size=options['batch_size'])
+            self.stdout.write(
+                f'likes={stats["likes"]} '
+                f'unlikes={stats["unlikes"]} '
+                f'promos={stats["promos"]}',
+            )
+
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
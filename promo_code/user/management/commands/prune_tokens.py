@@ -0,0 +1,38 @@
+import time
+
+import django.conf
+import django.core.management.base
+
+import user.token_blacklist
+
+
+class Command(django.core.management.base.BaseCommand):
+    help = (
+        'Deletes expired refresh tokens and their blacklist entries in '
+        'batches, keeping both token tables bounded.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=django.conf.settings.TOKEN_PRUNE_BATCH_SIZE,
+            help='Number of tokens deleted per query.',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=0,
+            help='Repeat every N seconds instead of running once.',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            deleted = user.token_blacklist.prune_expired(
+                batch_size=options['batch_size'],
+            )
+            self.stdout.write(f'tokens={deleted}')
+
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
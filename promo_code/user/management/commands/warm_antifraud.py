@@ -0,0 +1,70 @@
+import time
+
+import django.conf
+import django.core.management.base
+
+import user.antifraud_warmer
+
+
+class Command(django.core.management.base.BaseCommand):
+    help = (
+        'Pre-fetches anti-fraud verdicts for users who recently browsed '
+        'the feed, so their first activation is served from the cache.'
+    )
+
+    def add_arguments(self, parser):
+        settings = django.conf.settings
+        parser.add_argument(
+            '--window',
+            type=int,
+            default=settings.ANTIFRAUD_WARMER_WINDOW,
+            help='Warm users active within this many seconds.',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=settings.ANTIFRAUD_WARMER_WORKERS,
+            help='Maximum number of concurrent upstream requests.',
+        )
+        parser.add_argument(
+            '--rate',
+            type=float,
+            default=settings.ANTIFRAUD_WARMER_RATE,
+            help='Maximum number of upstream requests per second.',
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=settings.ANTIFRAUD_WARMER_BATCH_SIZE,
+            help='Maximum number of users warmed per run.',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=0,
+            help='Repeat every N seconds instead of running once.',
+        )
+
+    def handle(self, *args, **options):
+        if not django.conf.settings.ANTIFRAUD_WARMER_ENABLED:
+            raise django.core.management.base.CommandError(
+                'ANTIFRAUD_WARMER_ENABLED is off: feed visits '
+                'are not being recorded.',
+            )
+
+        while True:
+            stats = user.antifraud_warmer.warm(
+                window=options['window'],
+                workers=options['workers'],
+                rate=options['rate'],
+                limit=options['limit'],
+            )
+            self.stdout.write(
+                f'users={stats["users"]} '
+                f'cached={stats["cached"]} '
+                f'fetched={stats["fetched"]}',
+            )
+
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
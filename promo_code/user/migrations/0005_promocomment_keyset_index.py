@@ -0,0 +1,25 @@
+# Generated by Django 5.2 on 2026-10-18 00:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("business", "0010_promo_is_available"),
+        ("user", "0004_promoactivationhistory"),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name="promocomment",
+            options={"ordering": ["-created_at", "-id"]},
+        ),
+        migrations.AddIndex(
+            model_name="promocomment",
+            index=models.Index(
+                fields=["promo", "-created_at", "-id"],
+                name="comment_promo_created_at_idx",
+            ),
+        ),
+    ]
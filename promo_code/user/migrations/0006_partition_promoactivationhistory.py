@@ -0,0 +1,111 @@
+# Generated by Django 5.2 on 2026-10-18 00:38
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+# The old table is renamed and dropped as a whole, so no name of its
+# indexes or constraints is assumed; the new ones are only created once
+# it is gone, so they cannot clash with them. Rows are copied into the
+# DEFAULT partition; `manage.py create_history_partitions` then moves
+# them into monthly partitions.
+PARTITION_SQL = """
+ALTER TABLE user_promoactivationhistory
+    RENAME TO user_promoactivationhistory_old;
+
+CREATE TABLE user_promoactivationhistory (
+    id uuid NOT NULL,
+    activated_at timestamp with time zone NOT NULL,
+    promo_id uuid NOT NULL,
+    user_id uuid NOT NULL
+) PARTITION BY RANGE (activated_at);
+CREATE TABLE user_promoactivationhistory_default
+    PARTITION OF user_promoactivationhistory DEFAULT;
+
+INSERT INTO user_promoactivationhistory (id, activated_at, promo_id, user_id)
+SELECT id, activated_at, promo_id, user_id
+FROM user_promoactivationhistory_old;
+DROP TABLE user_promoactivationhistory_old;
+
+ALTER TABLE user_promoactivationhistory
+    ADD CONSTRAINT user_promoactivationhistory_pkey
+        PRIMARY KEY (id, activated_at),
+    ADD CONSTRAINT user_promoactivation_promo_id_fd87d6c9_fk_business_
+        FOREIGN KEY (promo_id) REFERENCES business_promo (id)
+        DEFERRABLE INITIALLY DEFERRED,
+    ADD CONSTRAINT user_promoactivationhistory_user_id_320c3d87_fk_user_user_id
+        FOREIGN KEY (user_id) REFERENCES user_user (id)
+        DEFERRABLE INITIALLY DEFERRED;
+CREATE INDEX user_promoactivationhistory_promo_id_fd87d6c9
+    ON user_promoactivationhistory (promo_id);
+CREATE INDEX history_user_activated_at_idx
+    ON user_promoactivationhistory (user_id, activated_at DESC);
+"""
+
+UNPARTITION_SQL = """
+ALTER TABLE user_promoactivationhistory
+    RENAME TO user_promoactivationhistory_old;
+
+CREATE TABLE user_promoactivationhistory (
+    id uuid NOT NULL,
+    activated_at timestamp with time zone NOT NULL,
+    promo_id uuid NOT NULL,
+    user_id uuid NOT NULL
+);
+
+INSERT INTO user_promoactivationhistory (id, activated_at, promo_id, user_id)
+SELECT id, activated_at, promo_id, user_id
+FROM user_promoactivationhistory_old;
+DROP TABLE user_promoactivationhistory_old;
+
+ALTER TABLE user_promoactivationhistory
+    ADD CONSTRAINT user_promoactivationhistory_pkey PRIMARY KEY (id),
+    ADD CONSTRAINT user_promoactivation_promo_id_fd87d6c9_fk_business_
+        FOREIGN KEY (promo_id) REFERENCES business_promo (id)
+        DEFERRABLE INITIALLY DEFERRED,
+    ADD CONSTRAINT user_promoactivationhistory_user_id_320c3d87_fk_user_user_id
+        FOREIGN KEY (user_id) REFERENCES user_user (id)
+        DEFERRABLE INITIALLY DEFERRED;
+CREATE INDEX user_promoactivationhistory_promo_id_fd87d6c9
+    ON user_promoactivationhistory (promo_id);
+CREATE INDEX user_promoactivationhistory_user_id_320c3d87
+    ON user_promoactivationhistory (user_id);
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("business", "0010_promo_is_available"),
+        ("user", "0005_promocomment_keyset_index"),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(
+                    sql=PARTITION_SQL,
+                    reverse_sql=UNPARTITION_SQL,
+                ),
+            ],
+            state_operations=[
+                migrations.AlterField(
+                    model_name="promoactivationhistory",
+                    name="user",
+                    field=models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="promo_activations",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                migrations.AddIndex(
+                    model_name="promoactivationhistory",
+                    index=models.Index(
+                        fields=["user", "-activated_at"],
+                        name="history_user_activated_at_idx",
+                    ),
+                ),
+            ],
+        ),
+    ]
@@ -138,13 +138,28 @@ class PromoComment(django.db.models.Model):
     updated_at = django.db.models.DateTimeField(auto_now=True)
 
     class Meta:
-        ordering = ['-created_at']
+        ordering = ['-created_at', '-id']
+        indexes = [
+            django.db.models.Index(
+                fields=['promo', '-created_at', '-id'],
+                name='comment_promo_created_at_idx',
+            ),
+        ]
 
     def __str__(self):
         return f'Comment by {self.author.email} on promo {self.promo.id}'
 
 
 class PromoActivationHistory(django.db.models.Model):
+    """
+    Append-only log of promo activations.
+
+    The table is partitioned by month of activated_at (see
+    user.partitions). Postgres requires the partition key in every
+    unique constraint, so the primary key in the database is
+    (id, activated_at).
+    """
+
     id = django.db.models.UUIDField(
         'UUID',
         primary_key=True,
@@ -155,6 +170,7 @@ class PromoActivationHistory(django.db.models.Model):
         User,
         on_delete=django.db.models.CASCADE,
         related_name='promo_activations',
+        db_index=False,
     )
     promo = django.db.models.ForeignKey(
         business.models.Promo,
@@ -165,6 +181,12 @@ class PromoActivationHistory(django.db.models.Model):
 
     class Meta:
         ordering = ['-activated_at']
+        indexes = [
+            django.db.models.Index(
+                fields=['user', '-activated_at'],
+                name='history_user_activated_at_idx',
+            ),
+        ]
 
     def __str__(self):
         return f'{self.user} activated {self.promo.id} at {self.activated_at}'
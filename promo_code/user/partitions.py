@@ -0,0 +1,143 @@
+import datetime
+import typing
+
+import django.db
+import django.db.transaction
+import django.utils.timezone
+
+import user.models
+
+TABLE = user.models.PromoActivationHistory._meta.db_table
+# Catches activations outside every monthly partition, so an insert never
+# fails when partitions were not created in time.
+DEFAULT_PARTITION = f'{TABLE}_default'
+
+PARTITIONS_SQL = """
+SELECT child.relname
+FROM pg_inherits
+JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+WHERE parent.relname = %s
+"""
+
+
+def add_months(month: datetime.date, count: int) -> datetime.date:
+    index = month.year * 12 + month.month - 1 + count
+    return datetime.date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: datetime.date) -> str:
+    return f'{TABLE}_p{month:%Y_%m}'
+
+
+def _bounds(month: datetime.date) -> typing.Tuple[str, str]:
+    return (
+        f'{month.isoformat()} 00:00:00+00',
+        f'{add_months(month, 1).isoformat()} 00:00:00+00',
+    )
+
+
+def list_partitions() -> typing.List[datetime.date]:
+    """Returns the first day of each month that has a partition."""
+    prefix = f'{TABLE}_p'
+    with django.db.connection.cursor() as cursor:
+        cursor.execute(PARTITIONS_SQL, [TABLE])
+        names = [row[0] for row in cursor.fetchall()]
+
+    return sorted(
+        datetime.datetime.strptime(name[len(prefix) :], '%Y_%m').date()
+        for name in names
+        if name.startswith(prefix)
+    )
+
+
+def create_partition(month: datetime.date) -> None:
+    """
+    Creates the partition of the given month. Activations of that month
+    that already landed in the default partition are moved into it.
+    """
+    name = partition_name(month)
+    lower, upper = _bounds(month)
+
+    with django.db.transaction.atomic(), django.db.connection.cursor() as c:
+        c.execute(f'LOCK TABLE {DEFAULT_PARTITION} IN EXCLUSIVE MODE')
+        c.execute(
+            f'CREATE TABLE {name} '
+            f'(LIKE {TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)',
+        )
+        c.execute(
+            f'WITH moved AS ('
+            f'DELETE FROM {DEFAULT_PARTITION} '
+            f'WHERE activated_at >= %s AND activated_at < %s '
+            f'RETURNING *'
+            f') INSERT INTO {name} SELECT * FROM moved',
+            [lower, upper],
+        )
+        c.execute(
+            f'ALTER TABLE {TABLE} ATTACH PARTITION {name} '
+            f'FOR VALUES FROM (%s) TO (%s)',
+            [lower, upper],
+        )
+
+
+def ensure_partitions(ahead: int) -> typing.List[str]:
+    """
+    Creates the missing partitions from the oldest activation in the
+    default partition (or the current month) up to `ahead` months after
+    the current one. Returns the names of the created partitions.
+    """
+    current = django.utils.timezone.now().date().replace(day=1)
+    with django.db.connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT min(activated_at) FROM {DEFAULT_PARTITION}',
+        )
+        oldest = cursor.fetchone()[0]
+
+    month = min(current, oldest.date().replace(day=1)) if oldest else current
+    existing = set(list_partitions())
+    created = []
+    while month <= add_months(current, ahead):
+        if month not in existing:
+            create_partition(month)
+            created.append(partition_name(month))
+        month = add_months(month, 1)
+
+    return created
+
+
+def archive_name(month: datetime.date) -> str:
+    return f'{partition_name(month)}_archived'
+
+
+def detach_partitions(
+    before: datetime.date,
+    drop: bool = False,
+    dry_run: bool = False,
+) -> typing.List[str]:
+    """
+    Detaches the partitions of the months before the month of `before`
+    and returns their names. Their activations no longer count in promo
+    stats, activation flags or user histories. The detached tables are
+    kept, renamed by archive_name(), unless `drop` is set, in which case
+    they are dropped with every activation they hold.
+    """
+    cutoff = before.replace(day=1)
+    months = [month for month in list_partitions() if month < cutoff]
+    if dry_run:
+        return [partition_name(month) for month in months]
+
+    for month in months:
+        name = partition_name(month)
+        with (
+            django.db.transaction.atomic(),
+            django.db.connection.cursor() as cursor,
+        ):
+            cursor.execute(f'ALTER TABLE {TABLE} DETACH PARTITION {name}')
+            if drop:
+                cursor.execute(f'DROP TABLE {name}')
+            else:
+                cursor.execute(
+                    f'ALTER TABLE {name} RENAME TO {archive_name(month)}',
+                )
+
+    return [partition_name(month) for month in months]
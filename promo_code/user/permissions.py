@@ -13,4 +13,4 @@ class IsOwnerOrReadOnly(rest_framework.permissions.BasePermission):
         if request.method in rest_framework.permissions.SAFE_METHODS:
             return True
 
-        return obj.author == request.user
+        return obj.author_id == request.user.id
@@ -1,15 +1,16 @@
-import django.core.cache
+import django.contrib.auth.models
 import django.db.transaction
 import rest_framework.exceptions
 import rest_framework.serializers
 import rest_framework_simplejwt.serializers
-import rest_framework_simplejwt.token_blacklist.models as tb_models
-import rest_framework_simplejwt.tokens
+import rest_framework_simplejwt.settings
 
 import business.constants
+import core.principal
 import core.serializers
 import core.utils.auth
 import user.models
+import user.token_blacklist as token_blacklist
 
 
 class SignUpSerializer(core.serializers.BaseUserSerializer):
@@ -45,16 +46,20 @@ class SignInSerializer(
 
         self.user = user
 
-        data = super().validate(attrs)
+        # The password has been checked above; the parent's validate()
+        # would verify it a second time, so tokens are issued here, as
+        # TokenObtainPairSerializer.validate() does.
+        refresh = self.get_token(user)
+        self.blacklist_other_tokens(user, refresh['jti'])
 
-        refresh = data.get('refresh')
-        if refresh:
-            refresh_token = rest_framework_simplejwt.tokens.RefreshToken(
-                refresh,
-            )
-            self.blacklist_other_tokens(user, refresh_token['jti'])
+        settings = rest_framework_simplejwt.settings.api_settings
+        if settings.UPDATE_LAST_LOGIN:
+            django.contrib.auth.models.update_last_login(None, user)
 
-        return data
+        return {
+            'refresh': str(refresh),
+            'access': str(refresh.access_token),
+        }
 
     def authenticate_user(self, attrs):
         email = attrs.get('email')
@@ -75,14 +80,7 @@ class SignInSerializer(
         return user
 
     def blacklist_other_tokens(self, user, current_jti):
-        qs = tb_models.OutstandingToken.objects.filter(user=user).exclude(
-            jti=current_jti,
-        )
-        blacklisted = [tb_models.BlacklistedToken(token=tok) for tok in qs]
-        tb_models.BlacklistedToken.objects.bulk_create(
-            blacklisted,
-            ignore_conflicts=True,
-        )
+        token_blacklist.blacklist_other_tokens(user.id, current_jti)
 
     @classmethod
     def get_token(cls, user):
@@ -142,13 +140,12 @@ class UserProfileSerializer(core.serializers.BaseUserSerializer):
 
     def _invalidate_cache(self, instance):
         """
-        Private helper to remove the authentication instance cache key.
+        Private helper to drop the cached principal, which carries
+        the user's age and country.
         """
-
-        user_type = instance.__class__.__name__.lower()
-        token_version = getattr(instance, 'token_version', None)
-        django.core.cache.cache.delete(
-            f'auth_instance_{user_type}_{instance.id}_v{token_version}',
+        core.principal.principal_cache.invalidate(
+            instance._meta.model_name,
+            instance.id,
         )
 
 
@@ -168,6 +165,10 @@ class UserFeedQuerySerializer(
     active = rest_framework.serializers.BooleanField(
         required=False,
     )
+    cursor = rest_framework.serializers.CharField(
+        required=False,
+        allow_blank=True,
+    )
 
     def validate(self, attrs):
         query_params = self.initial_data.keys()
@@ -1,10 +1,13 @@
-import django.db.models
+import time
+
+import asgiref.sync
 import django.db.transaction
-import django.utils.timezone
 import rest_framework.exceptions
 
 import business.constants
 import business.models
+import core.metrics
+import core.principal
 import user.antifraud_service
 import user.models
 
@@ -50,7 +53,11 @@ class AntiFraudError(PromoActivationError):
 class PromoActivationService:
     """Service to encapsulate promo code activation logic."""
 
-    def __init__(self, user: user.models.User, promo: business.models.Promo):
+    def __init__(
+        self,
+        user: core.principal.Principal,
+        promo: business.models.Promo,
+    ):
         self.user = user
         self.promo = promo
 
@@ -59,22 +66,44 @@ class PromoActivationService:
         Main method that starts the validation and activation process.
         Returns the promo code on success.
         """
-        self._validate_targeting()
-        self._validate_is_active()
-        self._validate_antifraud()
+        started = time.perf_counter()
+        try:
+            self._validate_targeting()
+            self._validate_is_active()
+            self._validate_antifraud()
+
+            return self._issue_promo_code()
+        finally:
+            core.metrics.observe(
+                'promo.activation',
+                time.perf_counter() - started,
+            )
 
-        return self._issue_promo_code()
+    async def aactivate(self) -> str:
+        """
+        Async variant of activate(). The anti-fraud check is awaited without
+        holding a thread; database work runs in Django's sync thread, so the
+        code is still issued in a single transaction.
+        """
+        started = time.perf_counter()
+        try:
+            self._validate_targeting()
+            await asgiref.sync.sync_to_async(self._validate_is_active)()
+            await self._avalidate_antifraud()
+
+            return await asgiref.sync.sync_to_async(self._issue_promo_code)()
+        finally:
+            core.metrics.observe(
+                'promo.activation',
+                time.perf_counter() - started,
+            )
 
     def _validate_targeting(self):
         """Checks if the user matches the promotion's targeting settings."""
         target = self.promo.target
 
-        user_age = self.user.other.get('age')
-        user_country = (
-            self.user.other.get('country', '').lower()
-            if self.user.other.get('country')
-            else None
-        )
+        user_age = self.user.age
+        user_country = self.user.country.lower() if self.user.country else None
 
         if target.get('country') and user_country != target['country'].lower():
             raise TargetingError('Country mismatch.')
@@ -102,6 +131,17 @@ class PromoActivationService:
         if not antifraud_response.get('ok'):
             raise AntiFraudError()
 
+    async def _avalidate_antifraud(self):
+        """Sends a request to the anti-fraud system without blocking."""
+        antifraud_response = (
+            await user.antifraud_service.antifraud_service.aget_verdict(
+                self.user.email,
+                str(self.promo.id),
+            )
+        )
+        if not antifraud_response.get('ok'):
+            raise AntiFraudError()
+
     def _issue_promo_code(self) -> str:
         """
         Issues a promo code in an atomic transaction, updates counters,
@@ -109,36 +149,57 @@ class PromoActivationService:
         """
         try:
             with django.db.transaction.atomic():
-                promo_locked = (
-                    business.models.Promo.objects.select_for_update().get(
-                        id=self.promo.id,
-                    )
-                )
-                promo_code_value = None
-
-                if promo_locked.mode == business.constants.PROMO_MODE_COMMON:
-                    if promo_locked.used_count < promo_locked.max_count:
-                        promo_locked.used_count = (
-                            django.db.models.F('used_count') + 1
-                        )
-                        promo_locked.save(update_fields=['used_count'])
-                        promo_code_value = promo_locked.promo_common
+                if self.promo.mode == business.constants.PROMO_MODE_COMMON:
+                    promo_code_value = self._issue_common_code()
                 else:
-                    unique_code = promo_locked.unique_codes.filter(
-                        is_used=False,
-                    ).first()
-                    if unique_code:
-                        unique_code.is_used = True
-                        unique_code.used_at = django.utils.timezone.now()
-                        unique_code.save(update_fields=['is_used', 'used_at'])
-                        promo_code_value = unique_code.code
-
-                if promo_code_value:
-                    user.models.PromoActivationHistory.objects.create(
-                        user=self.user,
-                        promo=promo_locked,
-                    )
-                    return promo_code_value
+                    promo_code_value = self._issue_unique_code()
+
+                if not promo_code_value:
+                    raise PromoUnavailableError()
+
+                user.models.PromoActivationHistory.objects.create(
+                    user_id=self.user.id,
+                    promo_id=self.promo.id,
+                )
+                return promo_code_value
 
         except business.models.Promo.DoesNotExist:
             raise PromoActivationError('Promo not found.')
+
+        except PromoUnavailableError:
+            # The activation was rolled back, so the flag is corrected in
+            # a transaction of its own, in case it is still set on a promo
+            # that ran out (e.g. one exhausted before this was tracked).
+            business.models.Promo.objects.refresh_availability(
+                [self.promo.id],
+            )
+            raise
+
+    def _issue_common_code(self) -> str | None:
+        """
+        Reserves one use of a COMMON promo from its sharded usage counter
+        and returns the shared code.
+        """
+        promo = business.models.Promo.objects.only(
+            'id',
+            'max_count',
+            'used_count',
+            'promo_common',
+        ).get(id=self.promo.id)
+
+        if not business.models.PromoUsageShard.objects.reserve(promo):
+            return None
+        return promo.promo_common
+
+    def _issue_unique_code(self) -> str | None:
+        """
+        Claims a free code of a UNIQUE promo without locking the promo row,
+        so concurrent activations only contend for individual codes.
+        """
+        if not business.models.Promo.objects.filter(id=self.promo.id).exists():
+            raise business.models.Promo.DoesNotExist
+
+        unique_code = business.models.PromoCode.objects.claim_unused(
+            self.promo.id,
+        )
+        return unique_code.code if unique_code else None
@@ -0,0 +1,53 @@
+import django.db.models.signals
+import django.dispatch
+
+import business.models
+import business.signals
+import core.representation_cache
+import user.feed_cache
+import user.models
+
+# Saves touching only these fields leave every feed segment unchanged.
+COUNTER_FIELDS = frozenset(('like_count', 'comment_count'))
+
+
+@django.dispatch.receiver(
+    django.db.models.signals.post_save,
+    sender=business.models.Promo,
+)
+def invalidate_on_promo_save(sender, instance, update_fields, **kwargs):
+    if update_fields is None or not update_fields <= COUNTER_FIELDS:
+        user.feed_cache.feed_cache.invalidate_segments()
+    core.representation_cache.representation_cache.invalidate([instance.pk])
+
+
+@django.dispatch.receiver(
+    django.db.models.signals.post_delete,
+    sender=business.models.Promo,
+)
+def invalidate_on_promo_delete(sender, instance, **kwargs):
+    user.feed_cache.feed_cache.invalidate_segments()
+    core.representation_cache.representation_cache.invalidate([instance.pk])
+    sender.objects.forget_exists(instance.pk)
+
+
+@django.dispatch.receiver(business.signals.promo_availability_changed)
+def invalidate_on_availability_change(sender, promo_ids, **kwargs):
+    user.feed_cache.feed_cache.invalidate_segments()
+    core.representation_cache.representation_cache.invalidate(promo_ids)
+
+
+@django.dispatch.receiver(business.signals.promo_counters_changed)
+def invalidate_on_counters_change(sender, promo_ids, **kwargs):
+    core.representation_cache.representation_cache.invalidate(promo_ids)
+
+
+@django.dispatch.receiver(
+    django.db.models.signals.post_save,
+    sender=user.models.PromoActivationHistory,
+)
+def invalidate_on_activation(sender, instance, created, **kwargs):
+    if created:
+        core.representation_cache.representation_cache.invalidate(
+            [instance.promo_id],
+        )
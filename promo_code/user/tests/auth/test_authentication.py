@@ -1,11 +1,18 @@
+import unittest.mock
 import uuid
 
+import django.conf
 import django.test
+import redis
+import redis.exceptions
 import rest_framework.status
 import rest_framework_simplejwt.exceptions
 import rest_framework_simplejwt.tokens
 
 import business.models
+import core.hashers
+import core.principal
+import core.utils.auth
 import user.authentication
 import user.models
 import user.tests.auth.base
@@ -35,6 +42,70 @@ class UserAuthenticationTests(user.tests.auth.base.BaseUserAuthTestCase):
             rest_framework.status.HTTP_200_OK,
         )
 
+    def test_signin_updates_last_login_when_enabled(self):
+        user_ = user.models.User.objects.create_user(
+            email='last.login@example.com',
+            name='Steve',
+            surname='Jobs',
+            password='SuperStrongPassword2000!',
+            other={'age': 23, 'country': 'gb'},
+        )
+        data = {
+            'email': 'last.login@example.com',
+            'password': 'SuperStrongPassword2000!',
+        }
+
+        self.client.post(self.user_signin_url, data, format='json')
+        user_.refresh_from_db()
+        self.assertIsNone(user_.last_login)
+
+        with django.test.override_settings(
+            SIMPLE_JWT={
+                **django.conf.settings.SIMPLE_JWT,
+                'UPDATE_LAST_LOGIN': True,
+            },
+        ):
+            response = self.client.post(
+                self.user_signin_url,
+                data,
+                format='json',
+            )
+
+        self.assertEqual(
+            response.status_code,
+            rest_framework.status.HTTP_200_OK,
+        )
+        user_.refresh_from_db()
+        self.assertIsNotNone(user_.last_login)
+
+    def test_signin_when_password_hashing_is_busy(self):
+        user.models.User.objects.create_user(
+            email='busy@example.com',
+            name='Steve',
+            surname='Jobs',
+            password='SuperStrongPassword2000!',
+            other={'age': 23, 'country': 'gb'},
+        )
+
+        with unittest.mock.patch.object(
+            core.hashers.hashing_pool,
+            'run',
+            side_effect=core.hashers.PasswordHashingBusy,
+        ):
+            response = self.client.post(
+                self.user_signin_url,
+                {
+                    'email': 'busy@example.com',
+                    'password': 'SuperStrongPassword2000!',
+                },
+                format='json',
+            )
+
+        self.assertEqual(
+            response.status_code,
+            rest_framework.status.HTTP_503_SERVICE_UNAVAILABLE,
+        )
+
 
 class CustomJWTAuthenticationTest(django.test.TestCase):
     def setUp(self):
@@ -121,3 +192,92 @@ class CustomJWTAuthenticationTest(django.test.TestCase):
         request.META['HTTP_AUTHORIZATION'] = 'Token abcdefg'
         result = self.authenticator.authenticate(request)
         self.assertIsNone(result)
+
+    def test_authenticate_returns_cached_principal(self):
+        payload = {
+            'user_type': 'company',
+            'company_id': str(self.company.id),
+            'token_version': self.company.token_version,
+        }
+        token = self._get_token_with_payload(payload)
+        request = self.factory.get('/api/test/')
+        request.META['HTTP_AUTHORIZATION'] = f'Bearer {token}'
+
+        with self.assertNumQueries(1):
+            principal, _ = self.authenticator.authenticate(request)
+        with self.assertNumQueries(0):
+            cached, _ = self.authenticator.authenticate(request)
+
+        self.assertIsInstance(cached, core.principal.Principal)
+        self.assertEqual(cached, principal)
+        self.assertTrue(cached.is_company)
+        self.assertEqual(cached.token_version, 1)
+
+    def test_revoked_token_is_rejected_without_queries(self):
+        payload = {
+            'user_type': 'company',
+            'company_id': str(self.company.id),
+            'token_version': self.company.token_version,
+        }
+        token = self._get_token_with_payload(payload)
+        request = self.factory.get('/api/test/')
+        request.META['HTTP_AUTHORIZATION'] = f'Bearer {token}'
+        self.authenticator.authenticate(request)
+
+        core.utils.auth.bump_token_version(self.company)
+
+        with (
+            self.assertNumQueries(0),
+            self.assertRaisesMessage(
+                rest_framework_simplejwt.exceptions.AuthenticationFailed,
+                'Token invalid',
+            ),
+        ):
+            self.authenticator.authenticate(request)
+
+    def test_token_newer_than_registry_is_checked_in_database(self):
+        core.principal.token_versions.set('user', self.user.id, 1)
+        user.models.User.objects.filter(id=self.user.id).update(
+            token_version=2,
+        )
+        token = self._get_token_with_payload(
+            {
+                'user_type': 'user',
+                'user_id': str(self.user.id),
+                'token_version': 2,
+            },
+        )
+        request = self.factory.get('/api/test/')
+        request.META['HTTP_AUTHORIZATION'] = f'Bearer {token}'
+
+        principal, _ = self.authenticator.authenticate(request)
+
+        self.assertEqual(principal.token_version, 2)
+        self.assertEqual(
+            core.principal.token_versions.get('user', self.user.id),
+            2,
+        )
+
+    def test_revoked_token_is_rejected_when_registry_write_fails(self):
+        payload = {
+            'user_type': 'company',
+            'company_id': str(self.company.id),
+            'token_version': self.company.token_version,
+        }
+        token = self._get_token_with_payload(payload)
+        request = self.factory.get('/api/test/')
+        request.META['HTTP_AUTHORIZATION'] = f'Bearer {token}'
+        self.authenticator.authenticate(request)
+
+        with unittest.mock.patch.object(
+            redis.Redis,
+            'eval',
+            side_effect=redis.exceptions.ConnectionError(),
+        ):
+            core.utils.auth.bump_token_version(self.company)
+
+        with self.assertRaisesMessage(
+            rest_framework_simplejwt.exceptions.AuthenticationFailed,
+            'Token invalid',
+        ):
+            self.authenticator.authenticate(request)
@@ -1,3 +1,10 @@
+import datetime
+import io
+
+import django.core.management
+import django.db
+import django.test.utils
+import django.utils.timezone
 import rest_framework.status
 import rest_framework_simplejwt.token_blacklist.models as tb_models
 
@@ -152,3 +159,63 @@ class JWTTests(user.tests.auth.base.BaseUserAuthTestCase):
             (tb_models.OutstandingToken.objects.count()),
             2,
         )
+
+    def _outstanding(self, jti, expires_in):
+        return tb_models.OutstandingToken.objects.create(
+            user=user.models.User.objects.get(email=self.user_data['email']),
+            jti=jti,
+            token='token',
+            created_at=django.utils.timezone.now(),
+            expires_at=django.utils.timezone.now()
+            + datetime.timedelta(seconds=expires_in),
+        )
+
+    def test_signin_blacklists_tokens_in_one_query(self):
+        for i in range(50):
+            self._outstanding(f'old-{i}', 3600)
+        expired = self._outstanding('expired', -3600)
+
+        with django.test.utils.CaptureQueriesContext(
+            django.db.connection,
+        ) as queries:
+            self.client.post(
+                self.user_signin_url,
+                self.user_data,
+                format='json',
+            )
+
+        self.assertEqual(tb_models.BlacklistedToken.objects.count(), 50)
+        self.assertFalse(
+            tb_models.BlacklistedToken.objects.filter(token=expired).exists(),
+        )
+        blacklist_queries = [
+            query
+            for query in queries.captured_queries
+            if 'token_blacklist_blacklistedtoken' in query['sql']
+        ]
+        self.assertEqual(len(blacklist_queries), 1)
+
+    def test_prune_expired_tokens(self):
+        valid = self._outstanding('valid', 3600)
+        for i in range(5):
+            token = self._outstanding(f'expired-{i}', -3600)
+            tb_models.BlacklistedToken.objects.create(token=token)
+        tb_models.BlacklistedToken.objects.create(token=valid)
+
+        out = io.StringIO()
+        django.core.management.call_command(
+            'prune_tokens',
+            '--batch-size',
+            '2',
+            stdout=out,
+        )
+
+        self.assertEqual(out.getvalue().strip(), 'tokens=5')
+        self.assertEqual(
+            list(tb_models.OutstandingToken.objects.all()),
+            [valid],
+        )
+        self.assertEqual(
+            tb_models.BlacklistedToken.objects.get().token_id,
+            valid.id,
+        )
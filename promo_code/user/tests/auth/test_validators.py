@@ -239,3 +239,52 @@ class PasswordValidatorTests(django.test.TestCase):
                 ' digits, and symbols.'
             ),
         )
+
+    def test_policy_validator_validate_success(self):
+        validator = user.validators.PasswordPolicyValidator(
+            special_chars='[@$!%*?&]',
+        )
+        validator.validate('SuperStrongPassword2000!')
+
+    def test_policy_validator_reports_all_violations(self):
+        validator = user.validators.PasswordPolicyValidator(
+            min_uppercase=2,
+            special_chars='[@$!%*?&]',
+        )
+        with self.assertRaises(
+            django.core.exceptions.ValidationError,
+        ) as context:
+            validator.validate('pässword#')
+
+        self.assertEqual(
+            [error.code for error in context.exception.error_list],
+            [
+                'password_not_ascii',
+                'password_no_special_char',
+                'password_no_number',
+                'password_no_uppercase',
+            ],
+        )
+        self.assertIn(
+            'Password must contain at least 2 uppercase letters.',
+            context.exception.messages,
+        )
+
+    def test_policy_validator_common_password(self):
+        validator = user.validators.PasswordPolicyValidator(min_special=0)
+        with self.assertRaises(
+            django.core.exceptions.ValidationError,
+        ) as context:
+            validator.validate(' Password1 ')
+
+        self.assertEqual(
+            [error.code for error in context.exception.error_list],
+            ['password_too_common'],
+        )
+
+    def test_policy_validators_share_common_passwords(self):
+        first = user.validators.PasswordPolicyValidator()
+        second = user.validators.PasswordPolicyValidator()
+        self.assertIsInstance(first.passwords, frozenset)
+        self.assertIs(first.passwords, second.passwords)
+        self.assertIn('password', first.passwords)
@@ -4,8 +4,10 @@ import django_redis
 import rest_framework.test
 import rest_framework_simplejwt.token_blacklist.models as tb_models
 
+import business.constants
 import business.models
 import user.models
+import user.verdict_cache
 
 
 class BaseUserTestCase(rest_framework.test.APITestCase):
@@ -85,8 +87,62 @@ class BaseUserTestCase(rest_framework.test.APITestCase):
         tb_models.BlacklistedToken.objects.all().delete()
         tb_models.OutstandingToken.objects.all().delete()
         django_redis.get_redis_connection('default').flushall()
+        user.verdict_cache.verdict_cache.local.clear()
         super().tearDown()
 
+    def sign_in_new_user(self, email, password='SuperStrongPassword2000!'):
+        """
+        Creates a 30-year-old user from the US, signs them in and sends
+        their access token with every following request of the client.
+        """
+        user_ = user.models.User.objects.create_user(
+            email=email,
+            name='Test',
+            surname='User',
+            password=password,
+            other={'age': 30, 'country': 'us'},
+        )
+        response = self.client.post(
+            self.user_signin_url,
+            {'email': email, 'password': password},
+            format='json',
+        )
+        self.client.credentials(
+            HTTP_AUTHORIZATION='Bearer ' + response.data['access'],
+        )
+        return user_
+
+    @classmethod
+    def create_untargeted_promos(cls, company, count):
+        """Creates untargeted promos alternating between both modes."""
+        promos = []
+        for i in range(count):
+            if i % 2:
+                promos.append(
+                    business.models.Promo.objects.create_promo(
+                        user=company,
+                        target_data={},
+                        promo_common=f'common-{i}',
+                        promo_unique=None,
+                        description=f'Common promo {i}',
+                        mode=business.constants.PROMO_MODE_COMMON,
+                        max_count=10,
+                    ),
+                )
+            else:
+                promos.append(
+                    business.models.Promo.objects.create_promo(
+                        user=company,
+                        target_data={},
+                        promo_common=None,
+                        promo_unique=[f'unique-{i}-a', f'unique-{i}-b'],
+                        description=f'Unique promo {i}',
+                        mode=business.constants.PROMO_MODE_UNIQUE,
+                        max_count=1,
+                    ),
+                )
+        return promos
+
     @classmethod
     def get_business_promo_detail_url(cls, promo_id):
         return django.urls.reverse(
@@ -108,6 +164,13 @@ class BaseUserTestCase(rest_framework.test.APITestCase):
             kwargs={'id': promo_id},
         )
 
+    @classmethod
+    def get_user_promo_activate_async_url(cls, promo_id):
+        return django.urls.reverse(
+            'api-user:user-promo-activate-async',
+            kwargs={'id': promo_id},
+        )
+
     @classmethod
     def get_user_promo_like_url(cls, promo_id):
         return django.urls.reverse(
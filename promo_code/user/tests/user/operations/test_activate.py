@@ -1,8 +1,10 @@
 import datetime
 
+import django.db.models
 import requests
 import rest_framework.status
 
+import business.models
 import user.tests.user.base
 
 
@@ -299,6 +301,46 @@ class PromoActivationTests(user.tests.user.base.BaseUserTestCase):
             rest_framework.status.HTTP_403_FORBIDDEN,
         )
 
+    def test_exhausted_common_promo_left_available_is_corrected(self):
+        # Concurrent activations may take the last units without clearing
+        # the flag; the next, failing activation has to clear it.
+        business.models.PromoUsageShard.objects.filter(
+            promo_id=self.promo1_id,
+        ).update(used=django.db.models.F('capacity'))
+        self.client.credentials(
+            HTTP_AUTHORIZATION='Bearer ' + self.user1_token,
+        )
+        response = self.client.post(
+            self.get_user_promo_activate_url(self.promo1_id),
+            format='json',
+        )
+        self.assertEqual(
+            response.status_code,
+            rest_framework.status.HTTP_403_FORBIDDEN,
+        )
+        self.assertFalse(
+            business.models.Promo.objects.get(id=self.promo1_id).is_available,
+        )
+
+    def test_exhausted_unique_promo_left_available_is_corrected(self):
+        business.models.PromoCode.objects.filter(
+            promo_id=self.promo3_id,
+        ).update(is_used=True)
+        self.client.credentials(
+            HTTP_AUTHORIZATION='Bearer ' + self.user1_token,
+        )
+        response = self.client.post(
+            self.get_user_promo_activate_url(self.promo3_id),
+            format='json',
+        )
+        self.assertEqual(
+            response.status_code,
+            rest_framework.status.HTTP_403_FORBIDDEN,
+        )
+        self.assertFalse(
+            business.models.Promo.objects.get(id=self.promo3_id).is_available,
+        )
+
     def test_patch_max_count_less_than_used_count_denied(self):
         self.client.credentials(
             HTTP_AUTHORIZATION='Bearer ' + self.user1_token,
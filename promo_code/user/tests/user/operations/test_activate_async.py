@@ -0,0 +1,168 @@
+import unittest.mock
+import uuid
+
+import rest_framework.exceptions
+import rest_framework.status
+
+import user.tests.user.base
+
+
+@unittest.mock.patch(
+    'user.antifraud_service.antifraud_service.aget_verdict',
+    new_callable=unittest.mock.AsyncMock,
+    return_value={'ok': True},
+)
+class PromoActivationAsyncTests(user.tests.user.base.BaseUserTestCase):
+    def setUp(self):
+        super().setUp()
+
+        user_data = {
+            'name': 'Ada',
+            'surname': 'Lovelace',
+            'email': 'ada@lovelace.com',
+            'password': 'AnalyticalEngine1843!',
+            'other': {'age': 36, 'country': 'gb'},
+        }
+        response = self.client.post(
+            self.user_signup_url,
+            user_data,
+            format='json',
+        )
+        self.assertEqual(
+            response.status_code,
+            rest_framework.status.HTTP_200_OK,
+        )
+        self.user_token = response.data['access']
+
+        self.client.credentials(
+            HTTP_AUTHORIZATION='Bearer ' + self.company1_token,
+        )
+        response = self.client.post(
+            self.promo_list_create_url,
+            {
+                'description': 'Active COMMON promo for all',
+                'target': {},
+                'max_count': 1,
+                'active_from': '2025-01-10',
+                'mode': 'COMMON',
+                'promo_common': 'sale-10',
+            },
+            format='json',
+        )
+        self.assertEqual(
+            response.status_code,
+            rest_framework.status.HTTP_201_CREATED,
+        )
+        self.promo_id = response.data['id']
+        self.auth_headers = {'Authorization': 'Bearer ' + self.user_token}
+
+    async def test_activation_returns_promo_code(self, mock_verdict):
+        response = await self.async_client.post(
+            self.get_user_promo_activate_async_url(self.promo_id),
+            headers=self.auth_headers,
+        )
+
+        self.assertEqual(
+            response.status_code,
+            rest_framework.status.HTTP_200_OK,
+        )
+        self.assertEqual(response.json(), {'promo': 'sale-10'})
+        mock_verdict.assert_awaited_once_with(
+            'ada@lovelace.com',
+            self.promo_id,
+        )
+
+    async def test_activation_denied_when_max_count_reached(
+        self,
+        mock_verdict,
+    ):
+        url = self.get_user_promo_activate_async_url(self.promo_id)
+        await self.async_client.post(url, headers=self.auth_headers)
+
+        response = await self.async_client.post(url, headers=self.auth_headers)
+
+        self.assertEqual(
+            response.status_code,
+            rest_framework.status.HTTP_403_FORBIDDEN,
+        )
+
+    async def test_activation_blocked_by_antifraud(self, mock_verdict):
+        mock_verdict.return_value = {'ok': False}
+
+        response = await self.async_client.post(
+            self.get_user_promo_activate_async_url(self.promo_id),
+            headers=self.auth_headers,
+        )
+
+        self.assertEqual(
+            response.status_code,
+            rest_framework.status.HTTP_403_FORBIDDEN,
+        )
+        self.assertIn('error', response.json())
+
+    async def test_activation_requires_authentication(self, mock_verdict):
+        response = await self.async_client.post(
+            self.get_user_promo_activate_async_url(self.promo_id),
+        )
+
+        self.assertEqual(
+            response.status_code,
+            rest_framework.status.HTTP_401_UNAUTHORIZED,
+        )
+        mock_verdict.assert_not_awaited()
+
+    async def test_activation_of_missing_promo(self, mock_verdict):
+        response = await self.async_client.post(
+            self.get_user_promo_activate_async_url(uuid.uuid4()),
+            headers=self.auth_headers,
+        )
+
+        self.assertEqual(
+            response.status_code,
+            rest_framework.status.HTTP_404_NOT_FOUND,
+        )
+
+    async def test_activation_with_invalid_token(self, mock_verdict):
+        response = await self.async_client.post(
+            self.get_user_promo_activate_async_url(self.promo_id),
+            headers={'Authorization': 'Bearer invalid'},
+        )
+
+        self.assertEqual(
+            response.status_code,
+            rest_framework.status.HTTP_401_UNAUTHORIZED,
+        )
+        self.assertIn('detail', response.json())
+        self.assertIn('WWW-Authenticate', response.headers)
+        mock_verdict.assert_not_awaited()
+
+    async def test_activation_ignores_invalid_body(self, mock_verdict):
+        response = await self.async_client.post(
+            self.get_user_promo_activate_async_url(self.promo_id),
+            '{"promo": ',
+            content_type='application/json',
+            headers=self.auth_headers,
+        )
+
+        self.assertEqual(
+            response.status_code,
+            rest_framework.status.HTTP_200_OK,
+        )
+
+    async def test_api_errors_are_rendered_as_json(self, mock_verdict):
+        with unittest.mock.patch(
+            'user.serializers.PromoActivationSerializer.is_valid',
+            side_effect=rest_framework.exceptions.ValidationError(
+                {'promo': ['Invalid code.']},
+            ),
+        ):
+            response = await self.async_client.post(
+                self.get_user_promo_activate_async_url(self.promo_id),
+                headers=self.auth_headers,
+            )
+
+        self.assertEqual(
+            response.status_code,
+            rest_framework.status.HTTP_400_BAD_REQUEST,
+        )
+        self.assertEqual(response.json(), {'promo': ['Invalid code.']})
@@ -1,7 +1,10 @@
+import django.db
+import django.test.utils
 import django.urls
 import parameterized
 import rest_framework.status
 
+import business.models
 import user.tests.user.base
 
 
@@ -495,3 +498,64 @@ class PromoCommentsTestCase(user.tests.user.base.BaseUserTestCase):
         expected_remaining = [comment5_id, comment2_id]
         self.assertEqual(returned_ids, expected_remaining)
         self.assertEqual(int(resp.headers.get('X-Total-Count')), 2)
+
+    def test_list_comments_takes_no_promo_lock(self):
+        self._create_promo1_comments()
+        self.client.credentials(
+            HTTP_AUTHORIZATION='Bearer ' + self.user1_token,
+        )
+        url_list = self.get_comment_list_url(self.promo1_id)
+        self.client.get(url_list, format='json')
+
+        with django.test.utils.CaptureQueriesContext(
+            django.db.connection,
+        ) as queries:
+            resp = self.client.get(url_list, format='json')
+
+        self.assertEqual(resp.status_code, rest_framework.status.HTTP_200_OK)
+        for query in queries.captured_queries:
+            self.assertNotIn('FOR UPDATE', query['sql'])
+            self.assertNotIn('FROM "business_promo"', query['sql'])
+
+    def test_list_comments_of_deleted_promo(self):
+        self.client.credentials(
+            HTTP_AUTHORIZATION='Bearer ' + self.user1_token,
+        )
+        url_list = self.get_comment_list_url(self.promo1_id)
+        self.client.get(url_list, format='json')
+
+        business.models.Promo.objects.filter(id=self.promo1_id).delete()
+
+        resp = self.client.get(url_list, format='json')
+        self.assertEqual(
+            resp.status_code,
+            rest_framework.status.HTTP_404_NOT_FOUND,
+        )
+
+    def test_list_comments_by_cursor(self):
+        self._create_promo1_comments()
+        self.client.credentials(
+            HTTP_AUTHORIZATION='Bearer ' + self.user1_token,
+        )
+        url_list = self.get_comment_list_url(self.promo1_id)
+        resp = self.client.get(url_list, {'limit': 100}, format='json')
+        expected_ids = [comment['id'] for comment in resp.data]
+
+        ids = []
+        cursor = ''
+        while cursor is not None:
+            resp = self.client.get(
+                url_list,
+                {'limit': 2, 'cursor': cursor},
+                format='json',
+            )
+            self.assertEqual(
+                resp.status_code,
+                rest_framework.status.HTTP_200_OK,
+            )
+            self.assertNotIn('X-Total-Count', resp)
+            ids.extend(comment['id'] for comment in resp.data)
+            cursor = resp.headers.get('X-Next-Cursor')
+
+        self.assertEqual(ids, expected_ids)
+        self.assertEqual(len(ids), 3)
@@ -1,7 +1,11 @@
 import datetime
 
+import django.db
+import django.test.utils
 import rest_framework.status
 
+import business.models
+import user.models
 import user.tests.user.base
 
 
@@ -676,3 +680,186 @@ class TestUserPromoFeed(user.tests.user.base.BaseUserTestCase):
         self.assertFalse(data[0]['active'])
         self.assertEqual(data[1]['promo_id'], self.promo8_id)
         self.assertEqual(data[2]['promo_id'], self.promo1_id)
+
+
+class TestUserPromoFeedQueryCount(user.tests.user.base.BaseUserTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = self.sign_in_new_user('feed-queries@example.com')
+        promos = self.create_untargeted_promos(self.company1, count=20)
+        for promo in promos[::2]:
+            user.models.PromoLike.objects.create(user=self.user, promo=promo)
+            user.models.PromoActivationHistory.objects.create(
+                user=self.user,
+                promo=promo,
+            )
+
+    def test_feed_query_count_does_not_depend_on_page_size(self):
+        with self.assertNumQueries(4):
+            response = self.client.get(
+                self.user_feed_url,
+                {'limit': 100},
+                format='json',
+            )
+
+        self.assertEqual(
+            response.status_code,
+            rest_framework.status.HTTP_200_OK,
+        )
+        self.assertEqual(len(response.data), 20)
+        self.assertEqual(
+            sum(item['is_liked_by_user'] for item in response.data),
+            10,
+        )
+        self.assertEqual(
+            sum(item['is_activated_by_user'] for item in response.data),
+            10,
+        )
+
+
+class TestUserPromoFeedCache(user.tests.user.base.BaseUserTestCase):
+    def setUp(self):
+        super().setUp()
+        self.sign_in_new_user('feed-cache@example.com')
+        self.promos = self.create_untargeted_promos(self.company1, count=4)
+
+    def get_feed(self, **params):
+        response = self.client.get(self.user_feed_url, params, format='json')
+        self.assertEqual(
+            response.status_code,
+            rest_framework.status.HTTP_200_OK,
+        )
+        return response
+
+    def test_cached_feed_skips_promo_queries(self):
+        first = self.get_feed()
+
+        with django.test.utils.CaptureQueriesContext(
+            django.db.connection,
+        ) as queries:
+            second = self.get_feed()
+
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(second.headers['X-Total-Count'], '4')
+        self.assertFalse(
+            any(
+                'FROM "business_promo"' in query['sql']
+                for query in queries.captured_queries
+            ),
+        )
+
+    def test_user_flags_are_not_shared_between_users(self):
+        self.get_feed()
+        user.models.PromoLike.objects.create(
+            user=user.models.User.objects.get(email='feed-cache@example.com'),
+            promo=self.promos[0],
+        )
+
+        liked = [
+            item['promo_id']
+            for item in self.get_feed().data
+            if item['is_liked_by_user']
+        ]
+
+        self.assertEqual(liked, [str(self.promos[0].id)])
+
+    def test_new_promo_invalidates_segments(self):
+        self.get_feed()
+        self.create_untargeted_promos(self.company1, count=1)
+
+        response = self.get_feed()
+
+        self.assertEqual(response.headers['X-Total-Count'], '5')
+
+    def test_like_refreshes_promo_payload(self):
+        self.get_feed()
+        promo = self.promos[0]
+
+        self.client.post(self.get_user_promo_like_url(promo.id))
+
+        item = next(
+            item
+            for item in self.get_feed().data
+            if item['promo_id'] == str(promo.id)
+        )
+        self.assertEqual(item['like_count'], 1)
+        self.assertTrue(item['is_liked_by_user'])
+
+    def test_exhausted_promo_leaves_active_segment(self):
+        self.get_feed(active='true')
+        business.models.Promo.objects.mark_unavailable(self.promos[0].id)
+
+        ids = [item['promo_id'] for item in self.get_feed(active='true').data]
+
+        self.assertNotIn(str(self.promos[0].id), ids)
+        self.assertEqual(len(ids), 3)
+
+
+class TestUserPromoFeedCursorPagination(user.tests.user.base.BaseUserTestCase):
+    def setUp(self):
+        super().setUp()
+        self.sign_in_new_user('feed-cursor@example.com')
+        self.create_untargeted_promos(self.company1, count=7)
+
+    def test_cursor_pages_match_offset_order(self):
+        response = self.client.get(
+            self.user_feed_url,
+            {'limit': 100},
+            format='json',
+        )
+        expected_ids = [item['promo_id'] for item in response.data]
+
+        ids = []
+        cursor = ''
+        while cursor is not None:
+            response = self.client.get(
+                self.user_feed_url,
+                {'limit': 3, 'cursor': cursor},
+                format='json',
+            )
+            self.assertEqual(
+                response.status_code,
+                rest_framework.status.HTTP_200_OK,
+            )
+            self.assertNotIn('X-Total-Count', response)
+            ids.extend(item['promo_id'] for item in response.data)
+            cursor = response.headers.get('X-Next-Cursor')
+
+        self.assertEqual(ids, expected_ids)
+        self.assertEqual(len(ids), 7)
+
+    def test_cursor_mode_skips_count_query(self):
+        self.client.get(self.user_feed_url, format='json')
+
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                self.user_feed_url,
+                {'limit': 3, 'cursor': ''},
+                format='json',
+            )
+
+        self.assertEqual(len(response.data), 3)
+
+    def test_invalid_cursor(self):
+        response = self.client.get(
+            self.user_feed_url,
+            {'cursor': 'not-a-cursor'},
+            format='json',
+        )
+
+        self.assertEqual(
+            response.status_code,
+            rest_framework.status.HTTP_400_BAD_REQUEST,
+        )
+
+    def test_cursor_cannot_be_combined_with_offset(self):
+        response = self.client.get(
+            self.user_feed_url,
+            {'cursor': '', 'offset': 2},
+            format='json',
+        )
+
+        self.assertEqual(
+            response.status_code,
+            rest_framework.status.HTTP_400_BAD_REQUEST,
+        )
@@ -146,6 +146,38 @@ class PromoHistoryTests(user.tests.user.base.BaseUserTestCase):
             )
             self.assertTrue(item['is_activated_by_user'])
 
+    def test_history_query_count_does_not_depend_on_page_size(self):
+        promos = self.create_untargeted_promos(self.company1, count=20)
+        for promo in promos:
+            user.models.PromoActivationHistory.objects.create(
+                user=self.user1,
+                promo=promo,
+            )
+        user.models.PromoLike.objects.create(user=self.user1, promo=promos[0])
+
+        self.client.credentials(
+            HTTP_AUTHORIZATION='Bearer ' + self.user1_token,
+        )
+        with self.assertNumQueries(2):
+            response = self.client.get(
+                self.user_promo_history_url,
+                {'limit': 100},
+                format='json',
+            )
+
+        self.assertEqual(
+            response.status_code,
+            rest_framework.status.HTTP_200_OK,
+        )
+        self.assertEqual(len(response.data), 22)
+        self.assertTrue(
+            all(item['is_activated_by_user'] for item in response.data),
+        )
+        self.assertEqual(
+            sum(item['is_liked_by_user'] for item in response.data),
+            1,
+        )
+
     def test_get_promo_history_with_pagination_offset_limit(self):
         user.models.PromoActivationHistory.objects.filter(
             user=self.user1,
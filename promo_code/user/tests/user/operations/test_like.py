@@ -1,5 +1,10 @@
+import django.test
+import django_redis
 import rest_framework.status
 
+import business.models
+import user.like_buffer
+import user.models
 import user.tests.user.base
 
 
@@ -216,3 +221,85 @@ class TestUserPromoLikeActions(user.tests.user.base.BaseUserTestCase):
 
         business = self._get_business_promo()
         self.assertEqual(business.data['like_count'], 2)
+
+
+@django.test.override_settings(LIKE_WRITE_BEHIND=True)
+class TestUserPromoBufferedLikeActions(TestUserPromoLikeActions):
+    """Runs the scenarios above with likes buffered in Redis."""
+
+    def _stored_likes(self):
+        return user.models.PromoLike.objects.filter(promo_id=self.promo1_id)
+
+    def _stored_like_count(self):
+        return business.models.Promo.objects.get(
+            id=self.promo1_id,
+        ).like_count
+
+    def test_like_is_written_on_flush(self):
+        self._like(self.user1_token)
+        self._like(self.user2_token)
+
+        self.assertFalse(self._stored_likes().exists())
+        self.assertEqual(self._get_business_promo().data['like_count'], 2)
+
+        stats = user.like_buffer.flush()
+
+        self.assertEqual(stats['likes'], 2)
+        self.assertEqual(self._stored_likes().count(), 2)
+        self.assertEqual(self._stored_like_count(), 2)
+        self.assertEqual(self._get_business_promo().data['like_count'], 2)
+        self.assertTrue(
+            self._get_user_promo(self.user1_token).data['is_liked_by_user'],
+        )
+
+    def test_unlike_of_stored_like_is_written_on_flush(self):
+        self._like(self.user1_token)
+        user.like_buffer.flush()
+
+        self._unlike(self.user1_token)
+
+        self.assertEqual(self._get_business_promo().data['like_count'], 0)
+        self.assertFalse(
+            self._get_user_promo(self.user1_token).data['is_liked_by_user'],
+        )
+
+        user.like_buffer.flush()
+
+        self.assertFalse(self._stored_likes().exists())
+        self.assertEqual(self._stored_like_count(), 0)
+
+    def test_like_and_unlike_before_flush_cancel_out(self):
+        self._like(self.user1_token)
+        self._unlike(self.user1_token)
+
+        user.like_buffer.flush()
+
+        self.assertFalse(self._stored_likes().exists())
+        self.assertEqual(self._stored_like_count(), 0)
+
+    def test_interrupted_flush_is_not_counted_twice(self):
+        self._like(self.user1_token)
+        redis = django_redis.get_redis_connection('default')
+        pending = redis.hgetall(user.like_buffer.PENDING_KEY)
+
+        user.like_buffer.flush()
+        # A flush that died before clearing its snapshot runs again.
+        redis.hset(user.like_buffer.FLUSHING_PENDING_KEY, mapping=pending)
+        user.like_buffer.flush()
+
+        self.assertEqual(self._stored_likes().count(), 1)
+        self.assertEqual(self._stored_like_count(), 1)
+
+    def test_committed_flush_is_not_counted_twice_by_reads(self):
+        self._like(self.user1_token)
+        redis = django_redis.get_redis_connection('default')
+        pending = redis.hgetall(user.like_buffer.PENDING_KEY)
+
+        user.like_buffer.flush()
+        # A flush that committed but has not cleared its snapshot yet.
+        redis.hset(user.like_buffer.FLUSHING_PENDING_KEY, mapping=pending)
+
+        self.assertEqual(self._get_business_promo().data['like_count'], 1)
+        self.assertTrue(
+            self._get_user_promo(self.user1_token).data['is_liked_by_user'],
+        )
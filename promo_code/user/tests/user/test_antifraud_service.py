@@ -1,36 +1,61 @@
+import asyncio
 import datetime
+import time
 import unittest.mock
 
 import django.test
+import django_redis
+import httpx
 import requests.exceptions
 
+import core.circuit_breaker
 import user.antifraud_service
+import user.verdict_cache
 
 
 class AntiFraudServiceTests(django.test.SimpleTestCase):
     def setUp(self):
-        self.service = user.antifraud_service.AntiFraudService()
+        self.verdict_cache = unittest.mock.MagicMock(
+            spec=user.verdict_cache.VerdictCache,
+        )
+        self.verdict_cache.get.return_value = None
+        self.verdict_cache.aget.return_value = None
+        self.circuit_breaker = core.circuit_breaker.CircuitBreaker(
+            'antifraud-test',
+            failure_threshold=3,
+            reset_timeout=60,
+            window=60,
+            probe_timeout=5,
+        )
+        self.service = user.antifraud_service.AntiFraudService(
+            backoff_base=0.01,
+            verdict_cache=self.verdict_cache,
+            circuit_breaker=self.circuit_breaker,
+        )
         self.user_email = 'test@example.com'
         self.promo_id = '1bfd61b1-52ff-4c0f-ba8b-434ad3d0f812'
 
-    @unittest.mock.patch('user.antifraud_service.requests.post')
-    @unittest.mock.patch('user.antifraud_service.django.core.cache.cache')
-    def test_get_verdict_from_cache(self, mock_cache, mock_post):
-        mock_cache.get.return_value = {'ok': True, 'reason': 'From Cache'}
+    def tearDown(self):
+        django_redis.get_redis_connection('default').flushall()
+
+    @unittest.mock.patch('user.antifraud_service.requests.Session.post')
+    def test_get_verdict_from_cache(self, mock_post):
+        self.verdict_cache.get.return_value = {
+            'ok': True,
+            'reason': 'From Cache',
+        }
 
         result = self.service.get_verdict(self.user_email, self.promo_id)
 
-        mock_cache.get.assert_called_once_with(
-            f'antifraud_verdict_{self.user_email}',
+        self.verdict_cache.get.assert_called_once_with(
+            self.user_email,
+            self.promo_id,
         )
         mock_post.assert_not_called()
         self.assertEqual(result, {'ok': True, 'reason': 'From Cache'})
 
-    @unittest.mock.patch('user.antifraud_service.requests.post')
-    @unittest.mock.patch('user.antifraud_service.django.core.cache.cache')
-    def test_fetch_from_service_and_set_cache(self, mock_cache, mock_post):
-        mock_cache.get.return_value = None
-
+    @unittest.mock.patch('user.antifraud_service.requests.Session.post')
+    def test_fetch_from_service_and_set_cache(self, mock_post):
         now = datetime.datetime.now(datetime.timezone.utc)
         api_data = {
             'ok': True,
@@ -44,26 +69,21 @@ class AntiFraudServiceTests(django.test.SimpleTestCase):
 
         result = self.service.get_verdict(self.user_email, self.promo_id)
 
-        mock_cache.get.assert_called_once_with(
-            f'antifraud_verdict_{self.user_email}',
+        self.verdict_cache.get.assert_called_once_with(
+            self.user_email,
+            self.promo_id,
         )
         mock_post.assert_called_once()
-        mock_cache.set.assert_called_once()
-        key, val = mock_cache.set.call_args[0][:2]
-        timeout = mock_cache.set.call_args[1]['timeout']
-        self.assertEqual(key, f'antifraud_verdict_{self.user_email}')
+        self.verdict_cache.set.assert_called_once()
+        email, promo_id, val, timeout = self.verdict_cache.set.call_args[0]
+        self.assertEqual(email, self.user_email)
+        self.assertEqual(promo_id, self.promo_id)
         self.assertEqual(val, api_data)
         self.assertAlmostEqual(timeout, 60, delta=1)
         self.assertEqual(result, api_data)
 
-    @unittest.mock.patch('user.antifraud_service.requests.post')
-    @unittest.mock.patch('user.antifraud_service.django.core.cache.cache')
-    def test_cache_is_not_set_if_verdict_is_not_ok(
-        self,
-        mock_cache,
-        mock_post,
-    ):
-        mock_cache.get.return_value = None
+    @unittest.mock.patch('user.antifraud_service.requests.Session.post')
+    def test_cache_is_not_set_if_verdict_is_not_ok(self, mock_post):
         api_data = {'ok': False, 'reason': 'Blocked'}
         mock_response = unittest.mock.MagicMock(
             status_code=200,
@@ -74,17 +94,11 @@ class AntiFraudServiceTests(django.test.SimpleTestCase):
         result = self.service.get_verdict(self.user_email, self.promo_id)
 
         mock_post.assert_called_once()
-        mock_cache.set.assert_not_called()
+        self.verdict_cache.set.assert_not_called()
         self.assertEqual(result, api_data)
 
-    @unittest.mock.patch('user.antifraud_service.requests.post')
-    @unittest.mock.patch('user.antifraud_service.django.core.cache.cache')
-    def test_handles_antifraud_service_unavailable(
-        self,
-        mock_cache,
-        mock_post,
-    ):
-        mock_cache.get.return_value = None
+    @unittest.mock.patch('user.antifraud_service.requests.Session.post')
+    def test_handles_antifraud_service_unavailable(self, mock_post):
         mock_post.side_effect = requests.exceptions.RequestException(
             'Connection timed out',
         )
@@ -97,10 +111,8 @@ class AntiFraudServiceTests(django.test.SimpleTestCase):
             {'ok': False, 'error': 'Anti-fraud service unavailable'},
         )
 
-    @unittest.mock.patch('user.antifraud_service.requests.post')
-    @unittest.mock.patch('user.antifraud_service.django.core.cache.cache')
-    def test_does_not_set_cache_with_invalid_date(self, mock_cache, mock_post):
-        mock_cache.get.return_value = None
+    @unittest.mock.patch('user.antifraud_service.requests.Session.post')
+    def test_does_not_set_cache_with_invalid_date(self, mock_post):
         api_data = {'ok': True, 'cache_until': 'invalid-date-format'}
         mock_response = unittest.mock.MagicMock(
             json=unittest.mock.MagicMock(return_value=api_data),
@@ -109,12 +121,10 @@ class AntiFraudServiceTests(django.test.SimpleTestCase):
 
         self.service.get_verdict(self.user_email, self.promo_id)
 
-        mock_cache.set.assert_not_called()
+        self.verdict_cache.set.assert_not_called()
 
-    @unittest.mock.patch('user.antifraud_service.requests.post')
-    @unittest.mock.patch('user.antifraud_service.django.core.cache.cache')
-    def test_handles_api_http_error(self, mock_cache, mock_post):
-        mock_cache.get.return_value = None
+    @unittest.mock.patch('user.antifraud_service.requests.Session.post')
+    def test_handles_api_http_error(self, mock_post):
         mock_response = unittest.mock.MagicMock(status_code=500)
 
         mock_response.raise_for_status.side_effect = (
@@ -130,6 +140,78 @@ class AntiFraudServiceTests(django.test.SimpleTestCase):
             {'ok': False, 'error': 'Anti-fraud service unavailable'},
         )
 
+    @unittest.mock.patch('user.antifraud_service.requests.Session.post')
+    def test_open_circuit_skips_upstream(self, mock_post):
+        mock_post.side_effect = requests.exceptions.ConnectionError()
+
+        self.service.get_verdict(self.user_email, self.promo_id)
+        self.service.get_verdict(self.user_email, self.promo_id)
+        self.assertEqual(mock_post.call_count, 3)
+
+        result = self.service.get_verdict(self.user_email, self.promo_id)
+
+        self.assertEqual(mock_post.call_count, 3)
+        self.assertEqual(
+            result,
+            {'ok': False, 'error': 'Anti-fraud service unavailable'},
+        )
+
+    @unittest.mock.patch('user.antifraud_service.requests.Session.post')
+    def test_half_open_probe_closes_circuit(self, mock_post):
+        mock_post.side_effect = requests.exceptions.ConnectionError()
+        self.service.get_verdict(self.user_email, self.promo_id)
+        self.service.get_verdict(self.user_email, self.promo_id)
+        django_redis.get_redis_connection('default').delete(
+            self.circuit_breaker.open_key,
+        )
+
+        mock_post.side_effect = None
+        mock_post.return_value = unittest.mock.MagicMock(
+            json=unittest.mock.MagicMock(return_value={'ok': True}),
+        )
+        result = self.service.get_verdict(self.user_email, self.promo_id)
+
+        self.assertEqual(result, {'ok': True})
+        self.assertEqual(
+            self.circuit_breaker.state(),
+            core.circuit_breaker.STATE_CLOSED,
+        )
+
+    @unittest.mock.patch('user.antifraud_service.requests.Session.post')
+    def test_slow_request_is_hedged(self, mock_post):
+        slow = unittest.mock.MagicMock(
+            json=unittest.mock.MagicMock(return_value={'ok': False}),
+        )
+        fast = unittest.mock.MagicMock(
+            json=unittest.mock.MagicMock(return_value={'ok': True}),
+        )
+
+        def post(*args, **kwargs):
+            if mock_post.call_count == 1:
+                time.sleep(0.5)
+                return slow
+            return fast
+
+        mock_post.side_effect = post
+        self.service.hedge = True
+        self.service._hedge_delay = 0.01
+        self.service._hedge_delay_expires_at = float('inf')
+
+        result = self.service.get_verdict(self.user_email, self.promo_id)
+
+        self.assertEqual(result, {'ok': True})
+        self.assertEqual(mock_post.call_count, 2)
+
+    @unittest.mock.patch('user.antifraud_service.core.metrics.quantile')
+    def test_hedge_delay_follows_p95(self, mock_quantile):
+        mock_quantile.return_value = 250
+
+        self.assertEqual(self.service._get_hedge_delay(), 0.25)
+
+        mock_quantile.return_value = None
+        self.service._hedge_delay_expires_at = 0
+        self.assertEqual(self.service._get_hedge_delay(), self.service.timeout)
+
     def test_calculate_cache_timeout_none_when_missing(self):
         self.assertIsNone(
             self.service._calculate_cache_timeout(None),
@@ -137,3 +219,127 @@ class AntiFraudServiceTests(django.test.SimpleTestCase):
         self.assertIsNone(
             self.service._calculate_cache_timeout(''),
         )
+
+    def test_session_is_reused_within_a_process(self):
+        self.assertIs(self.service._get_session(), self.service._get_session())
+
+    @unittest.mock.patch('user.antifraud_service.os.getpid')
+    def test_session_is_recreated_after_fork(self, mock_getpid):
+        mock_getpid.return_value = 1
+        parent_session = self.service._get_session()
+
+        mock_getpid.return_value = 2
+        self.assertIsNot(self.service._get_session(), parent_session)
+
+    def test_session_pool_is_sized_from_settings(self):
+        service = user.antifraud_service.AntiFraudService(pool_size=3)
+        adapter = service._get_session().get_adapter('http://antifraud')
+
+        self.assertEqual(adapter._pool_maxsize, 3)
+
+    def test_backoff_delay_is_capped(self):
+        service = user.antifraud_service.AntiFraudService(
+            backoff_base=0.1,
+            backoff_max=0.3,
+        )
+
+        for attempt in range(1, 10):
+            self.assertLessEqual(service._backoff_delay(attempt), 0.3)
+
+    @unittest.mock.patch('user.antifraud_service.core.metrics')
+    @unittest.mock.patch('user.antifraud_service.requests.Session.post')
+    def test_retries_and_latency_are_recorded(self, mock_post, mock_metrics):
+        mock_post.side_effect = requests.exceptions.ConnectionError()
+
+        self.service.get_verdict(self.user_email, self.promo_id)
+
+        mock_metrics.incr.assert_any_call('antifraud.retries')
+        mock_metrics.incr.assert_any_call('antifraud.unavailable')
+        observed = [c.args[0] for c in mock_metrics.observe.call_args_list]
+        self.assertEqual(
+            observed,
+            ['antifraud.attempt', 'antifraud.attempt', 'antifraud.call'],
+        )
+
+    @unittest.mock.patch(
+        'user.antifraud_service.httpx.AsyncClient.post',
+        new_callable=unittest.mock.AsyncMock,
+    )
+    async def test_aget_verdict_fetches_and_caches(self, mock_post):
+        now = datetime.datetime.now(datetime.timezone.utc)
+        api_data = {
+            'ok': True,
+            'cache_until': (now + datetime.timedelta(seconds=60)).isoformat(),
+        }
+        mock_post.return_value = unittest.mock.MagicMock(
+            json=unittest.mock.MagicMock(return_value=api_data),
+        )
+
+        result = await self.service.aget_verdict(
+            self.user_email,
+            self.promo_id,
+        )
+
+        self.assertEqual(result, api_data)
+        mock_post.assert_awaited_once()
+        self.verdict_cache.aset.assert_awaited_once()
+        self.assertEqual(
+            self.verdict_cache.aset.call_args[0][:2],
+            (self.user_email, self.promo_id),
+        )
+
+    @unittest.mock.patch(
+        'user.antifraud_service.httpx.AsyncClient.post',
+        new_callable=unittest.mock.AsyncMock,
+    )
+    async def test_aget_verdict_handles_service_unavailable(self, mock_post):
+        mock_post.side_effect = httpx.ConnectTimeout('timed out')
+
+        result = await self.service.aget_verdict(
+            self.user_email,
+            self.promo_id,
+        )
+
+        self.assertEqual(mock_post.await_count, 2)
+        self.assertEqual(
+            result,
+            {'ok': False, 'error': 'Anti-fraud service unavailable'},
+        )
+        self.verdict_cache.aset.assert_not_awaited()
+
+    @unittest.mock.patch(
+        'user.antifraud_service.httpx.AsyncClient.post',
+        new_callable=unittest.mock.AsyncMock,
+    )
+    async def test_aget_verdict_slow_request_is_hedged(self, mock_post):
+        async def post(*args, **kwargs):
+            if mock_post.await_count == 1:
+                await asyncio.sleep(0.5)
+                return unittest.mock.MagicMock(
+                    json=unittest.mock.MagicMock(return_value={'ok': False}),
+                )
+            return unittest.mock.MagicMock(
+                json=unittest.mock.MagicMock(return_value={'ok': True}),
+            )
+
+        mock_post.side_effect = post
+        self.service.hedge = True
+        self.service._hedge_delay = 0.01
+        self.service._hedge_delay_expires_at = float('inf')
+
+        result = await self.service.aget_verdict(
+            self.user_email,
+            self.promo_id,
+        )
+
+        self.assertEqual(result, {'ok': True})
+        self.assertEqual(mock_post.await_count, 2)
+
+    async def test_aclose_closes_client_of_running_loop(self):
+        client = self.service._get_async_client()
+
+        await self.service.aclose()
+
+        self.assertTrue(client.is_closed)
+        self.assertIsNot(self.service._get_async_client(), client)
+        await self.service.aclose()
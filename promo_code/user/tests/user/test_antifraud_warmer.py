@@ -0,0 +1,83 @@
+import time
+import unittest.mock
+
+import django.test
+import django_redis
+
+import user.antifraud_warmer
+
+
+@django.test.override_settings(ANTIFRAUD_WARMER_ENABLED=True)
+class AntiFraudWarmerTests(django.test.SimpleTestCase):
+    def setUp(self):
+        self.redis = django_redis.get_redis_connection('default')
+        self.promo_id = '1bfd61b1-52ff-4c0f-ba8b-434ad3d0f812'
+        self.service = unittest.mock.MagicMock()
+        self.service.verdict_cache.get.return_value = None
+
+    def tearDown(self):
+        self.redis.flushall()
+
+    def test_feed_visit_is_recorded(self):
+        user.antifraud_warmer.record_feed_visit(
+            'a@example.com',
+            [self.promo_id],
+        )
+
+        self.assertEqual(
+            user.antifraud_warmer.recently_active_users(60, 10),
+            [('a@example.com', self.promo_id)],
+        )
+
+    @django.test.override_settings(ANTIFRAUD_WARMER_ENABLED=False)
+    def test_feed_visit_is_ignored_when_disabled(self):
+        user.antifraud_warmer.record_feed_visit(
+            'a@example.com',
+            [self.promo_id],
+        )
+
+        self.assertEqual(
+            user.antifraud_warmer.recently_active_users(60, 10),
+            [],
+        )
+
+    def test_users_outside_window_are_pruned(self):
+        self.redis.zadd(
+            user.antifraud_warmer.ACTIVE_USERS_KEY,
+            {'old@example.com': time.time() - 120},
+        )
+        self.redis.hset(
+            user.antifraud_warmer.LAST_PROMO_KEY,
+            'old@example.com',
+            self.promo_id,
+        )
+
+        self.assertEqual(
+            user.antifraud_warmer.recently_active_users(60, 10),
+            [],
+        )
+        self.assertEqual(
+            self.redis.zcard(user.antifraud_warmer.ACTIVE_USERS_KEY),
+            0,
+        )
+
+    def test_warm_fetches_only_uncached_verdicts(self):
+        for email in ('a@example.com', 'b@example.com'):
+            user.antifraud_warmer.record_feed_visit(email, [self.promo_id])
+        self.service.verdict_cache.get.side_effect = lambda email, promo_id: (
+            {'ok': True} if email == 'a@example.com' else None
+        )
+
+        stats = user.antifraud_warmer.warm(
+            window=60,
+            workers=2,
+            rate=100,
+            limit=10,
+            service=self.service,
+        )
+
+        self.assertEqual(stats, {'users': 2, 'cached': 1, 'fetched': 1})
+        self.service.get_verdict.assert_called_once_with(
+            'b@example.com',
+            self.promo_id,
+        )
@@ -0,0 +1,197 @@
+import datetime
+import io
+
+import django.core.management
+import django.db
+import django.test
+import django.utils.timezone
+
+import business.models
+import user.models
+import user.partitions
+
+
+class HistoryPartitionTests(django.test.TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user_ = user.models.User.objects.create(
+            email='user@test.com',
+            name='Test',
+            surname='User',
+        )
+        company = business.models.Company.objects.create(
+            email='company@test.com',
+            name='TestCorp',
+        )
+        cls.promo = business.models.Promo.objects.create(
+            company=company,
+            description='Test Promo',
+            max_count=100,
+            mode='COMMON',
+        )
+
+    def setUp(self):
+        self.current = django.utils.timezone.now().date().replace(day=1)
+
+    def _activate(self, activated_at=None):
+        activation = user.models.PromoActivationHistory.objects.create(
+            user=self.user_,
+            promo=self.promo,
+        )
+        if activated_at is not None:
+            user.models.PromoActivationHistory.objects.filter(
+                pk=activation.pk,
+            ).update(activated_at=activated_at)
+        return activation
+
+    def _partition_of(self, activation):
+        with django.db.connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT tableoid::regclass::text '
+                f'FROM {user.partitions.TABLE} WHERE id = %s',
+                [activation.pk],
+            )
+            return cursor.fetchone()[0]
+
+    def test_add_months(self):
+        self.assertEqual(
+            user.partitions.add_months(datetime.date(2025, 11, 1), 3),
+            datetime.date(2026, 2, 1),
+        )
+        self.assertEqual(
+            user.partitions.add_months(datetime.date(2025, 1, 1), -1),
+            datetime.date(2024, 12, 1),
+        )
+
+    def test_partitions_are_created_ahead(self):
+        created = user.partitions.ensure_partitions(ahead=2)
+
+        expected = [
+            user.partitions.add_months(self.current, i) for i in range(3)
+        ]
+        self.assertEqual(
+            created,
+            [user.partitions.partition_name(month) for month in expected],
+        )
+        self.assertEqual(user.partitions.list_partitions(), expected)
+        self.assertEqual(user.partitions.ensure_partitions(ahead=2), [])
+
+    def test_activation_lands_in_its_month(self):
+        without_partition = self._activate()
+        self.assertEqual(
+            self._partition_of(without_partition),
+            user.partitions.DEFAULT_PARTITION,
+        )
+
+        user.partitions.ensure_partitions(ahead=0)
+
+        self.assertEqual(
+            self._partition_of(without_partition),
+            user.partitions.partition_name(self.current),
+        )
+        self.assertEqual(
+            self._partition_of(self._activate()),
+            user.partitions.partition_name(self.current),
+        )
+
+    def test_old_activations_are_moved_out_of_default(self):
+        old_month = user.partitions.add_months(self.current, -14)
+        activation = self._activate(
+            datetime.datetime(
+                old_month.year,
+                old_month.month,
+                15,
+                tzinfo=datetime.timezone.utc,
+            ),
+        )
+
+        created = user.partitions.ensure_partitions(ahead=0)
+
+        self.assertEqual(len(created), 15)
+        self.assertEqual(
+            self._partition_of(activation),
+            user.partitions.partition_name(old_month),
+        )
+
+    def test_old_partitions_are_archived(self):
+        old_month = user.partitions.add_months(self.current, -1)
+        self._activate(
+            datetime.datetime(
+                old_month.year,
+                old_month.month,
+                1,
+                tzinfo=datetime.timezone.utc,
+            ),
+        )
+        recent = self._activate()
+        user.partitions.ensure_partitions(ahead=0)
+
+        out = io.StringIO()
+        django.core.management.call_command(
+            'drop_history_partitions',
+            '--before',
+            f'{self.current:%Y-%m}',
+            '--dry-run',
+            stdout=out,
+        )
+        self.assertIn(
+            user.partitions.partition_name(old_month),
+            out.getvalue(),
+        )
+        self.assertEqual(
+            user.models.PromoActivationHistory.objects.count(),
+            2,
+        )
+
+        detached = user.partitions.detach_partitions(self.current)
+
+        self.assertEqual(
+            detached,
+            [user.partitions.partition_name(old_month)],
+        )
+        self.assertEqual(
+            list(user.models.PromoActivationHistory.objects.all()),
+            [recent],
+        )
+        self.assertEqual(user.partitions.list_partitions(), [self.current])
+        with django.db.connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT count(*) '
+                f'FROM {user.partitions.archive_name(old_month)}',
+            )
+            self.assertEqual(cursor.fetchone()[0], 1)
+
+    def test_old_partitions_are_dropped_on_request(self):
+        old_month = user.partitions.add_months(self.current, -1)
+        self._activate(
+            datetime.datetime(
+                old_month.year,
+                old_month.month,
+                1,
+                tzinfo=datetime.timezone.utc,
+            ),
+        )
+        user.partitions.ensure_partitions(ahead=0)
+
+        out = io.StringIO()
+        django.core.management.call_command(
+            'drop_history_partitions',
+            '--before',
+            f'{self.current:%Y-%m}',
+            '--drop',
+            stdout=out,
+        )
+
+        self.assertIn(
+            f'dropped {user.partitions.partition_name(old_month)}',
+            out.getvalue(),
+        )
+        self.assertFalse(
+            user.models.PromoActivationHistory.objects.exists(),
+        )
+        with django.db.connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT to_regclass(%s)',
+                [user.partitions.archive_name(old_month)],
+            )
+            self.assertIsNone(cursor.fetchone()[0])
@@ -4,6 +4,7 @@ import django.test
 
 import business.constants
 import business.models
+import core.principal
 import user.models
 import user.services
 
@@ -41,7 +42,7 @@ class PromoActivationServiceTestCase(django.test.TestCase):
         self.promo.save()
 
         service = user.services.PromoActivationService(
-            user=self.user_,
+            user=core.principal.Principal.from_instance(self.user_),
             promo=self.promo,
         )
 
@@ -56,7 +57,7 @@ class PromoActivationServiceTestCase(django.test.TestCase):
         self.promo.save()
 
         service = user.services.PromoActivationService(
-            user=self.user_,
+            user=core.principal.Principal.from_instance(self.user_),
             promo=self.promo,
         )
 
@@ -71,7 +72,7 @@ class PromoActivationServiceTestCase(django.test.TestCase):
         self.promo.save()
 
         service = user.services.PromoActivationService(
-            user=self.user_,
+            user=core.principal.Principal.from_instance(self.user_),
             promo=self.promo,
         )
 
@@ -86,7 +87,7 @@ class PromoActivationServiceTestCase(django.test.TestCase):
         mock_antifraud,
     ):
         service = user.services.PromoActivationService(
-            user=self.user_,
+            user=core.principal.Principal.from_instance(self.user_),
             promo=self.promo,
         )
 
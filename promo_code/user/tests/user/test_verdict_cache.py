@@ -0,0 +1,82 @@
+import time
+import unittest.mock
+
+import django.test
+import django_redis
+
+import user.verdict_cache
+
+
+class VerdictCacheTests(django.test.SimpleTestCase):
+    def setUp(self):
+        self.cache = user.verdict_cache.VerdictCache(local_size=2)
+        self.user_email = 'test@example.com'
+        self.promo_id = '1bfd61b1-52ff-4c0f-ba8b-434ad3d0f812'
+        self.redis = django_redis.get_redis_connection('default')
+
+    def tearDown(self):
+        self.redis.flushall()
+
+    def test_verdict_is_stored_as_compact_record(self):
+        self.cache.set(self.user_email, self.promo_id, {'ok': True}, 60)
+
+        raw = self.redis.get(self.cache.user_key(self.user_email))
+        self.assertEqual(len(raw), self.cache.RECORD.size)
+        self.assertAlmostEqual(
+            self.redis.ttl(self.cache.user_key(self.user_email)),
+            60,
+            delta=1,
+        )
+
+    def test_verdict_round_trips_through_redis(self):
+        self.cache.set(self.user_email, self.promo_id, {'ok': True}, 60)
+        self.cache.local.clear()
+
+        verdict = self.cache.get(self.user_email, self.promo_id)
+
+        self.assertTrue(verdict['ok'])
+        self.assertIn('cache_until', verdict)
+
+    def test_promo_specific_verdict_uses_promo_key(self):
+        self.cache.set(
+            self.user_email,
+            self.promo_id,
+            {'ok': True, 'promo_specific': True},
+            60,
+        )
+        self.cache.local.clear()
+
+        self.assertIsNone(self.redis.get(self.cache.user_key(self.user_email)))
+        self.assertIsNotNone(
+            self.cache.get(self.user_email, self.promo_id),
+        )
+        self.assertIsNone(
+            self.cache.get(
+                self.user_email,
+                'c2bd1a8e-7f47-4ff3-9a0c-0d4f1c3c1a11',
+            ),
+        )
+
+    def test_local_hit_does_not_touch_redis(self):
+        self.cache.set(self.user_email, self.promo_id, {'ok': True}, 60)
+
+        with unittest.mock.patch.object(
+            self.cache,
+            '_connection',
+        ) as mock_connection:
+            verdict = self.cache.get(self.user_email, self.promo_id)
+
+        self.assertTrue(verdict['ok'])
+        mock_connection.assert_not_called()
+
+    def test_local_tier_evicts_least_recently_used(self):
+        for i in range(3):
+            self.cache.local.set(i, i, time.time() + 60)
+
+        self.assertIsNone(self.cache.local.get(0))
+        self.assertEqual(self.cache.local.get(2), 2)
+
+    def test_expired_local_entry_is_ignored(self):
+        self.cache.local.set('key', 'value', time.time() - 1)
+
+        self.assertIsNone(self.cache.local.get('key'))
@@ -0,0 +1,65 @@
+import django.db
+import rest_framework_simplejwt.token_blacklist.models as tb_models
+
+# Blacklists every unexpired refresh token of the user but one in a
+# single statement, however many tokens the user has.
+BLACKLIST_SQL = """
+INSERT INTO {blacklisted} (token_id, blacklisted_at)
+SELECT outstanding.id, now()
+FROM {outstanding} AS outstanding
+WHERE outstanding.user_id = %s
+    AND outstanding.jti <> %s
+    AND outstanding.expires_at > now()
+ON CONFLICT (token_id) DO NOTHING
+"""
+
+# Deletes a batch of expired refresh tokens and their blacklist entries.
+# The foreign key of the blacklist is deferred, so both deletes can run
+# in one statement.
+PRUNE_SQL = """
+WITH expired AS (
+    SELECT id
+    FROM {outstanding}
+    WHERE expires_at < now()
+    LIMIT %s
+    FOR UPDATE SKIP LOCKED
+), blacklisted AS (
+    DELETE FROM {blacklisted}
+    WHERE token_id IN (SELECT id FROM expired)
+)
+DELETE FROM {outstanding}
+WHERE id IN (SELECT id FROM expired)
+"""
+
+
+def _format(sql: str) -> str:
+    return sql.format(
+        outstanding=tb_models.OutstandingToken._meta.db_table,
+        blacklisted=tb_models.BlacklistedToken._meta.db_table,
+    )
+
+
+def blacklist_other_tokens(user_id, current_jti: str) -> int:
+    """
+    Blacklists the user's refresh tokens except the one with the given
+    jti. Expired tokens are skipped: they are rejected anyway and only
+    wait for prune_expired(). Returns the number of tokens blacklisted.
+    """
+    with django.db.connection.cursor() as cursor:
+        cursor.execute(_format(BLACKLIST_SQL), [user_id, current_jti])
+        return cursor.rowcount
+
+
+def prune_expired(batch_size: int = 1000) -> int:
+    """
+    Deletes expired refresh tokens, with their blacklist entries, in
+    batches of batch_size so no statement holds many row locks for long.
+    Returns the number of tokens deleted.
+    """
+    deleted = 0
+    while True:
+        with django.db.connection.cursor() as cursor:
+            cursor.execute(_format(PRUNE_SQL), [batch_size])
+            deleted += cursor.rowcount
+            if cursor.rowcount < batch_size:
+                return deleted
@@ -1,4 +1,5 @@
 import django.urls
+import django.views.decorators.csrf
 import rest_framework_simplejwt.views
 
 import user.views
@@ -57,6 +58,13 @@ urlpatterns = [
         user.views.PromoActivateView.as_view(),
         name='user-promo-activate',
     ),
+    django.urls.path(
+        'promo/<uuid:id>/activate-async',
+        django.views.decorators.csrf.csrf_exempt(
+            user.views.PromoActivateAsyncView.as_view(),
+        ),
+        name='user-promo-activate-async',
+    ),
     django.urls.path(
         'promo/history',
         user.views.PromoHistoryView.as_view(),
@@ -1,5 +1,7 @@
+import functools
 import re
 
+import django.contrib.auth.password_validation
 import django.core.exceptions
 import django.utils.translation
 from django.utils.translation import gettext as _
@@ -20,20 +22,21 @@ class UppercaseValidator:
             1 for char in password if char.isupper() and char.isascii()
         )
         if count < self.min_count:
-            msg = django.utils.translation.ngettext(
-                'Password must contain at least %(min_count)d uppercase '
-                'letter.',
-                'Password must contain at least %(min_count)d uppercase '
-                'letters.',
-                self.min_count,
-            ) % {
-                'min_count': self.min_count,
-            }
-            raise django.core.exceptions.ValidationError(
-                msg,
-                code=self.code,
-                params={'min_count': self.min_count},
-            )
+            raise self.get_error()
+
+    def get_error(self):
+        msg = django.utils.translation.ngettext(
+            'Password must contain at least %(min_count)d uppercase letter.',
+            'Password must contain at least %(min_count)d uppercase letters.',
+            self.min_count,
+        ) % {
+            'min_count': self.min_count,
+        }
+        return django.core.exceptions.ValidationError(
+            msg,
+            code=self.code,
+            params={'min_count': self.min_count},
+        )
 
     def get_help_text(self):
         return _(
@@ -62,20 +65,21 @@ class LowercaseValidator:
             1 for char in password if char.islower() and char.isascii()
         )
         if count < self.min_count:
-            msg = django.utils.translation.ngettext(
-                'Password must contain at least %(min_count)d lowercase '
-                'letter.',
-                'Password must contain at least %(min_count)d lowercase '
-                'letters.',
-                self.min_count,
-            ) % {
-                'min_count': self.min_count,
-            }
-            raise django.core.exceptions.ValidationError(
-                msg,
-                code=self.code,
-                params={'min_count': self.min_count},
-            )
+            raise self.get_error()
+
+    def get_error(self):
+        msg = django.utils.translation.ngettext(
+            'Password must contain at least %(min_count)d lowercase letter.',
+            'Password must contain at least %(min_count)d lowercase letters.',
+            self.min_count,
+        ) % {
+            'min_count': self.min_count,
+        }
+        return django.core.exceptions.ValidationError(
+            msg,
+            code=self.code,
+            params={'min_count': self.min_count},
+        )
 
     def get_help_text(self):
         return _(
@@ -101,18 +105,21 @@ class NumericValidator:
     def validate(self, password, user=None):
         count = sum(1 for char in password if char.isdigit())
         if count < self.min_count:
-            msg = django.utils.translation.ngettext(
-                'Password must contain at least %(min_count)d digit.',
-                'Password must contain at least %(min_count)d digits.',
-                self.min_count,
-            ) % {
-                'min_count': self.min_count,
-            }
-            raise django.core.exceptions.ValidationError(
-                msg,
-                code=self.code,
-                params={'min_count': self.min_count},
-            )
+            raise self.get_error()
+
+    def get_error(self):
+        msg = django.utils.translation.ngettext(
+            'Password must contain at least %(min_count)d digit.',
+            'Password must contain at least %(min_count)d digits.',
+            self.min_count,
+        ) % {
+            'min_count': self.min_count,
+        }
+        return django.core.exceptions.ValidationError(
+            msg,
+            code=self.code,
+            params={'min_count': self.min_count},
+        )
 
     def get_help_text(self):
         return _(
@@ -140,20 +147,21 @@ class SpecialCharacterValidator:
     def validate(self, password, user=None):
         count = len(self.pattern.findall(password))
         if count < self.min_count:
-            msg = django.utils.translation.ngettext(
-                'Password must contain at least %(min_count)d special '
-                'character.',
-                'Password must contain at least %(min_count)d special '
-                'characters.',
-                self.min_count,
-            ) % {
-                'min_count': self.min_count,
-            }
-            raise django.core.exceptions.ValidationError(
-                msg,
-                code=self.code,
-                params={'min_count': self.min_count},
-            )
+            raise self.get_error()
+
+    def get_error(self):
+        msg = django.utils.translation.ngettext(
+            'Password must contain at least %(min_count)d special character.',
+            'Password must contain at least %(min_count)d special characters.',
+            self.min_count,
+        ) % {
+            'min_count': self.min_count,
+        }
+        return django.core.exceptions.ValidationError(
+            msg,
+            code=self.code,
+            params={'min_count': self.min_count},
+        )
 
     def get_help_text(self):
         return _(
@@ -177,13 +185,126 @@ class AsciiValidator:
 
     def validate(self, password, user=None):
         if not password.isascii():
-            raise django.core.exceptions.ValidationError(
-                _('Password contains non-ASCII characters.'),
-                code=self.code,
-            )
+            raise self.get_error()
+
+    def get_error(self):
+        return django.core.exceptions.ValidationError(
+            _('Password contains non-ASCII characters.'),
+            code=self.code,
+        )
 
     def get_help_text(self):
         return _(
             'Your password must only contain standard English letters, '
             'digits, and symbols.',
         )
+
+
+@functools.lru_cache
+def common_passwords(password_list_path=None):
+    """
+    Returns Django's list of common passwords (or the one at the given
+    path) as a frozenset. It is read once per process and shared by every
+    validator using it.
+    """
+    if password_list_path is None:
+        validator = (
+            django.contrib.auth.password_validation.CommonPasswordValidator()
+        )
+    else:
+        validator = (
+            django.contrib.auth.password_validation.CommonPasswordValidator(
+                password_list_path,
+            )
+        )
+
+    return frozenset(validator.passwords)
+
+
+class PasswordPolicyValidator:
+    """
+    Validates the whole password policy at once: not a common password,
+    only ASCII characters, and at least a minimum number of special
+    characters, digits, lowercase and uppercase letters.
+
+    Every character is classified in a single pass over the password and
+    all violated rules are reported together, with the messages and codes
+    of the single-rule validators above.
+    """
+
+    UPPERCASE, LOWERCASE, DIGIT, SPECIAL, OTHER, NON_ASCII = range(6)
+
+    def __init__(
+        self,
+        min_uppercase=1,
+        min_lowercase=1,
+        min_digits=1,
+        min_special=1,
+        special_chars=None,
+        password_list_path=None,
+    ):
+        self.passwords = common_passwords(password_list_path)
+        self.ascii = AsciiValidator()
+        self.rules = [
+            (
+                self.SPECIAL,
+                SpecialCharacterValidator(min_special, special_chars),
+            ),
+            (self.DIGIT, NumericValidator(min_digits)),
+            (self.LOWERCASE, LowercaseValidator(min_lowercase)),
+            (self.UPPERCASE, UppercaseValidator(min_uppercase)),
+        ]
+
+        # Class of every ASCII character; anything else is non-ASCII.
+        pattern = self.rules[0][1].pattern
+        self.classes = {}
+        for code in range(128):
+            char = chr(code)
+            if char.isupper():
+                self.classes[char] = self.UPPERCASE
+            elif char.islower():
+                self.classes[char] = self.LOWERCASE
+            elif char.isdigit():
+                self.classes[char] = self.DIGIT
+            elif pattern.fullmatch(char):
+                self.classes[char] = self.SPECIAL
+            else:
+                self.classes[char] = self.OTHER
+
+    def validate(self, password, user=None):
+        counts = [0] * 6
+        for char in password:
+            counts[self.classes.get(char, self.NON_ASCII)] += 1
+
+        errors = []
+        if password.lower().strip() in self.passwords:
+            errors.append(
+                django.core.exceptions.ValidationError(
+                    _('This password is too common.'),
+                    code='password_too_common',
+                ),
+            )
+
+        if counts[self.NON_ASCII]:
+            errors.append(self.ascii.get_error())
+
+        errors.extend(
+            validator.get_error()
+            for char_class, validator in self.rules
+            if counts[char_class] < validator.min_count
+        )
+
+        if errors:
+            raise django.core.exceptions.ValidationError(errors)
+
+    def get_help_text(self):
+        return ' '.join(
+            [
+                _("Your password can't be a commonly used password."),
+                self.ascii.get_help_text(),
+                *(
+                    validator.get_help_text()
+                    for _class, validator in self.rules
+                ),
+            ],
+        )
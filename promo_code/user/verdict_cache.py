@@ -0,0 +1,153 @@
+import contextlib
+import datetime
+import struct
+import time
+import typing
+
+import asgiref.sync
+import django.conf
+import django_redis
+import redis.exceptions
+
+import core.utils.lru
+
+
+class VerdictCache:
+    """
+    Two-tier cache of positive anti-fraud verdicts.
+
+    A small in-process LRU sits in front of Redis, so repeated activations
+    by the same user within a burst touch neither Redis nor the anti-fraud
+    service. Redis values are packed into a fixed 9-byte record
+    (ok flag, expiry as unix time) instead of a pickled dict.
+
+    Key schema:
+        antifraud:v1:{email}                   verdict valid for every promo
+        antifraud:v1:{email}:promo:{promo_id}  verdict the upstream marked
+                                               as promo-specific
+    """
+
+    KEY_PREFIX = 'antifraud:v1'
+    RECORD = struct.Struct('!?d')
+
+    def __init__(
+        self,
+        local_size: int = django.conf.settings.ANTIFRAUD_VERDICT_LRU_SIZE,
+    ):
+        self.local = core.utils.lru.TTLCache(local_size)
+
+    @classmethod
+    def user_key(cls, user_email: str) -> str:
+        return f'{cls.KEY_PREFIX}:{user_email}'
+
+    @classmethod
+    def promo_key(cls, user_email: str, promo_id: str) -> str:
+        return f'{cls.KEY_PREFIX}:{user_email}:promo:{promo_id}'
+
+    @staticmethod
+    def _connection():
+        return django_redis.get_redis_connection('default')
+
+    @classmethod
+    def _decode(cls, raw: bytes) -> typing.Tuple[typing.Dict, float]:
+        ok, expires_at = cls.RECORD.unpack(raw)
+        cache_until = datetime.datetime.fromtimestamp(
+            expires_at,
+            tz=datetime.timezone.utc,
+        ).replace(tzinfo=None)
+        return {'ok': ok, 'cache_until': cache_until.isoformat()}, expires_at
+
+    def get_local(
+        self,
+        user_email: str,
+        promo_id: str,
+    ) -> typing.Optional[typing.Dict]:
+        """Looks the verdict up in the in-process tier only."""
+        for key in (
+            self.promo_key(user_email, promo_id),
+            self.user_key(user_email),
+        ):
+            if (verdict := self.local.get(key)) is not None:
+                return verdict
+        return None
+
+    def get(
+        self,
+        user_email: str,
+        promo_id: str,
+    ) -> typing.Optional[typing.Dict]:
+        """
+        Returns the cached verdict for the user and promo, preferring
+        a promo-specific one. Redis is queried with a single MGET.
+        """
+        if (verdict := self.get_local(user_email, promo_id)) is not None:
+            return verdict
+
+        keys = [
+            self.promo_key(user_email, promo_id),
+            self.user_key(user_email),
+        ]
+        try:
+            values = self._connection().mget(keys)
+        except redis.exceptions.RedisError:
+            return None
+
+        for key, raw in zip(keys, values, strict=True):
+            if raw is None:
+                continue
+
+            verdict, expires_at = self._decode(raw)
+            if expires_at > time.time():
+                self.local.set(key, verdict, expires_at)
+                return verdict
+
+        return None
+
+    def set(
+        self,
+        user_email: str,
+        promo_id: str,
+        verdict: typing.Dict,
+        timeout: int,
+    ) -> None:
+        """Stores the verdict in both tiers for timeout seconds."""
+        key = (
+            self.promo_key(user_email, promo_id)
+            if verdict.get('promo_specific')
+            else self.user_key(user_email)
+        )
+        expires_at = time.time() + timeout
+        raw = self.RECORD.pack(bool(verdict.get('ok')), expires_at)
+
+        self.local.set(key, self._decode(raw)[0], expires_at)
+        with contextlib.suppress(redis.exceptions.RedisError):
+            self._connection().set(key, raw, ex=timeout)
+
+    async def aget(
+        self,
+        user_email: str,
+        promo_id: str,
+    ) -> typing.Optional[typing.Dict]:
+        if (verdict := self.get_local(user_email, promo_id)) is not None:
+            return verdict
+        return await asgiref.sync.sync_to_async(self.get)(
+            user_email,
+            promo_id,
+        )
+
+    async def aset(
+        self,
+        user_email: str,
+        promo_id: str,
+        verdict: typing.Dict,
+        timeout: int,
+    ) -> None:
+        await asgiref.sync.sync_to_async(self.set)(
+            user_email,
+            promo_id,
+            verdict,
+            timeout,
+        )
+
+
+verdict_cache = VerdictCache()
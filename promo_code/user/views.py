@@ -1,6 +1,13 @@
+import asgiref.sync
+import django.conf
+import django.db
 import django.db.models
 import django.db.transaction
+import django.http
 import django.shortcuts
+import django.views
+import redis.exceptions
+import rest_framework.exceptions
 import rest_framework.generics
 import rest_framework.permissions
 import rest_framework.response
@@ -11,6 +18,13 @@ import rest_framework_simplejwt.views
 
 import business.models
 import core.pagination
+import core.representation_cache
+import core.serializers
+import user.antifraud_service
+import user.antifraud_warmer
+import user.authentication
+import user.feed_cache
+import user.like_buffer
 import user.models
 import user.permissions
 import user.serializers
@@ -62,31 +76,79 @@ class UserProfileView(
     permission_classes = [rest_framework.permissions.IsAuthenticated]
 
     def get_object(self):
-        return self.request.user
+        return self.request.user.instance
 
     def patch(self, request, *args, **kwargs):
         return self.partial_update(request, *args, **kwargs)
 
 
-class UserPromoDetailView(rest_framework.generics.RetrieveAPIView):
+class UserPromoRepresentationMixin:
     """
-    Retrieve (GET) information about the promo without receiving a promo code.
+    Renders promos for the requesting user from the cached user
+    representation, overlaying the per-user flags, which are never
+    cached, with a single query.
     """
 
-    queryset = business.models.Promo.objects.select_related('company').only(
-        'id',
-        'company__id',
-        'company__name',
-        'description',
-        'image_url',
-        'active',
-        'active_from',
-        'active_until',
-        'mode',
-        'used_count',
-        'like_count',
-        'comment_count',
-    )
+    user_fields = ('is_liked_by_user', 'is_activated_by_user')
+
+    def render_promos(self, promo_ids):
+        fragments = core.representation_cache.representation_cache.render(
+            core.representation_cache.VARIANT_USER,
+            promo_ids,
+            self._render_user_fragments,
+        )
+        liked, activated = business.models.Promo.objects.get_user_flags(
+            self.request.user,
+            [fragment['promo_id'] for fragment in fragments],
+        )
+
+        fields = core.serializers.BaseUserPromoSerializer.Meta.fields
+        promos = []
+        for fragment in fragments:
+            flags = {
+                'is_liked_by_user': fragment['promo_id'] in liked,
+                'is_activated_by_user': fragment['promo_id'] in activated,
+            }
+            promo = {**fragment, **flags}
+            promos.append(
+                {field: promo[field] for field in fields if field in promo},
+            )
+
+        user.like_buffer.apply_pending(promos, self.request.user.id)
+        return promos
+
+    def _render_user_fragments(self, promo_ids):
+        promos = (
+            business.models.Promo.objects.select_related('company')
+            .filter(pk__in=promo_ids)
+            .annotate(
+                _is_liked_by_user=django.db.models.Value(False),
+                _is_activated_by_user=django.db.models.Value(False),
+            )
+        )
+        serializer = core.serializers.BaseUserPromoSerializer(
+            promos,
+            many=True,
+        )
+
+        fragments = {}
+        for data in serializer.data:
+            fragment = dict(data)
+            for field in self.user_fields:
+                del fragment[field]
+            fragments[fragment['promo_id']] = fragment
+        return fragments
+
+
+class UserPromoDetailView(
+    UserPromoRepresentationMixin,
+    rest_framework.generics.RetrieveAPIView,
+):
+    """
+    Retrieve (GET) information about the promo without receiving a promo code.
+    The promo is served from the representation cache, see
+    UserPromoRepresentationMixin.
+    """
 
     serializer_class = user.serializers.UserPromoDetailSerializer
 
@@ -96,18 +158,30 @@ class UserPromoDetailView(rest_framework.generics.RetrieveAPIView):
 
     lookup_field = 'id'
 
+    def retrieve(self, request, *args, **kwargs):
+        promos = self.render_promos([str(kwargs[self.lookup_field])])
+        if not promos:
+            raise django.http.Http404
 
-class UserFeedView(rest_framework.generics.ListAPIView):
+        return rest_framework.response.Response(promos[0])
+
+
+class UserFeedView(
+    UserPromoRepresentationMixin,
+    rest_framework.generics.ListAPIView,
+):
     serializer_class = user.serializers.PromoFeedSerializer
     permission_classes = [rest_framework.permissions.IsAuthenticated]
-    pagination_class = core.pagination.CustomLimitOffsetPagination
+    pagination_class = core.pagination.KeysetLimitOffsetPagination
+    count_strategy = django.conf.settings.PROMO_FEED_COUNT_STRATEGY
 
     def get_queryset(self):
         user = self.request.user
 
-        user_age = user.other.get('age')
-        user_country = user.other.get('country').lower()
-        active_filter = self.request.query_params.get('active')
+        user_age = user.age
+        user_country = user.country.lower()
+        active = self.get_active_filter()
+        active_filter = None if active is None else str(active)
 
         return business.models.Promo.objects.get_feed_for_user(
             user,
@@ -116,13 +190,20 @@ class UserFeedView(rest_framework.generics.ListAPIView):
             user_age=user_age,
         )
 
+    def get_active_filter(self):
+        # A missing BooleanField validates to False on query params.
+        if 'active' not in self.request.query_params:
+            return None
+        return self.validated_query_params['active']
+
     def filter_queryset(self, queryset):
         queryset = super().filter_queryset(queryset)
         category_param = self.request.query_params.get('category')
 
         if category_param:
-            needle = f'"{category_param.lower()}"'
-            queryset = queryset.filter(target__categories__icontains=needle)
+            queryset = queryset.filter(
+                target_categories__contains=[category_param.lower()],
+            )
 
         return queryset
 
@@ -133,7 +214,75 @@ class UserFeedView(rest_framework.generics.ListAPIView):
         query_serializer.is_valid(raise_exception=True)
         self.validated_query_params = query_serializer.validated_data
 
-        return super().list(request, *args, **kwargs)
+        response = self.list_from_cache(request)
+        if response is None:
+            response = super().list(request, *args, **kwargs)
+            user.like_buffer.apply_pending(response.data, request.user.id)
+        user.antifraud_warmer.record_feed_visit(
+            request.user.email,
+            [promo['promo_id'] for promo in response.data],
+        )
+        return response
+
+    def list_from_cache(self, request):
+        """
+        Serves the page from the segment feed cache. Returns None when
+        the cache is disabled or unreachable, in cursor mode, and for
+        pages past the cached ids, so the query runs as usual.
+        """
+        paginator = self.paginator
+        if (
+            not django.conf.settings.FEED_CACHE_ENABLED
+            or paginator.cursor_query_param in request.query_params
+        ):
+            return None
+
+        params = self.validated_query_params
+        category = params.get('category')
+        segment = (
+            request.user.country.lower(),
+            request.user.age,
+            self.get_active_filter(),
+            category.lower() if category else None,
+        )
+        cached = user.feed_cache.feed_cache.get_segment(
+            segment,
+            self._load_segment,
+        )
+        if cached is None:
+            return None
+
+        ids, count = cached
+        limit = paginator.get_limit(request)
+        offset = paginator.get_offset(request)
+        if offset + limit > len(ids) and count > len(ids):
+            return None
+
+        paginator.request = request
+        paginator.limit = limit
+        paginator.offset = offset
+        paginator.use_cursor = False
+        paginator.count_is_estimate = False
+        paginator.count = (
+            None
+            if self.count_strategy == core.pagination.COUNT_NONE
+            else count
+        )
+        return paginator.get_paginated_response(
+            self.render_promos(ids[offset : offset + limit]),
+        )
+
+    def _load_segment(self, max_ids):
+        queryset = self.filter_queryset(self.get_queryset())
+        ids = [
+            str(promo_id)
+            for promo_id in queryset.values_list('id', flat=True)[
+                : max_ids + 1
+            ]
+        ]
+        if len(ids) <= max_ids:
+            return ids, len(ids)
+        return ids[:max_ids], queryset.count()
 
 
 class UserPromoLikeView(rest_framework.views.APIView):
@@ -147,33 +296,35 @@ class UserPromoLikeView(rest_framework.views.APIView):
 
     def post(self, request, id):
         """Add a like to the promo code."""
+        if self.buffer_like(request, id, liked=True):
+            return self.ok_response()
+
         with django.db.transaction.atomic():
             promo = self.get_promo_object(id)
 
             like_obj, created = user.models.PromoLike.objects.get_or_create(
-                user=request.user,
+                user_id=request.user.id,
                 promo=promo,
             )
 
             if created:
                 promo.like_count = django.db.models.F('like_count') + 1
                 promo.save(update_fields=['like_count'])
-                promo.refresh_from_db()
 
-            return rest_framework.response.Response(
-                {'status': 'ok'},
-                status=rest_framework.status.HTTP_200_OK,
-            )
+            return self.ok_response()
 
     def delete(self, request, id):
         """Remove a like from the promo code."""
+        if self.buffer_like(request, id, liked=False):
+            return self.ok_response()
+
         with django.db.transaction.atomic():
             promo = self.get_promo_object(id)
 
             # Idempotency: if the like doesn't exist,
             # do nothing and still return 200 OK.
             like_instance = user.models.PromoLike.objects.filter(
-                user=request.user,
+                user_id=request.user.id,
                 promo=promo,
             ).first()
 
@@ -181,47 +332,93 @@ class UserPromoLikeView(rest_framework.views.APIView):
                 like_instance.delete()
                 promo.like_count = django.db.models.F('like_count') - 1
                 promo.save(update_fields=['like_count'])
-                promo.refresh_from_db()
 
-            return rest_framework.response.Response(
-                {'status': 'ok'},
-                status=rest_framework.status.HTTP_200_OK,
-            )
+            return self.ok_response()
 
+    def buffer_like(self, request, promo_id, liked):
+        """
+        With LIKE_WRITE_BEHIND, records the like in Redis only and lets
+        `flush_likes` write it to the database later. Returns False when
+        the like has to be written right away instead.
+        """
+        if not django.conf.settings.LIKE_WRITE_BEHIND:
+            return False
 
-class PromoObjectMixin:
-    """Mixin for retrieving the Promo object and saving it to self.promo"""
+        if not business.models.Promo.objects.filter(id=promo_id).exists():
+            raise django.http.Http404
 
-    def dispatch(self, request, *args, **kwargs):
-        self.promo = django.shortcuts.get_object_or_404(
-            business.models.Promo.objects.select_for_update(),
-            pk=self.kwargs.get('promo_id'),
+        try:
+            user.like_buffer.set_like(request.user, promo_id, liked)
+        except redis.exceptions.RedisError:
+            return False
+        return True
+
+    @staticmethod
+    def ok_response():
+        return rest_framework.response.Response(
+            {'status': 'ok'},
+            status=rest_framework.status.HTTP_200_OK,
         )
+
+
+class PromoExistsMixin:
+    """
+    Mixin for checking that the promo exists and saving its id to
+    self.promo_id. The check is cached and takes no row lock.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        self.promo_id = self.kwargs.get('promo_id')
+        if not business.models.Promo.objects.exists_cached(self.promo_id):
+            raise django.http.Http404
         return super().dispatch(request, *args, **kwargs)
 
+    def get_queryset(self):
+        # Only the author fields UserAuthorSerializer emits are loaded.
+        return (
+            user.models.PromoComment.objects.filter(promo_id=self.promo_id)
+            .select_related('author')
+            .only(
+                'id',
+                'promo_id',
+                'text',
+                'created_at',
+                'updated_at',
+                'author__id',
+                'author__name',
+                'author__surname',
+                'author__avatar_url',
+            )
+        )
+
 
 class PromoCommentListCreateView(
-    PromoObjectMixin,
+    PromoExistsMixin,
     rest_framework.generics.ListCreateAPIView,
 ):
     permission_classes = [rest_framework.permissions.IsAuthenticated]
 
-    pagination_class = core.pagination.CustomLimitOffsetPagination
+    pagination_class = core.pagination.KeysetLimitOffsetPagination
 
     def get_serializer_class(self):
         if self.request.method == 'POST':
             return user.serializers.CommentCreateSerializer
         return user.serializers.CommentSerializer
 
-    def get_queryset(self):
-        return user.models.PromoComment.objects.filter(
-            promo=self.promo,
-        ).select_related('author')
-
     def perform_create(self, serializer):
-        serializer.save(author=self.request.user, promo=self.promo)
-        self.promo.comment_count = django.db.models.F('comment_count') + 1
-        self.promo.save(update_fields=['comment_count'])
+        try:
+            with django.db.transaction.atomic():
+                serializer.save(
+                    author_id=self.request.user.id,
+                    promo_id=self.promo_id,
+                )
+                business.models.Promo.objects.change_comment_count(
+                    self.promo_id,
+                    1,
+                )
+        except django.db.IntegrityError:
+            # The promo was deleted after the existence check.
+            raise django.http.Http404 from None
 
     def create(self, request, *args, **kwargs):
         create_serializer = self.get_serializer(data=request.data)
@@ -247,7 +444,7 @@ class PromoCommentListCreateView(
 
 
 class PromoCommentDetailView(
-    PromoObjectMixin,
+    PromoExistsMixin,
     rest_framework.generics.RetrieveUpdateDestroyAPIView,
 ):
     permission_classes = [
@@ -263,11 +460,6 @@ class PromoCommentDetailView(
             return user.serializers.CommentUpdateSerializer
         return user.serializers.CommentSerializer
 
-    def get_queryset(self):
-        return user.models.PromoComment.objects.filter(
-            promo=self.promo,
-        ).select_related('author')
-
     def update(self, request, *args, **kwargs):
         partial = kwargs.pop('partial', False)
         instance = self.get_object()
@@ -284,11 +476,12 @@ class PromoCommentDetailView(
 
     def destroy(self, request, *args, **kwargs):
         instance = self.get_object()
-        self.perform_destroy(instance)
-
-        promo = instance.promo
-        promo.comment_count = django.db.models.F('comment_count') - 1
-        promo.save(update_fields=['comment_count'])
+        with django.db.transaction.atomic():
+            self.perform_destroy(instance)
+            business.models.Promo.objects.change_comment_count(
+                instance.promo_id,
+                -1,
+            )
 
         return rest_framework.response.Response(
             {'status': 'ok'},
@@ -331,6 +524,91 @@ class PromoActivateView(rest_framework.views.APIView):
             )
 
 
+class PromoActivateAsyncView(django.views.View):
+    """
+    Async variant of PromoActivateView.
+
+    When served through ASGI, the worker is not blocked while waiting for
+    the anti-fraud service. DRF views are sync-only, so authentication and
+    error responses mirror what PromoActivateView produces.
+    """
+
+    http_method_names = ['post', 'options']
+
+    authenticator = user.authentication.CustomJWTAuthentication()
+
+    async def post(self, request, id):
+        try:
+            return await self.activate(request, id)
+        except rest_framework.exceptions.APIException as e:
+            return self.handle_exception(request, e)
+
+    async def activate(self, request, id):
+        auth = await asgiref.sync.sync_to_async(
+            self.authenticator.authenticate,
+        )(request)
+        if auth is None:
+            raise rest_framework.exceptions.NotAuthenticated()
+
+        try:
+            promo = await business.models.Promo.objects.aget(id=id)
+        except business.models.Promo.DoesNotExist:
+            raise rest_framework.exceptions.NotFound(
+                'No Promo matches the given query.',
+            )
+
+        service = user.services.PromoActivationService(
+            user=auth[0],
+            promo=promo,
+        )
+
+        try:
+            promo_code = await service.aactivate()
+        except user.services.PromoActivationError as e:
+            return django.http.JsonResponse(
+                {'error': e.detail},
+                status=e.status_code,
+            )
+        finally:
+            # Under WSGI each async request gets an event loop of its own,
+            # so its connections cannot be reused by the next request.
+            if 'wsgi.version' in request.META:
+                await user.antifraud_service.antifraud_service.aclose()
+
+        serializer = user.serializers.PromoActivationSerializer(
+            data={'promo': promo_code},
+        )
+        serializer.is_valid(raise_exception=True)
+        return django.http.JsonResponse(serializer.data)
+
+    def handle_exception(self, request, exc):
+        """
+        Renders API exceptions the way DRF's default exception handler
+        does, since this view is not a DRF view.
+        """
+        if isinstance(exc.detail, (list, dict)):
+            data = exc.detail
+        else:
+            data = {'detail': exc.detail}
+
+        response = django.http.JsonResponse(
+            data,
+            status=exc.status_code,
+            safe=False,
+        )
+        if isinstance(
+            exc,
+            (
+                rest_framework.exceptions.NotAuthenticated,
+                rest_framework.exceptions.AuthenticationFailed,
+            ),
+        ):
+            response['WWW-Authenticate'] = (
+                self.authenticator.authenticate_header(request)
+            )
+        return response
+
+
 class PromoHistoryView(rest_framework.generics.ListAPIView):
     """
     Returns the history of activated promo codes for the current user.
@@ -341,10 +619,11 @@ class PromoHistoryView(rest_framework.generics.ListAPIView):
     pagination_class = core.pagination.CustomLimitOffsetPagination
 
     def get_queryset(self):
-        user = self.request.user
-
-        queryset = business.models.Promo.objects.filter(
-            activations_history__user=user,
-        ).order_by('-activations_history__activated_at')
+        return business.models.Promo.objects.get_history_for_user(
+            self.request.user,
+        )
 
-        return queryset  # noqa: RET504
+    def list(self, request, *args, **kwargs):
+        response = super().list(request, *args, **kwargs)
+        user.like_buffer.apply_pending(response.data, request.user.id)
+        return response